@@ -0,0 +1,147 @@
+"""
+Interface des backends de stockage du cache IA
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+# Valeur stockée : chaîne brute ou BLOB compressé (voir compression.py)
+StoredValue = Union[str, bytes]
+
+# Entrée lue : (réponse stockée, date d'expiration, date de péremption)
+FetchedRow = Tuple[StoredValue, Optional[datetime], Optional[datetime]]
+
+# Politiques d'éviction que chaque backend doit savoir appliquer
+EVICTION_POLICIES = ("lru", "lfu", "ttl")
+
+# Critères d'invalidation -> colonnes, chacune indexée par les backends persistants
+INVALIDATION_COLUMNS = {"model": "model_name", "method": "method", "tag": "tag"}
+
+class CacheRow(NamedTuple):
+    """Entrée prête à être stockée (valeurs éventuellement compressées, dates en UTC)"""
+    cache_key: str
+    model_name: str
+    method: Optional[str]
+    tag: Optional[str]
+    prompt: StoredValue
+    response: StoredValue
+    context: Optional[StoredValue]
+    expires_at: datetime
+    stale_at: Optional[datetime]
+    accessed_at: datetime
+    size_bytes: int
+    stored_bytes: int
+    
+# Entrée parcourue par iter_hottest : (entrée, nombre d'utilisations)
+HotEntry = Tuple[CacheRow, int]
+
+class CacheBackend(ABC):
+    """Stockage des entrées du cache, derrière le niveau mémoire d'AIResponseCache"""
+    
+    # Vrai si plusieurs instances de l'application partagent le stockage : leurs niveaux
+    # mémoire ne voient pas les suppressions des autres (voir AIResponseCache, memory_max_age)
+    shared = False
+    
+    @abstractmethod
+    def fetch(self, cache_keys: Sequence[str]) -> Dict[str, FetchedRow]:
+        """Lit les entrées présentes parmi cache_keys, expirées comprises"""
+        pass
+        
+    @abstractmethod
+    def store(self, rows: Sequence[CacheRow]) -> None:
+        """Insère ou remplace des entrées en une transaction (compteurs d'utilisation à 0)"""
+        pass
+        
+    @abstractmethod
+    def delete(self, cache_keys: Sequence[str]) -> None:
+        """Supprime des entrées"""
+        pass
+        
+    @abstractmethod
+    def add_usage(self, usage: Dict[str, Tuple[int, datetime]]) -> None:
+        """Ajoute des hits aux compteurs d'utilisation (cache_key -> (hits, dernier accès))"""
+        pass
+        
+    @abstractmethod
+    def delete_expired(self, limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées expirées et retourne leurs clés"""
+        pass
+        
+    @abstractmethod
+    def delete_matching(self, filters: Dict[str, str], limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées dont les colonnes valent filters et retourne leurs clés"""
+        pass
+        
+    @abstractmethod
+    def usage(self) -> Tuple[int, int]:
+        """Retourne le nombre d'entrées et la taille des données stockées (en octets)"""
+        pass
+        
+    @abstractmethod
+    def evict(self, count: int, policy: str) -> List[str]:
+        """Supprime count entrées dans l'ordre de la politique d'éviction et retourne leurs clés"""
+        pass
+        
+    @abstractmethod
+    def iter_hottest(self, limit: int) -> Iterator[HotEntry]:
+        """Parcourt au fil de l'eau les limit entrées valides les plus utilisées puis les plus récentes"""
+        pass
+        
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """
+        Retourne les agrégats du stockage
+        
+        Returns:
+            total_entries, total_hits, logical_size_bytes, total_size_bytes et expired_entries
+        """
+        pass
+        
+    def enforce_limits(self, max_entries: Optional[float], max_size_bytes: Optional[float],
+                       policy: str, target_ratio: float) -> List[str]:
+        """
+        Évince des entrées tant que le stockage dépasse ses limites de taille
+        
+        Returns:
+            Clés des entrées supprimées
+        """
+        return self._evict_to_limits(self.usage, lambda count: self.evict(count, policy),
+                                     max_entries, max_size_bytes, target_ratio)
+                                     
+    @staticmethod
+    def _evict_to_limits(usage: Callable[[], Tuple[int, int]], evict: Callable[[int], List[str]],
+                         max_entries: Optional[float], max_size_bytes: Optional[float],
+                         target_ratio: float) -> List[str]:
+        """Boucle d'éviction commune : redescend à target_ratio des limites dépassées"""
+        evicted: List[str] = []
+        entries, size_bytes = usage()
+        while entries > 0:
+            excess = 0
+            if max_entries is not None and entries > max_entries:
+                excess = entries - int(max_entries * target_ratio)
+            if max_size_bytes is not None and size_bytes > max_size_bytes:
+                # Estimation du nombre d'entrées à supprimer d'après leur taille moyenne
+                target = max_size_bytes * target_ratio
+                excess = max(excess, int((size_bytes - target) / (size_bytes / entries)) + 1)
+            if excess <= 0:
+                break
+                
+            removed = evict(excess)
+            evicted.extend(removed)
+            if not removed:
+                break
+            entries, size_bytes = usage()
+            
+        return evicted
+        
+    def recompute_stats(self) -> None:
+        """Recalcule exactement les agrégats maintenus par le backend, s'il en a"""
+        pass
+        
+    def vacuum(self, pages: int) -> None:
+        """Rend au système l'espace libéré, si le stockage le permet"""
+        pass
+        
+    def close(self) -> None:
+        """Libère les ressources du backend"""
+        pass
@@ -0,0 +1,37 @@
+"""
+Factory pour la création des backends de stockage du cache IA
+"""
+from typing import Any, Optional
+from src.ai.cache.backends.base import CacheBackend
+from src.config import settings
+
+class CacheBackendFactory:
+    """Factory pour créer les backends du cache"""
+    
+    @staticmethod
+    def create_backend(backend_type: Optional[str] = None, **config: Any) -> CacheBackend:
+        """
+        Crée une instance du backend spécifié
+        
+        Args:
+            backend_type: Type de backend ('sqlite', 'memory', 'sqlalchemy')
+            config: Arguments du constructeur du backend (ex : db_path, shards, engine)
+            
+        Returns:
+            Instance de CacheBackend
+        """
+        backend_type = backend_type or settings.AI_CACHE_BACKEND
+        
+        if backend_type == "sqlite":
+            from src.ai.cache.backends.sqlite_backend import SQLiteBackend
+            config.setdefault("db_path", settings.AI_CACHE_PATH)
+            return SQLiteBackend(**config)
+        elif backend_type == "memory":
+            from src.ai.cache.backends.memory_backend import MemoryBackend
+            return MemoryBackend(**config)
+        elif backend_type == "sqlalchemy":
+            # Import différé : SQLAlchemy n'est requis que pour ce backend
+            from src.ai.cache.backends.sqlalchemy_backend import SQLAlchemyBackend
+            return SQLAlchemyBackend(**config)
+        else:
+            raise ValueError(f"Type de backend de cache non supporté : {backend_type}")
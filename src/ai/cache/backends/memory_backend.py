@@ -0,0 +1,146 @@
+"""
+Backend en mémoire du cache IA, sans persistance (tests, déploiements éphémères)
+"""
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Sequence, Tuple
+from src.ai.cache.backends.base import CacheBackend, CacheRow, FetchedRow, HotEntry
+
+class MemoryBackend(CacheBackend):
+    """Stockage dans un dictionnaire du processus, protégé par un verrou"""
+    
+    # Clés de tri des politiques d'éviction : (ligne, utilisation, dernier accès) -> clé
+    EVICTION_ORDER = {
+        "lru": lambda row, hits, accessed_at: accessed_at,
+        "lfu": lambda row, hits, accessed_at: (hits, accessed_at),
+        "ttl": lambda row, hits, accessed_at: row.expires_at,
+    }
+    
+    def __init__(self):
+        """Initialise le backend en mémoire"""
+        # cache_key -> [ligne, nombre d'utilisations, dernier accès]
+        self._entries: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        # Agrégats tenus à jour à chaque écriture
+        self._hits = 0
+        self._logical_bytes = 0
+        self._stored_bytes = 0
+        
+    def _remove(self, cache_key: str) -> bool:
+        """Retire une entrée et met à jour les agrégats (verrou déjà pris)"""
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return False
+        row, hits, _ = entry
+        self._hits -= hits
+        self._logical_bytes -= row.size_bytes
+        self._stored_bytes -= row.stored_bytes
+        return True
+        
+    def fetch(self, cache_keys: Sequence[str]) -> Dict[str, FetchedRow]:
+        """Lit les entrées présentes parmi cache_keys"""
+        with self._lock:
+            return {
+                cache_key: (entry[0].response, entry[0].expires_at, entry[0].stale_at)
+                for cache_key in cache_keys
+                if (entry := self._entries.get(cache_key)) is not None
+            }
+            
+    def store(self, rows: Sequence[CacheRow]) -> None:
+        """Insère ou remplace des entrées"""
+        with self._lock:
+            for row in rows:
+                self._remove(row.cache_key)
+                self._entries[row.cache_key] = [row, 0, row.accessed_at]
+                self._logical_bytes += row.size_bytes
+                self._stored_bytes += row.stored_bytes
+                
+    def delete(self, cache_keys: Sequence[str]) -> None:
+        """Supprime des entrées"""
+        with self._lock:
+            for cache_key in cache_keys:
+                self._remove(cache_key)
+                
+    def add_usage(self, usage: Dict[str, Tuple[int, datetime]]) -> None:
+        """Ajoute les hits en attente aux compteurs d'utilisation"""
+        with self._lock:
+            for cache_key, (hits, accessed_at) in usage.items():
+                entry = self._entries.get(cache_key)
+                if entry is None:
+                    continue
+                entry[1] += hits
+                entry[2] = max(entry[2], accessed_at)
+                self._hits += hits
+                
+    def _delete_where(self, predicate, limit: int) -> List[str]:
+        """Supprime au plus limit entrées vérifiant predicate(ligne)"""
+        with self._lock:
+            keys = []
+            for cache_key, (row, _, _) in self._entries.items():
+                if len(keys) >= limit:
+                    break
+                if predicate(row):
+                    keys.append(cache_key)
+            for cache_key in keys:
+                self._remove(cache_key)
+            return keys
+            
+    def delete_expired(self, limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées expirées"""
+        now = datetime.utcnow()
+        return self._delete_where(lambda row: row.expires_at < now, limit)
+        
+    def delete_matching(self, filters: Dict[str, str], limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées correspondant aux critères"""
+        # Les critères d'invalidation portent les noms des champs de CacheRow
+        fields = {"model_name" if name == "model" else name: value for name, value in filters.items()}
+        return self._delete_where(
+            lambda row: all(getattr(row, field) == value for field, value in fields.items()), limit
+        )
+        
+    def usage(self) -> Tuple[int, int]:
+        """Retourne le nombre d'entrées et la taille des données stockées (en octets)"""
+        with self._lock:
+            return len(self._entries), self._stored_bytes
+            
+    def evict(self, count: int, policy: str) -> List[str]:
+        """Supprime les count premières entrées selon la politique d'éviction"""
+        order = self.EVICTION_ORDER[policy]
+        with self._lock:
+            victims = heapq.nsmallest(
+                count, self._entries, key=lambda cache_key: order(*self._entries[cache_key])
+            )
+            for cache_key in victims:
+                self._remove(cache_key)
+            return victims
+            
+    def iter_hottest(self, limit: int) -> Iterator[HotEntry]:
+        """Parcourt les entrées valides les plus utilisées (copie bornée à limit entrées)"""
+        now = datetime.utcnow()
+        with self._lock:
+            hottest = heapq.nlargest(
+                limit,
+                (entry for entry in self._entries.values() if entry[0].expires_at >= now),
+                key=lambda entry: (entry[1], entry[2])
+            )
+        for row, hits, accessed_at in hottest:
+            yield row._replace(accessed_at=accessed_at), hits
+            
+    def stats(self) -> Dict[str, int]:
+        """Retourne les agrégats ; le décompte des entrées expirées parcourt le dictionnaire"""
+        now = datetime.utcnow()
+        with self._lock:
+            return {
+                "total_entries": len(self._entries),
+                "total_hits": self._hits,
+                "logical_size_bytes": self._logical_bytes,
+                "total_size_bytes": self._stored_bytes,
+                "expired_entries": sum(1 for row, _, _ in self._entries.values() if row.expires_at < now),
+            }
+            
+    def close(self) -> None:
+        """Vide le stockage"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._logical_bytes = self._stored_bytes = 0
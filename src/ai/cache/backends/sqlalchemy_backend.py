@@ -0,0 +1,340 @@
+"""
+Backend SQLAlchemy du cache IA (PostgreSQL, MySQL...), pour les déploiements multi-instances
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Index, Integer, LargeBinary, MetaData, String, Table, and_, bindparam,
+    delete, func, or_, select, update
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from src.ai.cache.backends.base import (
+    CacheBackend, CacheRow, FetchedRow, HotEntry, INVALIDATION_COLUMNS, StoredValue
+)
+
+# Préfixe des chaînes brutes dans les colonnes binaires : un nom de codec vide
+# (les valeurs compressées commencent par le nom de leur codec, voir compression.py)
+_RAW_PREFIX = b"\x00"
+
+def _to_binary(value: Optional[StoredValue]) -> Optional[bytes]:
+    """Convertit une valeur stockée pour une colonne binaire"""
+    if value is None or isinstance(value, bytes):
+        return value
+    return _RAW_PREFIX + value.encode('utf-8')
+    
+def _from_binary(value: Optional[bytes]) -> Optional[StoredValue]:
+    """Relit une valeur d'une colonne binaire : chaîne brute ou BLOB compressé"""
+    if value is None:
+        return None
+    value = bytes(value)
+    if value.startswith(_RAW_PREFIX):
+        return value[len(_RAW_PREFIX):].decode('utf-8')
+    return value
+    
+class SQLAlchemyBackend(CacheBackend):
+    """Stockage dans une base SQLAlchemy partagée (table UNLOGGED sous PostgreSQL)"""
+    
+    shared = True
+    
+    # Nombre de clés par requête IN (...) des lectures groupées
+    BULK_CHUNK_SIZE = 500
+    # Âge maximal de l'instantané des agrégats lu par stats, en secondes
+    STATS_TTL = 30.0
+    
+    def __init__(self, engine: Optional[Engine] = None, table_name: str = "ai_cache"):
+        """
+        Initialise le backend SQLAlchemy
+        
+        Args:
+            engine: Moteur SQLAlchemy (par défaut celui de src.database.manager)
+            table_name: Nom de la table du cache
+        """
+        if engine is None:
+            from src.database.manager import db
+            engine = db.engine
+        self.engine = engine
+        
+        # Sous PostgreSQL, la table n'est pas journalisée : écritures plus rapides,
+        # contenu perdu après un crash du serveur, ce qui est acceptable pour un cache
+        prefixes = ["UNLOGGED"] if engine.dialect.name == "postgresql" else []
+        self.metadata = MetaData()
+        self.table = Table(
+            table_name, self.metadata,
+            Column("cache_key", String(64), primary_key=True),
+            Column("model_name", String(100), nullable=False),
+            Column("method", String(100)),
+            Column("tag", String(100)),
+            Column("prompt", LargeBinary, nullable=False),
+            Column("response", LargeBinary, nullable=False),
+            Column("context", LargeBinary),
+            Column("expires_at", DateTime),
+            Column("stale_at", DateTime),
+            Column("usage_count", Integer, nullable=False, default=0),
+            Column("last_accessed_at", DateTime),
+            Column("size_bytes", Integer, nullable=False, default=0),
+            Column("stored_bytes", Integer, nullable=False, default=0),
+            Index(f"idx_{table_name}_last_accessed", "last_accessed_at"),
+            Index(f"idx_{table_name}_usage", "usage_count", "last_accessed_at"),
+            Index(f"idx_{table_name}_expires", "expires_at"),
+            Index(f"idx_{table_name}_model", "model_name"),
+            Index(f"idx_{table_name}_method", "method"),
+            Index(f"idx_{table_name}_tag", "tag"),
+            prefixes=prefixes
+        )
+        # Instantané des agrégats (une seule ligne, id = 1), partagé entre les instances : les
+        # écritures n'y touchent pas (une ligne mise à jour par chaque transaction sérialiserait
+        # tous les écrivains), stats le recalcule lorsqu'il a plus de STATS_TTL secondes
+        self.stats_table = Table(
+            f"{table_name}_stats", self.metadata,
+            Column("id", Integer, primary_key=True, autoincrement=False),
+            Column("total_entries", BigInteger, nullable=False, default=0),
+            Column("total_hits", BigInteger, nullable=False, default=0),
+            Column("size_bytes", BigInteger, nullable=False, default=0),
+            Column("stored_bytes", BigInteger, nullable=False, default=0),
+            Column("computed_at", DateTime),
+            prefixes=prefixes
+        )
+        self.metadata.create_all(engine)
+        
+    def _aggregates(self, conn) -> Dict[str, int]:
+        """Calcule exactement les agrégats par un parcours complet de la table"""
+        columns = self.table.c
+        entries, hits, logical_bytes, stored_bytes = conn.execute(select(
+            func.count(),
+            func.coalesce(func.sum(columns.usage_count), 0),
+            func.coalesce(func.sum(columns.size_bytes), 0),
+            func.coalesce(func.sum(columns.stored_bytes), 0)
+        )).one()
+        return {
+            "total_entries": entries,
+            "total_hits": hits,
+            "size_bytes": logical_bytes,
+            "stored_bytes": stored_bytes,
+        }
+        
+    def _recompute_stats(self) -> Dict[str, int]:
+        """Recalcule les agrégats et remplace l'instantané partagé"""
+        with self.engine.begin() as conn:
+            aggregates = self._aggregates(conn)
+            values = {**aggregates, "computed_at": datetime.utcnow()}
+            updated = conn.execute(
+                update(self.stats_table).where(self.stats_table.c.id == 1).values(**values)
+            ).rowcount
+        if not updated:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(self.stats_table.insert().values(id=1, **values))
+            except IntegrityError:
+                # Ligne créée entre-temps par une autre instance
+                pass
+        return aggregates
+        
+    def _eviction_order(self, policy: str) -> list:
+        """Colonnes de tri d'une politique d'éviction, chacune servie par un index"""
+        columns = self.table.c
+        return {
+            "lru": [columns.last_accessed_at],
+            "lfu": [columns.usage_count, columns.last_accessed_at],
+            "ttl": [columns.expires_at],
+        }[policy]
+        
+    def fetch(self, cache_keys: Sequence[str]) -> Dict[str, FetchedRow]:
+        """Lit les entrées demandées par requêtes IN (...) dans une seule connexion"""
+        columns = self.table.c
+        rows: Dict[str, FetchedRow] = {}
+        keys = list(cache_keys)
+        with self.engine.connect() as conn:
+            for start in range(0, len(keys), self.BULK_CHUNK_SIZE):
+                chunk = keys[start:start + self.BULK_CHUNK_SIZE]
+                result = conn.execute(
+                    select(columns.cache_key, columns.response, columns.expires_at, columns.stale_at)
+                    .where(columns.cache_key.in_(chunk))
+                )
+                for cache_key, response, expires_at, stale_at in result:
+                    rows[cache_key] = (_from_binary(response), expires_at, stale_at)
+        return rows
+        
+    def _upsert(self, values: List[Dict]):
+        """Construit l'insertion avec remplacement propre au dialecte, ou None s'il n'en a pas"""
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        statement = insert(self.table).values(values)
+        updated = {
+            name: statement.excluded[name] for name in values[0] if name != "cache_key"
+        }
+        return statement.on_conflict_do_update(index_elements=["cache_key"], set_=updated)
+        
+    def store(self, rows: Sequence[CacheRow]) -> None:
+        """Insère ou remplace des entrées en une transaction (la dernière l'emporte pour une même clé)"""
+        if not rows:
+            return
+        # Une clé en double ferait échouer l'upsert PostgreSQL (ligne modifiée deux fois)
+        rows = list({row.cache_key: row for row in rows}.values())
+        values = [{
+            "cache_key": row.cache_key,
+            "model_name": row.model_name,
+            "method": row.method,
+            "tag": row.tag,
+            "prompt": _to_binary(row.prompt),
+            "response": _to_binary(row.response),
+            "context": _to_binary(row.context),
+            "expires_at": row.expires_at,
+            "stale_at": row.stale_at,
+            "usage_count": 0,
+            "last_accessed_at": row.accessed_at,
+            "size_bytes": row.size_bytes,
+            "stored_bytes": row.stored_bytes,
+        } for row in rows]
+        
+        with self.engine.begin() as conn:
+            statement = self._upsert(values)
+            if statement is not None:
+                conn.execute(statement)
+            else:
+                # Dialecte sans upsert : suppression puis insertion dans la même transaction
+                conn.execute(delete(self.table).where(
+                    self.table.c.cache_key.in_([value["cache_key"] for value in values])
+                ))
+                conn.execute(self.table.insert(), values)
+                
+    def delete(self, cache_keys: Sequence[str]) -> None:
+        """Supprime des entrées"""
+        keys = list(cache_keys)
+        with self.engine.begin() as conn:
+            for start in range(0, len(keys), self.BULK_CHUNK_SIZE):
+                conn.execute(delete(self.table).where(
+                    self.table.c.cache_key.in_(keys[start:start + self.BULK_CHUNK_SIZE])
+                ))
+                
+    def add_usage(self, usage: Dict[str, Tuple[int, datetime]]) -> None:
+        """Ajoute les hits en attente : une seule requête exécutée pour toutes les clés (executemany)"""
+        if not usage:
+            return
+        columns = self.table.c
+        accessed_at = bindparam("accessed_at", type_=DateTime)
+        latest = (
+            func.greatest(columns.last_accessed_at, accessed_at)
+            if self.engine.dialect.name != "sqlite"
+            else func.max(columns.last_accessed_at, accessed_at)
+        )
+        statement = (
+            update(self.table)
+            .where(columns.cache_key == bindparam("key"))
+            .values(
+                usage_count=columns.usage_count + bindparam("hits", type_=Integer),
+                last_accessed_at=func.coalesce(latest, accessed_at)
+            )
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement, [
+                {"key": cache_key, "hits": hits, "accessed_at": accessed}
+                for cache_key, (hits, accessed) in usage.items()
+            ])
+            
+    def _delete_selected(self, query) -> List[str]:
+        """Supprime les entrées dont la requête sélectionne les clés (lecture puis suppression)"""
+        with self.engine.begin() as conn:
+            keys = [cache_key for (cache_key,) in conn.execute(query)]
+            if keys:
+                conn.execute(delete(self.table).where(self.table.c.cache_key.in_(keys)))
+        return keys
+        
+    def delete_expired(self, limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées expirées (via l'index sur expires_at)"""
+        columns = self.table.c
+        return self._delete_selected(
+            select(columns.cache_key).where(columns.expires_at < datetime.utcnow()).limit(limit)
+        )
+        
+    def delete_matching(self, filters: Dict[str, str], limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées correspondant aux critères"""
+        columns = self.table.c
+        conditions = [columns[INVALIDATION_COLUMNS[name]] == value for name, value in filters.items()]
+        return self._delete_selected(select(columns.cache_key).where(and_(*conditions)).limit(limit))
+        
+    def usage(self) -> Tuple[int, int]:
+        """
+        Retourne le nombre d'entrées et la taille des données stockées (en octets)
+        
+        Calcul exact à chaque appel : il décide des évictions, et n'est demandé qu'une fois
+        toutes les EVICTION_CHECK_INTERVAL écritures du cache.
+        """
+        columns = self.table.c
+        with self.engine.connect() as conn:
+            entries, stored_bytes = conn.execute(
+                select(func.count(), func.coalesce(func.sum(columns.stored_bytes), 0))
+            ).one()
+        return entries, stored_bytes
+        
+    def evict(self, count: int, policy: str) -> List[str]:
+        """Supprime count entrées dans l'ordre de la politique d'éviction"""
+        return self._delete_selected(
+            select(self.table.c.cache_key).order_by(*self._eviction_order(policy)).limit(count)
+        )
+        
+    def iter_hottest(self, limit: int) -> Iterator[HotEntry]:
+        """Parcourt les entrées valides les plus utilisées avec un curseur côté serveur"""
+        columns = self.table.c
+        query = (
+            select(self.table)
+            .where(or_(columns.expires_at.is_(None), columns.expires_at >= datetime.utcnow()))
+            .order_by(columns.usage_count.desc(), columns.last_accessed_at.desc())
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            for row in conn.execution_options(stream_results=True, yield_per=self.BULK_CHUNK_SIZE).execute(query):
+                yield CacheRow(
+                    cache_key=row.cache_key,
+                    model_name=row.model_name,
+                    method=row.method,
+                    tag=row.tag,
+                    prompt=_from_binary(row.prompt),
+                    response=_from_binary(row.response),
+                    context=_from_binary(row.context),
+                    expires_at=row.expires_at,
+                    stale_at=row.stale_at,
+                    accessed_at=row.last_accessed_at,
+                    size_bytes=row.size_bytes,
+                    stored_bytes=row.stored_bytes
+                ), row.usage_count
+                
+    def stats(self) -> Dict[str, int]:
+        """
+        Lit l'instantané partagé des agrégats, recalculé s'il a plus de STATS_TTL secondes
+        
+        Les écritures des autres instances y apparaissent avec au plus ce retard ;
+        recompute_stats force un calcul exact.
+        """
+        columns = self.stats_table.c
+        with self.engine.connect() as conn:
+            row = conn.execute(select(
+                columns.total_entries, columns.total_hits, columns.size_bytes, columns.stored_bytes,
+                columns.computed_at
+            ).where(columns.id == 1)).first()
+            # Parcours de l'index sur expires_at, limité aux seules entrées expirées
+            expired = conn.execute(
+                select(func.count()).where(self.table.c.expires_at < datetime.utcnow())
+            ).scalar_one()
+            
+        if row is None or row.computed_at is None or \
+                datetime.utcnow() - row.computed_at > timedelta(seconds=self.STATS_TTL):
+            aggregates = self._recompute_stats()
+        else:
+            aggregates = row._asdict()
+        return {
+            "total_entries": aggregates["total_entries"],
+            "total_hits": aggregates["total_hits"],
+            "logical_size_bytes": aggregates["size_bytes"],
+            "total_size_bytes": aggregates["stored_bytes"],
+            "expired_entries": expired,
+        }
+        
+    def recompute_stats(self) -> None:
+        """Recalcule exactement l'instantané des agrégats"""
+        self._recompute_stats()
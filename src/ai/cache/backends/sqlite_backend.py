@@ -0,0 +1,507 @@
+"""
+Backend SQLite du cache IA, réparti sur un ou plusieurs fichiers
+"""
+import heapq
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from src.ai.cache.backends.base import CacheBackend, CacheRow, FetchedRow, HotEntry, INVALIDATION_COLUMNS
+
+# Requêtes SQL partagées : des chaînes identiques permettent à sqlite3
+# de réutiliser les statements préparés du cache de chaque connexion
+_SQL_ADD_USAGE = """
+    UPDATE ai_cache
+    SET usage_count = usage_count + ?, last_accessed_at = MAX(COALESCE(last_accessed_at, ''), ?)
+    WHERE cache_key = ?
+"""
+_SQL_UPSERT = """
+    INSERT OR REPLACE INTO ai_cache
+    (cache_key, model_name, method, tag, prompt, response, context, expires_at, stale_at,
+     usage_count, last_accessed_at, size_bytes, stored_bytes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+"""
+_SQL_DELETE = "DELETE FROM ai_cache WHERE cache_key = ?"
+_SQL_DELETE_EXPIRED = """
+    DELETE FROM ai_cache
+    WHERE cache_key IN (
+        SELECT cache_key FROM ai_cache WHERE expires_at < datetime('now') LIMIT ?
+    )
+    RETURNING cache_key
+"""
+
+# Politiques d'éviction : ordre de suppression des entrées, chacune servie par un index
+_EVICTION_ORDER = {
+    "lru": "last_accessed_at",
+    "lfu": "usage_count, last_accessed_at",
+    "ttl": "expires_at",
+}
+_INDEXES = {
+    "idx_ai_cache_last_accessed": "last_accessed_at",
+    "idx_ai_cache_usage": "usage_count, last_accessed_at",
+    "idx_ai_cache_expires": "expires_at",
+    # Invalidation groupée par espace de noms
+    "idx_ai_cache_model": "model_name",
+    "idx_ai_cache_method": "method",
+    "idx_ai_cache_tag": "tag",
+}
+
+# Agrégats tenus à jour par des triggers : stats lit une seule ligne.
+# Avec recursive_triggers, le remplacement d'une clé (INSERT OR REPLACE)
+# déclenche aussi le trigger de suppression de l'ancienne ligne.
+_STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS ai_cache_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_entries INTEGER NOT NULL DEFAULT 0,
+        total_hits INTEGER NOT NULL DEFAULT 0,
+        size_bytes INTEGER NOT NULL DEFAULT 0,
+        stored_bytes INTEGER NOT NULL DEFAULT 0
+    )
+"""
+_STATS_TRIGGERS = {
+    "trg_ai_cache_stats_insert": """
+        AFTER INSERT ON ai_cache BEGIN
+            UPDATE ai_cache_stats SET
+                total_entries = total_entries + 1,
+                total_hits = total_hits + NEW.usage_count,
+                size_bytes = size_bytes + NEW.size_bytes,
+                stored_bytes = stored_bytes + NEW.stored_bytes
+            WHERE id = 1;
+        END
+    """,
+    "trg_ai_cache_stats_delete": """
+        AFTER DELETE ON ai_cache BEGIN
+            UPDATE ai_cache_stats SET
+                total_entries = total_entries - 1,
+                total_hits = total_hits - OLD.usage_count,
+                size_bytes = size_bytes - OLD.size_bytes,
+                stored_bytes = stored_bytes - OLD.stored_bytes
+            WHERE id = 1;
+        END
+    """,
+    "trg_ai_cache_stats_update": """
+        AFTER UPDATE OF usage_count, size_bytes, stored_bytes ON ai_cache BEGIN
+            UPDATE ai_cache_stats SET
+                total_hits = total_hits + NEW.usage_count - OLD.usage_count,
+                size_bytes = size_bytes + NEW.size_bytes - OLD.size_bytes,
+                stored_bytes = stored_bytes + NEW.stored_bytes - OLD.stored_bytes
+            WHERE id = 1;
+        END
+    """,
+}
+# Entrées valides les plus utilisées (parcours à rebours de idx_ai_cache_usage)
+_SQL_HOTTEST = """
+    SELECT usage_count, COALESCE(last_accessed_at, ''), cache_key, model_name, method, tag,
+           prompt, response, context, expires_at, stale_at, size_bytes, stored_bytes
+    FROM ai_cache
+    WHERE expires_at IS NULL OR expires_at >= datetime('now')
+    ORDER BY usage_count DESC, last_accessed_at DESC
+    LIMIT ?
+"""
+_SQL_RECOMPUTE_STATS = """
+    INSERT OR REPLACE INTO ai_cache_stats (id, total_entries, total_hits, size_bytes, stored_bytes)
+    SELECT 1, COUNT(*), COALESCE(SUM(usage_count), 0),
+           COALESCE(SUM(size_bytes), 0), COALESCE(SUM(stored_bytes), 0)
+    FROM ai_cache
+"""
+_SQL_STATS = """
+    SELECT total_entries, total_hits, size_bytes, stored_bytes
+    FROM ai_cache_stats WHERE id = 1
+"""
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Formate une date UTC comme SQLite, pour la comparer à datetime('now')"""
+    return value.isoformat(sep=' ', timespec='microseconds') if value is not None else None
+    
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Relit une date stockée au format de SQLite"""
+    return datetime.fromisoformat(value) if value else None
+    
+class _ThreadConnections:
+    """Connexions d'un thread, par shard (objet référençable faiblement, pour le finaliseur)"""
+    
+    def __init__(self):
+        self.by_shard: Dict[int, sqlite3.Connection] = {}
+        
+class SQLiteBackend(CacheBackend):
+    """Stockage SQLite local : WAL, connexions persistantes par thread, shards optionnels"""
+    
+    # Pragmas appliqués à chaque nouvelle connexion
+    PRAGMAS = {
+        # Doit précéder la création des tables pour s'appliquer à une nouvelle base
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16 * 1024,  # en KiB lorsque la valeur est négative
+        "busy_timeout": 5000,
+        "recursive_triggers": "ON",
+    }
+    STATEMENT_CACHE_SIZE = 128
+    # Nombre de clés par requête IN (...) des lectures groupées
+    BULK_CHUNK_SIZE = 500
+    
+    def __init__(self, db_path: str, shards: int = 1):
+        """
+        Initialise le backend SQLite
+        
+        Args:
+            db_path: Chemin de la base SQLite
+            shards: Nombre de fichiers SQLite, choisis d'après le préfixe de la clé ;
+                    chacun a son propre verrou d'écriture (1 pour un fichier unique)
+        """
+        if shards < 1:
+            raise ValueError(f"Nombre de shards invalide : {shards}")
+            
+        self.db_path = db_path
+        self.shards = shards
+        if shards == 1:
+            self.shard_paths = [db_path]
+        else:
+            path = Path(db_path)
+            self.shard_paths = [str(path.with_name(f"{path.stem}.{i}{path.suffix}")) for i in range(shards)]
+        # Une connexion persistante par thread et par shard
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.init_db()
+        
+    def _connect(self, shard: int = 0) -> sqlite3.Connection:
+        """Ouvre une nouvelle connexion configurée (WAL, pragmas)"""
+        conn = sqlite3.connect(
+            self.shard_paths[shard],
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
+        for pragma, value in self.PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+        
+    def _get_connection(self, shard: int = 0) -> sqlite3.Connection:
+        """Retourne la connexion persistante du thread courant vers un shard"""
+        holder = getattr(self._local, "conns", None)
+        if holder is None:
+            holder = self._local.conns = _ThreadConnections()
+            # Les données locales d'un thread sont libérées à sa fin : ses connexions sont alors fermées
+            weakref.finalize(holder, self._release_connections, holder.by_shard)
+        conn = holder.by_shard.get(shard)
+        if conn is None:
+            conn = holder.by_shard[shard] = self._connect(shard)
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+        
+    def _release_connections(self, conns: Dict[int, sqlite3.Connection]) -> None:
+        """Ferme les connexions d'un thread terminé"""
+        with self._connections_lock:
+            for conn in conns.values():
+                conn.close()
+                if conn in self._connections:
+                    self._connections.remove(conn)
+                    
+    def _shard(self, cache_key: str) -> int:
+        """Retourne le shard d'une clé, d'après son préfixe hexadécimal"""
+        return int(cache_key[:8], 16) % self.shards if self.shards > 1 else 0
+        
+    def _group_by_shard(self, cache_keys: Iterable[str]) -> Dict[int, List[str]]:
+        """Répartit des clés par shard"""
+        groups: Dict[int, List[str]] = {}
+        for cache_key in cache_keys:
+            groups.setdefault(self._shard(cache_key), []).append(cache_key)
+        return groups
+        
+    @contextmanager
+    def _transaction(self, shard: int = 0) -> Iterator[sqlite3.Connection]:
+        """Exécute un bloc dans une transaction explicite"""
+        conn = self._get_connection(shard)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        
+    def close(self) -> None:
+        """Ferme les connexions de tous les threads"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+        
+    def init_db(self) -> None:
+        """Initialise la base de données SQLite (chaque shard)"""
+        for shard in range(self.shards):
+            self._init_shard(shard)
+            
+    def _init_shard(self, shard: int) -> None:
+        """Crée ou migre la table du cache d'un shard"""
+        conn = self._get_connection(shard)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                cache_key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                context TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP,
+                usage_count INTEGER DEFAULT 1,
+                last_accessed_at TIMESTAMP,
+                size_bytes INTEGER DEFAULT 0,
+                stored_bytes INTEGER DEFAULT 0,
+                stale_at TIMESTAMP,
+                method TEXT,
+                tag TEXT
+            )
+        """)
+        
+        # Migration des bases créées avant l'ajout des colonnes d'éviction
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(ai_cache)")}
+        if "last_accessed_at" not in columns:
+            conn.execute("ALTER TABLE ai_cache ADD COLUMN last_accessed_at TIMESTAMP")
+        if "size_bytes" not in columns:
+            conn.execute("ALTER TABLE ai_cache ADD COLUMN size_bytes INTEGER DEFAULT 0")
+            conn.execute("""
+                UPDATE ai_cache SET size_bytes =
+                    LENGTH(CAST(prompt AS BLOB)) + LENGTH(CAST(response AS BLOB))
+                    + COALESCE(LENGTH(CAST(context AS BLOB)), 0)
+            """)
+        if "stored_bytes" not in columns:
+            conn.execute("ALTER TABLE ai_cache ADD COLUMN stored_bytes INTEGER DEFAULT 0")
+            conn.execute("UPDATE ai_cache SET stored_bytes = size_bytes")
+        if "stale_at" not in columns:
+            conn.execute("ALTER TABLE ai_cache ADD COLUMN stale_at TIMESTAMP")
+        for column in ("method", "tag"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE ai_cache ADD COLUMN {column} TEXT")
+                
+        # Migrations à parcours complet : exécutées une seule fois, numérotées par user_version
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Dates locales au format ISO converties au format UTC de SQLite
+            conn.execute("""
+                UPDATE ai_cache
+                SET expires_at = strftime('%Y-%m-%d %H:%M:%f', expires_at, 'utc')
+                WHERE expires_at LIKE '%T%'
+            """)
+            conn.execute("PRAGMA user_version = 1")
+            
+        for name, columns in _INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ai_cache ({columns})")
+            
+        with self._transaction(shard) as conn:
+            conn.execute(_STATS_TABLE)
+            for name, body in _STATS_TRIGGERS.items():
+                conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            # Base existante ou nouvelle : les agrégats partent d'un calcul exact
+            if conn.execute(_SQL_STATS).fetchone() is None:
+                conn.execute(_SQL_RECOMPUTE_STATS)
+                
+        # Migration des bases créées sans auto_vacuum : le pragma ne s'applique à une base
+        # existante qu'après un VACUUM complet, exécuté une seule fois
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # INCREMENTAL
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            
+    def recompute_stats(self) -> None:
+        """Recalcule exactement les agrégats de la table ai_cache_stats"""
+        for shard in range(self.shards):
+            with self._transaction(shard) as conn:
+                conn.execute(_SQL_RECOMPUTE_STATS)
+                
+    def fetch(self, cache_keys: Sequence[str]) -> Dict[str, FetchedRow]:
+        """Lit les entrées demandées, par requêtes IN (...) dans une transaction par shard"""
+        rows: Dict[str, FetchedRow] = {}
+        for shard, shard_keys in self._group_by_shard(cache_keys).items():
+            conn = self._get_connection(shard)
+            conn.execute("BEGIN")
+            try:
+                for start in range(0, len(shard_keys), self.BULK_CHUNK_SIZE):
+                    chunk = shard_keys[start:start + self.BULK_CHUNK_SIZE]
+                    placeholders = ", ".join("?" * len(chunk))
+                    cursor = conn.execute(
+                        f"SELECT cache_key, response, expires_at, stale_at FROM ai_cache "
+                        f"WHERE cache_key IN ({placeholders})",
+                        chunk
+                    )
+                    for cache_key, response, expires_at, stale_at in cursor:
+                        rows[cache_key] = (response, _parse_timestamp(expires_at), _parse_timestamp(stale_at))
+            finally:
+                conn.execute("COMMIT")
+        return rows
+        
+    def _row_params(self, row: CacheRow) -> Tuple:
+        """Paramètres de _SQL_UPSERT pour une entrée"""
+        return (
+            row.cache_key,
+            row.model_name,
+            row.method,
+            row.tag,
+            row.prompt,
+            row.response,
+            row.context,
+            _timestamp(row.expires_at),
+            _timestamp(row.stale_at),
+            _timestamp(row.accessed_at),
+            row.size_bytes,
+            row.stored_bytes
+        )
+        
+    def store(self, rows: Sequence[CacheRow]) -> None:
+        """Écrit les entrées, en une transaction par shard"""
+        if len(rows) == 1:
+            # Écriture unitaire : une instruction suffit, sans transaction explicite
+            row = rows[0]
+            self._get_connection(self._shard(row.cache_key)).execute(_SQL_UPSERT, self._row_params(row))
+            return
+            
+        params_by_shard: Dict[int, List[Tuple]] = {}
+        for row in rows:
+            params_by_shard.setdefault(self._shard(row.cache_key), []).append(self._row_params(row))
+        for shard, params in params_by_shard.items():
+            with self._transaction(shard) as conn:
+                conn.executemany(_SQL_UPSERT, params)
+                
+    def delete(self, cache_keys: Sequence[str]) -> None:
+        """Supprime des entrées"""
+        for shard, shard_keys in self._group_by_shard(cache_keys).items():
+            conn = self._get_connection(shard)
+            if len(shard_keys) == 1:
+                conn.execute(_SQL_DELETE, (shard_keys[0],))
+            else:
+                with self._transaction(shard) as conn:
+                    conn.executemany(_SQL_DELETE, [(cache_key,) for cache_key in shard_keys])
+                    
+    def add_usage(self, usage: Dict[str, Tuple[int, datetime]]) -> None:
+        """Ajoute les hits en attente, en une transaction par shard"""
+        for shard, keys in self._group_by_shard(usage).items():
+            with self._transaction(shard) as conn:
+                conn.executemany(_SQL_ADD_USAGE, [
+                    (usage[key][0], _timestamp(usage[key][1]), key) for key in keys
+                ])
+                
+    def delete_expired(self, limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées expirées par shard (via l'index sur expires_at)"""
+        deleted: List[str] = []
+        for shard in range(self.shards):
+            cursor = self._get_connection(shard).execute(_SQL_DELETE_EXPIRED, (limit,))
+            deleted.extend(cache_key for (cache_key,) in cursor.fetchall())
+        return deleted
+        
+    def delete_matching(self, filters: Dict[str, str], limit: int) -> List[str]:
+        """Supprime un lot borné d'entrées par shard, via l'index de chaque critère"""
+        where = " AND ".join(f"{INVALIDATION_COLUMNS[name]} = ?" for name in filters)
+        query = f"""
+            DELETE FROM ai_cache
+            WHERE cache_key IN (SELECT cache_key FROM ai_cache WHERE {where} LIMIT ?)
+            RETURNING cache_key
+        """
+        params = [*filters.values(), limit]
+        
+        deleted: List[str] = []
+        for shard in range(self.shards):
+            # Un lot par transaction : les écritures concurrentes ne sont bloquées que brièvement
+            cursor = self._get_connection(shard).execute(query, params)
+            deleted.extend(cache_key for (cache_key,) in cursor.fetchall())
+        return deleted
+        
+    def _shard_usage(self, shard: int) -> Tuple[int, int]:
+        """Retourne le nombre d'entrées et la taille stockée d'un shard"""
+        entries, _, _, stored_bytes = self._get_connection(shard).execute(_SQL_STATS).fetchone()
+        return entries, stored_bytes
+        
+    def usage(self) -> Tuple[int, int]:
+        """Retourne le nombre d'entrées et la taille des données stockées (en octets)"""
+        entries = stored_bytes = 0
+        for shard in range(self.shards):
+            shard_entries, shard_bytes = self._shard_usage(shard)
+            entries += shard_entries
+            stored_bytes += shard_bytes
+        return entries, stored_bytes
+        
+    def _evict_shard(self, shard: int, count: int, policy: str) -> List[str]:
+        """Supprime count entrées d'un shard selon la politique d'éviction"""
+        # Le parcours de l'index de la politique évite un tri de toute la table
+        cursor = self._get_connection(shard).execute(f"""
+            DELETE FROM ai_cache
+            WHERE cache_key IN (
+                SELECT cache_key FROM ai_cache ORDER BY {_EVICTION_ORDER[policy]} LIMIT ?
+            )
+            RETURNING cache_key
+        """, (count,))
+        return [cache_key for (cache_key,) in cursor.fetchall()]
+        
+    def evict(self, count: int, policy: str) -> List[str]:
+        """Supprime count entrées, réparties entre les shards"""
+        per_shard = -(-count // self.shards)
+        evicted: List[str] = []
+        for shard in range(self.shards):
+            evicted.extend(self._evict_shard(shard, per_shard, policy))
+        return evicted
+        
+    def enforce_limits(self, max_entries: Optional[float], max_size_bytes: Optional[float],
+                       policy: str, target_ratio: float) -> List[str]:
+        """Applique les limites shard par shard"""
+        # Les clés étant réparties uniformément, chaque shard reçoit une part égale des limites
+        if max_entries is not None:
+            max_entries /= self.shards
+        if max_size_bytes is not None:
+            max_size_bytes /= self.shards
+            
+        evicted: List[str] = []
+        for shard in range(self.shards):
+            evicted.extend(self._evict_to_limits(
+                lambda: self._shard_usage(shard),
+                lambda count: self._evict_shard(shard, count, policy),
+                max_entries, max_size_bytes, target_ratio
+            ))
+        return evicted
+        
+    def iter_hottest(self, limit: int) -> Iterator[HotEntry]:
+        """Fusionne les curseurs triés de chaque shard, sans charger les entrées en mémoire"""
+        cursors = [self._get_connection(shard).execute(_SQL_HOTTEST, (limit,)) for shard in range(self.shards)]
+        merged = heapq.merge(*cursors, key=lambda row: (row[0], row[1]), reverse=True)
+        for count, row in enumerate(merged):
+            if count >= limit:
+                break
+            usage_count, accessed_at, *columns = row
+            expires_at, stale_at, size_bytes, stored_bytes = columns[7:]
+            yield CacheRow(
+                *columns[:7],
+                expires_at=_parse_timestamp(expires_at),
+                stale_at=_parse_timestamp(stale_at),
+                accessed_at=_parse_timestamp(accessed_at),
+                size_bytes=size_bytes,
+                stored_bytes=stored_bytes
+            ), usage_count
+            
+    def stats(self) -> Dict[str, int]:
+        """Additionne les agrégats tenus par les triggers de chaque shard"""
+        stats = dict.fromkeys(
+            ("total_entries", "total_hits", "logical_size_bytes", "total_size_bytes", "expired_entries"), 0
+        )
+        for shard in range(self.shards):
+            conn = self._get_connection(shard)
+            entries, hits, logical_bytes, stored_bytes = conn.execute(_SQL_STATS).fetchone()
+            stats["total_entries"] += entries
+            stats["total_hits"] += hits
+            stats["logical_size_bytes"] += logical_bytes
+            stats["total_size_bytes"] += stored_bytes
+            # Parcours de l'index sur expires_at, limité aux seules entrées expirées
+            stats["expired_entries"] += conn.execute(
+                "SELECT COUNT(*) FROM ai_cache WHERE expires_at < datetime('now')"
+            ).fetchone()[0]
+        return stats
+        
+    def vacuum(self, pages: int) -> None:
+        """Rend au système les pages libérées (auto_vacuum incrémental)"""
+        for shard in range(self.shards):
+            # executescript exécute le pragma jusqu'au bout (execute ne libère qu'une page)
+            self._get_connection(shard).executescript(f"PRAGMA incremental_vacuum({int(pages)});")
@@ -2,136 +2,701 @@
 Gestionnaire de cache pour les réponses des modèles d'IA
 """
 import json
+import time
+import atexit
+import asyncio
 import hashlib
-import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Tuple
 from src.config import settings
-
+from src.ai.cache.memory_tier import LRUMemoryTier
+from src.ai.cache.compression import ValueCompressor, decode_value, stored_size
+from src.ai.cache.history import history_digest
+from src.ai.cache.snapshot import SnapshotEntry, read_snapshot, write_snapshot
+from src.ai.cache.backends.base import CacheBackend, CacheRow, EVICTION_POLICIES
+from src.ai.cache.backends.factory import CacheBackendFactory
+    
 class AIResponseCache:
     """Gestionnaire de cache pour les réponses des modèles d'IA"""
     
-    def __init__(self, db_path: Optional[str] = None):
-        """Initialise le gestionnaire de cache"""
-        if db_path is None:
-            db_path = Path(settings.DATABASE_URL.replace('sqlite:///', ''))
-            
-        self.db_path = db_path
-        self.init_db()
-        
-    def init_db(self) -> None:
-        """Initialise la base de données SQLite"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS ai_cache (
-                    cache_key TEXT PRIMARY KEY,
-                    model_name TEXT NOT NULL,
-                    prompt TEXT NOT NULL,
-                    response TEXT NOT NULL,
-                    context TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP,
-                    usage_count INTEGER DEFAULT 1
-                )
-            """)
-            
-    def _generate_cache_key(self, model_name: str, prompt: str, context: Optional[Dict] = None) -> str:
-        """Génère une clé de cache unique"""
-        key_parts = [model_name, prompt]
+    # Threads dédiés aux accès disque de l'API asynchrone
+    EXECUTOR_WORKERS = 4
+    # Écriture différée des compteurs d'utilisation
+    HIT_FLUSH_THRESHOLD = 256  # nombre de clés en attente
+    HIT_FLUSH_INTERVAL = 5.0  # secondes
+    # Vérification des limites de taille toutes les N écritures
+    EVICTION_CHECK_INTERVAL = 100
+    # Après éviction, la taille redescend à cette fraction des limites
+    EVICTION_TARGET_RATIO = 0.9
+    # Nettoyage des entrées expirées par lots bornés
+    SWEEP_BATCH_SIZE = 500
+    VACUUM_PAGES = 256
+    INVALIDATION_BATCH_SIZE = 500
+    # Instantanés : nombre d'entrées exportées par défaut et taille des lots importés
+    SNAPSHOT_MAX_ENTRIES = 10000
+    SNAPSHOT_IMPORT_BATCH_SIZE = 500
+    
+    def __init__(self, db_path: Optional[str] = None,
+                 memory_max_entries: int = 1024,
+                 memory_max_bytes: int = 16 * 1024 * 1024,
+                 max_entries: Optional[int] = None,
+                 max_size_bytes: Optional[int] = None,
+                 eviction_policy: str = "lru",
+                 compression: Optional[str] = None,
+                 compression_threshold: int = 512,
+                 shards: int = 1,
+                 backend: Optional[CacheBackend] = None,
+                 memory_max_age: Optional[float] = None):
+        """
+        Initialise le gestionnaire de cache
+        
+        Args:
+            db_path: Chemin de la base SQLite (backend par défaut, AI_CACHE_PATH si absent)
+            memory_max_entries: Nombre maximal d'entrées du cache mémoire (0 pour le désactiver)
+            memory_max_bytes: Taille maximale du cache mémoire en octets
+            max_entries: Nombre maximal d'entrées stockées (None pour ne pas limiter)
+            max_size_bytes: Taille maximale des données stockées, en octets (None pour ne pas limiter)
+            eviction_policy: Politique d'éviction ('lru', 'lfu' ou 'ttl')
+            compression: Codec de compression des colonnes prompt/response/context (None pour désactiver)
+            compression_threshold: Taille en octets en dessous de laquelle les valeurs restent brutes
+            shards: Nombre de fichiers SQLite du backend par défaut (voir SQLiteBackend)
+            backend: Stockage des entrées (par défaut un SQLiteBackend sur db_path)
+            memory_max_age: Durée de conservation en mémoire d'une entrée, en secondes ; par défaut
+                            AI_CACHE_MEMORY_MAX_AGE pour un backend partagé, sans limite sinon
+        """
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"Politique d'éviction non supportée : {eviction_policy}")
+            
+        if backend is None:
+            backend = CacheBackendFactory.create_backend(
+                "sqlite", db_path=db_path or settings.AI_CACHE_PATH, shards=shards
+            )
+        self.backend = backend
+        self.db_path = getattr(backend, "db_path", None)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # Niveau mémoire servi avant le backend (écriture simultanée dans les deux). Avec un backend
+        # partagé, les suppressions des autres instances n'y apparaissent qu'après memory_max_age
+        if memory_max_age is None and backend.shared:
+            memory_max_age = settings.AI_CACHE_MEMORY_MAX_AGE
+        self.memory = LRUMemoryTier(memory_max_entries, memory_max_bytes, memory_max_age)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        # Compteurs en attente d'écriture (cache_key -> (hits, dernier accès))
+        self._pending_hits: Dict[str, Tuple[int, datetime]] = {}
+        self._hits_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Limites de taille et éviction
+        self.max_entries = max_entries
+        self.max_size_bytes = max_size_bytes
+        self.eviction_policy = eviction_policy
+        self._writes_since_check = 0
+        self.evictions = 0
+        # Stale-while-revalidate : réponses périmées servies et rafraîchissements effectués
+        self.stale_serves = 0
+        self.stale_refreshes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        # Compression transparente des valeurs volumineuses
+        self.compressor = ValueCompressor(compression, compression_threshold) if compression else None
+        
+    def _get_connection(self, shard: int = 0):
+        """Retourne la connexion du thread courant vers un shard (backend SQLite uniquement)"""
+        return self.backend._get_connection(shard)
+        
+    def close(self) -> None:
+        """Écrit les compteurs en attente puis libère les ressources du backend"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.flush_hits()
+        self.backend.close()
+                
+    def recompute_stats(self) -> None:
+        """Recalcule exactement les agrégats maintenus par le backend"""
+        self.flush_hits()
+        self.backend.recompute_stats()
+            
+    def _generate_cache_key(self, model_name: str, prompt: str, context: Optional[Dict] = None,
+                            method: Optional[str] = None, tag: Optional[str] = None) -> str:
+        """
+        Génère une clé de cache unique
+        
+        Args:
+            method: Distingue les méthodes d'un même modèle
+            tag: Étiquette (ex : version du template de prompt) ; la changer rend
+                 les anciennes entrées inaccessibles jusqu'à leur expiration
+        """
+        key_parts = [model_name]
+        if method:
+            key_parts.append(method)
+        if tag:
+            key_parts.append(f"#{tag}")
+        key_parts.append(prompt)
         if context:
-            key_parts.append(json.dumps(context, sort_keys=True))
+            history = context.get('conversation_history')
+            if isinstance(history, list):
+                # L'historique est représenté par son empreinte chaînée plutôt que sérialisé
+                rest = {k: v for k, v in context.items() if k != 'conversation_history'}
+                key_parts.append(json.dumps(rest, sort_keys=True))
+                key_parts.append(history_digest(history))
+            else:
+                key_parts.append(json.dumps(context, sort_keys=True))
             
         key_string = "|".join(key_parts)
         return hashlib.sha256(key_string.encode()).hexdigest()
         
-    def get(self, model_name: str, prompt: str, context: Optional[Dict] = None) -> Optional[str]:
+    def get(self, model_name: str, prompt: str, context: Optional[Dict] = None,
+            method: Optional[str] = None, tag: Optional[str] = None) -> Optional[str]:
         """Récupère une réponse du cache"""
-        cache_key = self._generate_cache_key(model_name, prompt, context)
+        entry = self.get_entry(model_name, prompt, context, method, tag)
+        return entry[0] if entry is not None else None
+        
+    def get_entry(self, model_name: str, prompt: str, context: Optional[Dict] = None,
+                  method: Optional[str] = None, tag: Optional[str] = None) -> Optional[Tuple[str, bool]]:
+        """
+        Récupère une réponse et indique si elle est périmée
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT response, expires_at, usage_count 
-                FROM ai_cache 
-                WHERE cache_key = ?
-            """, (cache_key,))
+        Returns:
+            (réponse, périmée) ou None. Une réponse périmée a dépassé sa durée de vie
+            mais reste dans sa fenêtre de grâce (stale-while-revalidate).
+        """
+        cache_key = self._generate_cache_key(model_name, prompt, context, method, tag)
+        
+        # Niveau mémoire : aucun accès au backend pour les clés chaudes
+        entry = self.memory.get_entry(cache_key)
+        if entry is None:
+            entry = self._get_from_disk(cache_key)
+        if entry is None:
+            return None
             
-            result = cursor.fetchone()
+        if self._record_hit(cache_key):
+            self.flush_hits()
+        return self._check_stale(*entry)
+        
+    def _check_stale(self, response: str, stale_at: Optional[datetime]) -> Tuple[str, bool]:
+        """Indique si une réponse a dépassé sa durée de fraîcheur"""
+        stale = stale_at is not None and stale_at < datetime.utcnow()
+        if stale:
+            self.stale_serves += 1
+        return response, stale
+        
+    def _get_from_disk(self, cache_key: str) -> Optional[Tuple[str, Optional[datetime]]]:
+        """Récupère une réponse et sa date de péremption depuis le backend, et la promeut en mémoire"""
+        row = self.backend.fetch((cache_key,)).get(cache_key)
+        if row is None:
+            self.disk_misses += 1
+            return None
+        return self._load_row(cache_key, *row)
             
-            if result:
-                response, expires_at, usage_count = result
+    def _load_row(self, cache_key: str, response: Any, expires_at: Optional[datetime],
+                  stale_at: Optional[datetime]) -> Optional[Tuple[str, Optional[datetime]]]:
+        """Décode une entrée lue dans le backend et la promeut en mémoire si elle est valide"""
+        response = decode_value(response)
                 
-                # Vérifie si le cache est expiré
-                if expires_at and datetime.fromisoformat(expires_at) < datetime.now():
-                    self.delete(cache_key)
-                    return None
+        # Une entrée expirée est un simple miss : sa suppression revient au nettoyage
+        if expires_at and expires_at < datetime.utcnow():
+            self.disk_misses += 1
+            return None
                 
-                # Incrémente le compteur d'utilisation
-                conn.execute("""
-                    UPDATE ai_cache 
-                    SET usage_count = ? 
-                    WHERE cache_key = ?
-                """, (usage_count + 1, cache_key))
+        self.disk_hits += 1
+        self.memory.set(cache_key, response, expires_at, stale_at)
+        return response, stale_at
                 
-                return response
+    def get_many(self, requests: Iterable[Tuple]) -> List[Optional[str]]:
+        """
+        Récupère plusieurs réponses en une seule lecture groupée du backend
+        
+        Args:
+            requests: Tuples (model_name, prompt[, context[, method[, tag]]])
+            
+        Returns:
+            Les réponses (None pour les absentes), dans l'ordre des requêtes
+        """
+        return [entry[0] if entry is not None else None for entry in self.get_many_entries(requests)]
+        
+    def get_many_entries(self, requests: Iterable[Tuple]) -> List[Optional[Tuple[str, bool]]]:
+        """
+        Récupère plusieurs réponses en une seule lecture groupée, en indiquant si elles sont périmées
+        
+        Args:
+            requests: Tuples (model_name, prompt[, context[, method[, tag]]])
+            
+        Returns:
+            (réponse, périmée) ou None pour chaque requête, dans l'ordre des requêtes
+        """
+        keys = [self._generate_cache_key(*request) for request in requests]
+        entries: Dict[str, Optional[Tuple[str, Optional[datetime]]]] = {}
+        
+        missing = []
+        for cache_key in dict.fromkeys(keys):
+            entry = self.memory.get_entry(cache_key)
+            if entry is not None:
+                entries[cache_key] = entry
+            else:
+                missing.append(cache_key)
                 
-        return None
-        
-    def set(self, model_name: str, prompt: str, response: str, 
-            context: Optional[Dict] = None, ttl_hours: int = 24) -> None:
-        """Stocke une réponse dans le cache"""
-        cache_key = self._generate_cache_key(model_name, prompt, context)
-        expires_at = datetime.now() + timedelta(hours=ttl_hours)
-        
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO ai_cache 
-                (cache_key, model_name, prompt, response, context, expires_at) 
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                cache_key,
-                model_name,
-                prompt,
-                response,
-                json.dumps(context) if context else None,
-                expires_at.isoformat()
-            ))
+        rows = self.backend.fetch(missing) if missing else {}
+        for cache_key in missing:
+            if cache_key in rows:
+                entries[cache_key] = self._load_row(cache_key, *rows[cache_key])
+            else:
+                self.disk_misses += 1
+                    
+        if self._record_hits([cache_key for cache_key in keys if entries.get(cache_key) is not None]):
+            self.flush_hits()
+            
+        return [
+            self._check_stale(*entries[cache_key]) if entries.get(cache_key) is not None else None
+            for cache_key in keys
+        ]
+        
+    def _build_row(self, model_name: str, prompt: str, response: str,
+                   context: Optional[Dict] = None, ttl_hours: int = 24,
+                   method: Optional[str] = None, stale_grace_hours: float = 0,
+                   tag: Optional[str] = None) -> CacheRow:
+        """Prépare l'entrée à stocker pour une réponse"""
+        cache_key = self._generate_cache_key(model_name, prompt, context, method, tag)
+        now = datetime.utcnow()
+        # Avec une fenêtre de grâce, l'entrée est périmée après ttl_hours
+        # mais n'expire qu'à la fin de la fenêtre
+        stale_at = now + timedelta(hours=ttl_hours) if stale_grace_hours else None
+        expires_at = now + timedelta(hours=ttl_hours + stale_grace_hours)
+        context_json = json.dumps(context) if context else None
+        return self._make_row(cache_key, model_name, method, tag, prompt, response, context_json,
+                              expires_at, stale_at, now)
+                              
+    def _make_row(self, cache_key: str, model_name: str, method: Optional[str], tag: Optional[str],
+                  prompt: str, response: str, context_json: Optional[str], expires_at: datetime,
+                  stale_at: Optional[datetime], accessed_at: datetime) -> CacheRow:
+        """Mesure et compresse les valeurs d'une entrée"""
+        values = {"prompt": prompt, "response": response, "context": context_json}
+        size_bytes = sum(stored_size(value) for value in values.values())
+        if self.compressor is not None:
+            values = {column: self.compressor.encode(column, value) for column, value in values.items()}
+        
+        return CacheRow(
+            cache_key=cache_key,
+            model_name=model_name,
+            method=method,
+            tag=tag,
+            prompt=values["prompt"],
+            response=values["response"],
+            context=values["context"],
+            expires_at=expires_at,
+            stale_at=stale_at,
+            accessed_at=accessed_at,
+            size_bytes=size_bytes,
+            stored_bytes=sum(stored_size(value) for value in values.values())
+        )
+        
+    def _after_write(self, count: int) -> None:
+        """Vérifie les limites de taille toutes les EVICTION_CHECK_INTERVAL écritures"""
+        self._writes_since_check += count
+        if self._writes_since_check >= self.EVICTION_CHECK_INTERVAL:
+            self.enforce_limits()
+            
+    def set(self, model_name: str, prompt: str, response: str,
+            context: Optional[Dict] = None, ttl_hours: int = 24, method: Optional[str] = None,
+            stale_grace_hours: float = 0, tag: Optional[str] = None) -> None:
+        """
+        Stocke une réponse dans le cache
+        
+        Args:
+            method: Méthode du modèle (clé et espace de noms d'invalidation)
+            stale_grace_hours: Fenêtre pendant laquelle la réponse reste servie, marquée
+                               périmée, après ses ttl_hours (voir get_entry)
+            tag: Étiquette de la clé et espace de noms d'invalidation (ex : version du template)
+        """
+        row = self._build_row(model_name, prompt, response, context, ttl_hours, method, stale_grace_hours, tag)
+        
+        self.backend.store((row,))
+        self.memory.set(row.cache_key, response, row.expires_at, row.stale_at)
+        self._after_write(1)
+        
+    def set_many(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """
+        Stocke plusieurs réponses en une seule transaction
+        
+        Args:
+            entries: Dictionnaires reprenant les arguments de set
+                     (model_name, prompt, response, et optionnellement context, ttl_hours,
+                     method, stale_grace_hours, tag)
+        """
+        prepared = [(entry["response"], self._build_row(**entry)) for entry in entries]
+        if not prepared:
+            return
+            
+        self.backend.store([row for _, row in prepared])
+        for response, row in prepared:
+            self.memory.set(row.cache_key, response, row.expires_at, row.stale_at)
+        self._after_write(len(prepared))
             
     def delete(self, cache_key: str) -> None:
         """Supprime une entrée du cache"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("DELETE FROM ai_cache WHERE cache_key = ?", (cache_key,))
+        self.memory.delete(cache_key)
+        self.backend.delete((cache_key,))
+        
+    def invalidate(self, model: Optional[str] = None, method: Optional[str] = None,
+                   tag: Optional[str] = None, batch_size: Optional[int] = None) -> int:
+        """
+        Supprime, par lots indexés, toutes les entrées d'un espace de noms
+        
+        Les filtres fournis se combinent (ex : invalidate(model="gpt-4", method="generate_post")).
+        Avec un backend partagé, les autres instances cessent de servir les entrées supprimées
+        au plus tard après memory_max_age secondes (cohérence à terme de leur niveau mémoire).
+        
+        Args:
+            model: Nom du modèle
+            method: Méthode du modèle
+            tag: Étiquette (ex : version du template)
+            batch_size: Nombre d'entrées supprimées par transaction
+            
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        filters = {"model": model, "method": method, "tag": tag}
+        filters = {name: value for name, value in filters.items() if value is not None}
+        if not filters:
+            raise ValueError("Au moins un critère d'invalidation est requis (model, method ou tag)")
+            
+        deleted = 0
+        # Un lot par transaction : les écritures concurrentes ne sont bloquées que brièvement
+        while True:
+            keys = self.backend.delete_matching(filters, batch_size or self.INVALIDATION_BATCH_SIZE)
+            for cache_key in keys:
+                self.memory.delete(cache_key)
+            deleted += len(keys)
+            if not keys:
+                return deleted
+            
+    def _record_hit(self, cache_key: str) -> bool:
+        """
+        Comptabilise un hit en mémoire, sans écriture dans le backend
+        
+        Returns:
+            True si les compteurs en attente doivent être écrits
+        """
+        return self._record_hits((cache_key,))
+        
+    def _record_hits(self, cache_keys: Iterable[str]) -> bool:
+        """Comptabilise plusieurs hits sous un seul verrou (voir _record_hit)"""
+        accessed_at = datetime.utcnow()
+        with self._hits_lock:
+            pending = self._pending_hits
+            for cache_key in cache_keys:
+                hits, _ = pending.get(cache_key, (0, None))
+                pending[cache_key] = (hits + 1, accessed_at)
+            return (len(pending) >= self.HIT_FLUSH_THRESHOLD
+                    or time.monotonic() - self._last_flush >= self.HIT_FLUSH_INTERVAL)
+                    
+    def flush_hits(self) -> int:
+        """
+        Écrit dans le backend, en une transaction, les compteurs d'utilisation en attente
+        
+        Returns:
+            Nombre d'entrées mises à jour
+        """
+        with self._hits_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+            self._last_flush = time.monotonic()
+            
+        if not pending:
+            return 0
+            
+        self.backend.add_usage(pending)
+        return len(pending)
+        
+    def enforce_limits(self) -> int:
+        """
+        Évince des entrées tant que le cache dépasse ses limites de taille
+        
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        self._writes_since_check = 0
+        if self.max_entries is None and self.max_size_bytes is None:
+            return 0
             
+        # Les choix LRU/LFU reposent sur les compteurs d'utilisation : ceux en attente d'abord
+        self.flush_hits()
+        evicted = self.backend.enforce_limits(
+            self.max_entries, self.max_size_bytes, self.eviction_policy, self.EVICTION_TARGET_RATIO
+        )
+        for cache_key in evicted:
+            self.memory.delete(cache_key)
+        self.evictions += len(evicted)
+        return len(evicted)
+        
+    async def _run(self, func, *args):
+        """Exécute un appel bloquant au backend dans le pool de threads du cache"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(self.EXECUTOR_WORKERS, getattr(self.backend, "shards", 1)),
+                        thread_name_prefix="ai-cache"
+                    )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+        
+    async def aget(self, model_name: str, prompt: str, context: Optional[Dict] = None,
+                   method: Optional[str] = None, tag: Optional[str] = None) -> Optional[str]:
+        """Version asynchrone de get : seuls les accès au backend quittent la boucle d'événements"""
+        entry = await self.aget_entry(model_name, prompt, context, method, tag)
+        return entry[0] if entry is not None else None
+        
+    async def aget_entry(self, model_name: str, prompt: str, context: Optional[Dict] = None,
+                         method: Optional[str] = None, tag: Optional[str] = None) -> Optional[Tuple[str, bool]]:
+        """Version asynchrone de get_entry"""
+        cache_key = self._generate_cache_key(model_name, prompt, context, method, tag)
+        
+        entry = self.memory.get_entry(cache_key)
+        if entry is None:
+            entry = await self._run(self._get_from_disk, cache_key)
+        if entry is None:
+            return None
+            
+        if self._record_hit(cache_key):
+            await self._run(self.flush_hits)
+        return self._check_stale(*entry)
+        
+    async def aset(self, model_name: str, prompt: str, response: str,
+                   context: Optional[Dict] = None, ttl_hours: int = 24, method: Optional[str] = None,
+                   stale_grace_hours: float = 0, tag: Optional[str] = None) -> None:
+        """Version asynchrone de set"""
+        await self._run(self.set, model_name, prompt, response, context, ttl_hours, method,
+                        stale_grace_hours, tag)
+        
+    async def aget_many(self, requests: Iterable[Tuple]) -> List[Optional[str]]:
+        """Version asynchrone de get_many"""
+        return await self._run(self.get_many, list(requests))
+        
+    async def aget_many_entries(self, requests: Iterable[Tuple]) -> List[Optional[Tuple[str, bool]]]:
+        """Version asynchrone de get_many_entries"""
+        return await self._run(self.get_many_entries, list(requests))
+        
+    async def aset_many(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Version asynchrone de set_many"""
+        await self._run(self.set_many, list(entries))
+        
+    async def adelete(self, cache_key: str) -> None:
+        """Version asynchrone de delete"""
+        await self._run(self.delete, cache_key)
+        
+    async def ainvalidate(self, model: Optional[str] = None, method: Optional[str] = None,
+                          tag: Optional[str] = None) -> int:
+        """Version asynchrone de invalidate"""
+        return await self._run(self.invalidate, model, method, tag)
+        
+    def sweep_expired(self, batch_size: Optional[int] = None) -> int:
+        """
+        Supprime un lot borné d'entrées expirées (un lot par shard pour le backend SQLite)
+        
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        keys = self.backend.delete_expired(batch_size or self.SWEEP_BATCH_SIZE)
+        for cache_key in keys:
+            self.memory.delete(cache_key)
+        return len(keys)
+        
+    def vacuum(self, pages: Optional[int] = None) -> None:
+        """Rend au système l'espace libéré par les suppressions"""
+        self.backend.vacuum(pages or self.VACUUM_PAGES)
+        
     def clear_expired(self) -> int:
         """Nettoie les entrées expirées du cache"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                DELETE FROM ai_cache 
-                WHERE expires_at < datetime('now')
-            """)
-            return cursor.rowcount
+        deleted = 0
+        while True:
+            removed = self.sweep_expired()
+            deleted += removed
+            # Un shard au lot complet suffit à atteindre SWEEP_BATCH_SIZE
+            if removed < self.SWEEP_BATCH_SIZE:
+                return deleted
+                
+    async def _sweep_loop(self, interval: float) -> None:
+        """Boucle de nettoyage périodique : compteurs d'utilisation en attente, entrées expirées"""
+        while True:
+            try:
+                # Un processus inactif écrit aussi ses compteurs, sans attendre le prochain hit
+                await self._run(self.flush_hits)
+                while await self._run(self.sweep_expired) >= self.SWEEP_BATCH_SIZE:
+                    # Laisse la main aux autres tâches entre deux lots
+                    await asyncio.sleep(0)
+                await self._run(self.vacuum)
+            except Exception as e:
+                print(f"Erreur de nettoyage du cache: {str(e)}")
+            await asyncio.sleep(interval)
+            
+    def start_sweeper(self, interval: float = 300) -> asyncio.Task:
+        """
+        Démarre la tâche de fond qui supprime les entrées expirées
+        
+        Args:
+            interval: Délai entre deux passes, en secondes
+        """
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop(interval))
+        return self._sweeper
+        
+    async def stop_sweeper(self) -> None:
+        """Arrête la tâche de nettoyage"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
             
+    def export_snapshot(self, path: str, limit: Optional[int] = None) -> int:
+        """
+        Exporte les entrées valides les plus utilisées, sans charger tout le cache en mémoire
+        
+        Args:
+            path: Fichier de l'instantané (JSON Lines compressé en gzip)
+            limit: Nombre maximal d'entrées (SNAPSHOT_MAX_ENTRIES par défaut)
+            
+        Returns:
+            Nombre d'entrées exportées
+        """
+        self.flush_hits()
+        entries = (
+            SnapshotEntry(
+                row.cache_key, row.model_name, row.method, row.tag,
+                decode_value(row.prompt), decode_value(row.response), decode_value(row.context),
+                row.expires_at, row.stale_at, row.accessed_at, usage_count
+            )
+            for row, usage_count in self.backend.iter_hottest(limit or self.SNAPSHOT_MAX_ENTRIES)
+        )
+        return write_snapshot(path, entries)
+        
+    def import_snapshot(self, path: str, warm_memory: bool = True) -> int:
+        """
+        Importe un instantané par lots, en conservant clés, dates et compteurs d'utilisation
+        
+        Les entrées expirées depuis l'export sont ignorées. Les valeurs sont recompressées
+        selon la configuration courante du cache.
+        
+        Args:
+            path: Fichier produit par export_snapshot
+            warm_memory: Précharge aussi les entrées les plus chaudes dans le niveau mémoire
+            
+        Returns:
+            Nombre d'entrées importées
+        """
+        imported = 0
+        batch: List[Tuple[CacheRow, SnapshotEntry]] = []
+        
+        def store_batch():
+            self.backend.store([row for row, _ in batch])
+            self.backend.add_usage({
+                row.cache_key: (entry.usage_count, row.accessed_at)
+                for row, entry in batch if entry.usage_count
+            })
+            
+        now = datetime.utcnow()
+        for entry in read_snapshot(path):
+            if entry.expires_at is not None and entry.expires_at < now:
+                continue
+            row = self._make_row(
+                entry.cache_key, entry.model_name, entry.method, entry.tag, entry.prompt,
+                entry.response, entry.context, entry.expires_at, entry.stale_at, entry.accessed_at or now
+            )
+            # Les entrées arrivent de la plus chaude à la moins chaude : seules les premières
+            # sont promues, sans évincer du niveau mémoire celles déjà chargées
+            if warm_memory and len(self.memory) < self.memory.max_entries:
+                self.memory.set(entry.cache_key, entry.response, entry.expires_at, entry.stale_at)
+            batch.append((row, entry))
+            if len(batch) >= self.SNAPSHOT_IMPORT_BATCH_SIZE:
+                store_batch()
+                imported += len(batch)
+                batch = []
+                
+        if batch:
+            store_batch()
+            imported += len(batch)
+        self.enforce_limits()
+        return imported
+        
+    def warm_up(self, limit: Optional[int] = None) -> int:
+        """
+        Précharge dans le niveau mémoire les entrées les plus utilisées du backend
+        
+        Args:
+            limit: Nombre d'entrées (capacité du niveau mémoire par défaut)
+            
+        Returns:
+            Nombre d'entrées préchargées
+        """
+        limit = min(limit or self.memory.max_entries, self.memory.max_entries)
+        if limit <= 0:
+            return 0
+        hottest = list(self.backend.iter_hottest(limit))
+        # Insertion de la moins chaude à la plus chaude : le LRU garde les plus chaudes en dernier
+        for row, _ in reversed(hottest):
+            self.memory.set(row.cache_key, decode_value(row.response), row.expires_at, row.stale_at)
+        return len(hottest)
+        
+    async def aexport_snapshot(self, path: str, limit: Optional[int] = None) -> int:
+        """Version asynchrone de export_snapshot"""
+        return await self._run(self.export_snapshot, path, limit)
+        
+    async def aimport_snapshot(self, path: str, warm_memory: bool = True) -> int:
+        """Version asynchrone de import_snapshot"""
+        return await self._run(self.import_snapshot, path, warm_memory)
+        
+    async def awarm_up(self, limit: Optional[int] = None) -> int:
+        """Version asynchrone de warm_up"""
+        return await self._run(self.warm_up, limit)
+        
     def get_stats(self) -> Dict[str, Any]:
         """Récupère les statistiques du cache"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("""
-                SELECT 
-                    COUNT(*) as total_entries,
-                    SUM(usage_count) as total_hits,
-                    AVG(usage_count) as avg_hits_per_entry,
-                    COUNT(CASE WHEN expires_at < datetime('now') THEN 1 END) as expired_entries
-                FROM ai_cache
-            """)
-            
-            stats = dict(zip(['total_entries', 'total_hits', 'avg_hits_per_entry', 'expired_entries'], 
-                           cursor.fetchone()))
-                           
-            # Calcul de la taille du cache
-            cursor = conn.execute("SELECT SUM(LENGTH(response)) FROM ai_cache")
-            stats['total_size_bytes'] = cursor.fetchone()[0] or 0
-            
-            return stats 
+        self.flush_hits()
+        backend_stats = self.backend.stats()
+        total_entries = backend_stats["total_entries"]
+        total_hits = backend_stats["total_hits"]
+            
+        stats = {
+            'total_entries': total_entries,
+            'total_hits': total_hits if total_entries else None,
+            'avg_hits_per_entry': (total_hits / total_entries) if total_entries else None,
+            'expired_entries': backend_stats["expired_entries"]
+        }
+            
+        # Taille du cache : stockée (après compression) et logique
+        stored_bytes = backend_stats["total_size_bytes"]
+        logical_bytes = backend_stats["logical_size_bytes"]
+        stats['total_size_bytes'] = stored_bytes
+        stats['logical_size_bytes'] = logical_bytes
+        stats['compression_ratio'] = (logical_bytes / stored_bytes) if stored_bytes else 1.0
+            
+        # Répartition des hits/miss par niveau
+        stats.update(self.memory.get_stats())
+        stats['disk_hits'] = self.disk_hits
+        stats['disk_misses'] = self.disk_misses
+        stats['evictions'] = self.evictions
+        stats['stale_serves'] = self.stale_serves
+        stats['stale_refreshes'] = self.stale_refreshes
+        
+        return stats
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """Crée une connexion à la base de données"""
-        return sqlite3.connect(self.db_path) 
\ No newline at end of file
+@lru_cache()
+def get_cache() -> AIResponseCache:
+    """Retourne une instance partagée du cache (connexions persistantes)"""
+    backend_config = {"shards": settings.AI_CACHE_SHARDS} if settings.AI_CACHE_BACKEND == "sqlite" else {}
+    cache = AIResponseCache(
+        max_entries=settings.AI_CACHE_MAX_ENTRIES,
+        max_size_bytes=settings.AI_CACHE_MAX_SIZE_BYTES,
+        eviction_policy=settings.AI_CACHE_EVICTION_POLICY,
+        compression=settings.AI_CACHE_COMPRESSION or None,
+        compression_threshold=settings.AI_CACHE_COMPRESSION_THRESHOLD,
+        backend=CacheBackendFactory.create_backend(settings.AI_CACHE_BACKEND, **backend_config)
+    )
+    # Les compteurs d'utilisation en attente sont écrits à l'arrêt
+    atexit.register(cache.close)
+    return cache
+    
\ No newline at end of file
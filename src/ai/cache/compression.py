@@ -0,0 +1,101 @@
+"""
+Compression transparente des valeurs stockées dans le cache
+"""
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Optional, Union
+
+# Séparateur entre le nom du codec et les données compressées
+_HEADER_SEPARATOR = b"\x00"
+
+class Codec(ABC):
+    """Interface des algorithmes de compression utilisables par le cache"""
+    
+    name: str = "base"
+    
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compresse des données"""
+        pass
+        
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        """Décompresse des données"""
+        pass
+        
+class ZlibCodec(Codec):
+    """Compression zlib (bibliothèque standard)"""
+    
+    name = "zlib"
+    
+    def __init__(self, level: int = 6):
+        self.level = level
+        
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+        
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+        
+# Codecs disponibles, indexés par le nom enregistré avec chaque valeur
+CODECS: Dict[str, Codec] = {}
+
+def register_codec(codec: Codec) -> None:
+    """Enregistre un codec utilisable pour compresser et relire les valeurs"""
+    CODECS[codec.name] = codec
+    
+register_codec(ZlibCodec())
+
+class ValueCompressor:
+    """Compresse les colonnes configurées au-delà d'un seuil de taille"""
+    
+    def __init__(self, codec: str = "zlib", threshold: int = 512,
+                 columns: Iterable[str] = ("prompt", "response", "context")):
+        """
+        Initialise le compresseur
+        
+        Args:
+            codec: Nom d'un codec enregistré
+            threshold: Taille (en octets) en dessous de laquelle les valeurs restent brutes
+            columns: Colonnes concernées par la compression
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Codec de compression non supporté : {codec}")
+        self.codec = CODECS[codec]
+        self.threshold = threshold
+        self.columns = frozenset(columns)
+        self._header = self.codec.name.encode() + _HEADER_SEPARATOR
+        
+    def encode(self, column: str, value: Optional[str]) -> Optional[Union[str, bytes]]:
+        """
+        Prépare une valeur pour le stockage
+        
+        Returns:
+            La chaîne d'origine, ou un BLOB préfixé par le nom du codec
+        """
+        if value is None or column not in self.columns:
+            return value
+        raw = value.encode('utf-8')
+        if len(raw) < self.threshold:
+            return value
+        compressed = self._header + self.codec.compress(raw)
+        # Conserve la valeur brute si la compression ne fait rien gagner
+        return compressed if len(compressed) < len(raw) else value
+        
+def decode_value(value: Optional[Union[str, bytes]]) -> Optional[str]:
+    """Relit une valeur stockée, compressée ou non"""
+    if not isinstance(value, bytes):
+        return value
+    name, _, data = value.partition(_HEADER_SEPARATOR)
+    codec = CODECS.get(name.decode())
+    if codec is None:
+        raise ValueError(f"Codec de compression non supporté : {name.decode()}")
+    return codec.decompress(data).decode('utf-8')
+    
+def stored_size(value: Optional[Union[str, bytes]]) -> int:
+    """Taille en octets d'une valeur telle que stockée"""
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    return len(value.encode('utf-8'))
@@ -1,34 +1,284 @@
 """
 Décorateurs pour la gestion du cache
 """
+import json
+import asyncio
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
 from functools import wraps
-from typing import Optional, Dict, Any, Callable
-from src.ai.cache.cache_manager import AIResponseCache
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Hashable, Iterator, List, Tuple
+from src.ai.cache.cache_manager import get_cache
+from src.ai.cache.single_flight import SingleFlight
 
-def cached_response(ttl_hours: int = 24):
+# Appels au modèle en cours, partagés entre coroutines concurrentes
+_in_flight = SingleFlight()
+
+# Vrai pendant l'exécution d'une méthode mise en cache : les appels imbriqués
+# (generate_post appelant generate_response) ne sont pas mis en cache une seconde fois
+_inside_cached_call: ContextVar[bool] = ContextVar("inside_cached_call", default=False)
+
+class CallReport:
+    """Provenance du résultat d'un appel de modèle, renseignée par les décorateurs de cache"""
+    
+    def __init__(self):
+        # Vrai si le résultat n'a pas demandé de requête au fournisseur : réponse en cache
+        # (fraîche ou périmée) ou partagée avec un appel identique déjà en cours
+        self.served_from_cache = False
+        
+# Rapport de l'appel en cours, ouvert par report_call
+_call_report: ContextVar[Optional[CallReport]] = ContextVar("call_report", default=None)
+
+# Rafraîchissements en arrière-plan en cours, un par clé (références conservées jusqu'à leur fin)
+_refreshing: Dict[Hashable, asyncio.Task] = {}
+
+def is_failed_result(result: Any) -> bool:
+    """
+    Indique si un résultat de modèle signale un échec
+    
+    Les fournisseurs signalent un échec par un résultat vide : texte vide, ou dictionnaire
+    dont toutes les valeurs sont vides (ex : {"raw_analysis": ""} pour analyze_message).
+    """
+    if isinstance(result, dict):
+        return not any(result.values())
+    return not result
+    
+def _refresh_in_background(cache, key: Hashable, load: Callable) -> None:
+    """Lance, si aucun n'est en cours pour la clé, le rafraîchissement d'une réponse périmée"""
+    if key in _refreshing or _in_flight.in_flight(key):
+        return
+        
+    async def refresh():
+        try:
+            if not is_failed_result(await _in_flight.do(key, load)):
+                cache.stale_refreshes += 1
+        except Exception as e:
+            print(f"Erreur de rafraîchissement du cache: {str(e)}")
+        finally:
+            del _refreshing[key]
+            
+    _refreshing[key] = asyncio.create_task(refresh())
+    
+@contextmanager
+def report_call() -> Iterator[CallReport]:
+    """
+    Ouvre le rapport des appels de modèle du bloc
+    
+    Permet de distinguer les réponses servies par le cache des requêtes réellement envoyées
+    au fournisseur (ex : pour ne mesurer la latence et le coût que de ces dernières).
+    """
+    report = CallReport()
+    token = _call_report.set(report)
+    try:
+        yield report
+    finally:
+        _call_report.reset(token)
+        
+def _served_from_cache() -> None:
+    """Signale au rapport en cours que le résultat n'a pas atteint le fournisseur"""
+    report = _call_report.get()
+    if report is not None:
+        report.served_from_cache = True
+    
+@contextmanager
+def uncached():
+    """
+    Exécute les appels de modèle du bloc sans cache ni regroupement des appels identiques
+    
+    Les tâches créées dans le bloc en héritent : une requête de couverture (hedging) vers
+    une réplique du même modèle est ainsi réellement envoyée, au lieu d'attendre l'appel en cours.
+    """
+    token = _inside_cached_call.set(True)
+    try:
+        yield
+    finally:
+        _inside_cached_call.reset(token)
+    
+async def lookup_cached(model, method: str, requests: List[Tuple[str, Optional[Dict]]],
+                        json_result: bool = False) -> List[Optional[Any]]:
+    """
+    Consulte le cache pour plusieurs appels d'une méthode, en une seule lecture groupée
+    
+    Comme pour un appel unitaire, une réponse périmée est renvoyée aussitôt et rafraîchie
+    en arrière-plan.
+    
+    Args:
+        model: Modèle dont les réponses sont recherchées
+        method: Nom de la méthode mise en cache
+        requests: Tuples (prompt, context)
+        json_result: Désérialise les réponses stockées en JSON
+        
+    Returns:
+        Les réponses (None pour les absentes), dans l'ordre des requêtes
+    """
+    tag = getattr(model, "template_version", None)
+    try:
+        entries = await get_cache().aget_many_entries(
+            [(model.model_name, prompt, context, method, tag) for prompt, context in requests]
+        )
+    except Exception as e:
+        print(f"Erreur de lecture du cache: {str(e)}")
+        return [None] * len(requests)
+        
+    refresh = getattr(model, method)._refresh
+    responses = []
+    for (prompt, context), entry in zip(requests, entries):
+        if entry is None:
+            responses.append(None)
+            continue
+        if entry[1]:
+            refresh(model, prompt, context)
+        responses.append(json.loads(entry[0]) if json_result else entry[0])
+    return responses
+    
+def cached_response(ttl_hours: int = 24, json_result: bool = False, stale_grace_hours: float = 0):
     """
     Décorateur pour mettre en cache les réponses des modèles d'IA
     
     Args:
         ttl_hours: Durée de vie du cache en heures
+        json_result: Sérialise en JSON les résultats non textuels (ex : analyze_message)
+        stale_grace_hours: Fenêtre après expiration pendant laquelle la réponse périmée est
+                           renvoyée aussitôt, pendant qu'une tâche la rafraîchit (0 pour désactiver)
     """
     def decorator(func: Callable):
+        method = func.__name__
+        grace = {"stale_grace_hours": stale_grace_hours} if stale_grace_hours else {}
+        
+        def prepare(self, prompt: str, context: Optional[Dict], args: Tuple, kwargs: Dict):
+            """Clé de regroupement et chargement (appel au modèle, puis mise en cache) d'une réponse"""
+            cache = get_cache()
+            # Version des templates du modèle : la changer écarte les anciennes réponses
+            tag = getattr(self, "template_version", None)
+            
+            async def load():
+                # Si pas en cache, exécute la fonction
+                token = _inside_cached_call.set(True)
+                try:
+                    response = await func(self, prompt, context, *args, **kwargs)
+                finally:
+                    _inside_cached_call.reset(token)
+            
+                # Stocke dans le cache, sauf les échecs
+                if not is_failed_result(response):
+                    try:
+                        value = json.dumps(response) if json_result else response
+                        await cache.aset(self.model_name, prompt, value, context, ttl_hours,
+                                         method=method, tag=tag, **grace)
+                    except Exception as e:
+                        print(f"Erreur d'écriture du cache: {str(e)}")
+            
+                return response
+                
+            key = (func.__qualname__, cache._generate_cache_key(self.model_name, prompt, context, method, tag))
+            return cache, key, load
+            
+        async def fetch(self, prompt: str, context: Optional[Dict] = None, *args, **kwargs):
+            """Appelle le modèle et met le résultat en cache, sans relire le cache (miss déjà constaté)"""
+            if _inside_cached_call.get():
+                return await func(self, prompt, context, *args, **kwargs)
+            _, key, load = prepare(self, prompt, context, args, kwargs)
+            return await _in_flight.do(key, load)
+            
+        def refresh(self, prompt: str, context: Optional[Dict] = None, *args, **kwargs) -> None:
+            """Rafraîchit en arrière-plan une réponse périmée déjà servie"""
+            cache, key, load = prepare(self, prompt, context, args, kwargs)
+            _refresh_in_background(cache, key, load)
+            
         @wraps(func)
         async def wrapper(self, prompt: str, context: Optional[Dict] = None, *args, **kwargs):
-            cache = AIResponseCache()
+            if _inside_cached_call.get():
+                return await func(self, prompt, context, *args, **kwargs)
+                
+            cache, key, load = prepare(self, prompt, context, args, kwargs)
+            tag = getattr(self, "template_version", None)
             
-            # Tente de récupérer depuis le cache
-            cached_response = cache.get(self.model_name, prompt, context)
-            if cached_response is not None:
-                return cached_response
+            # Tente de récupérer depuis le cache sans bloquer la boucle d'événements
+            try:
+                if stale_grace_hours:
+                    entry = await cache.aget_entry(self.model_name, prompt, context, method=method, tag=tag)
+                else:
+                    cached_response = await cache.aget(self.model_name, prompt, context, method=method, tag=tag)
+                    entry = (cached_response, False) if cached_response is not None else None
+            except Exception as e:
+                print(f"Erreur de lecture du cache: {str(e)}")
+                entry = None
+            if entry is not None and not entry[1]:
+                _served_from_cache()
+                return json.loads(entry[0]) if json_result else entry[0]
+                
+            if entry is not None:
+                # Réponse périmée : servie aussitôt, rafraîchie en arrière-plan
+                _refresh_in_background(cache, key, load)
+                _served_from_cache()
+                return json.loads(entry[0]) if json_result else entry[0]
+                
+            # Un seul appel au modèle pour les demandes identiques simultanées
+            shared = _in_flight.in_flight(key)
+            response = await _in_flight.do(key, load)
+            if shared:
+                # Résultat partagé : la requête a été envoyée (et mesurée) par un autre appelant
+                _served_from_cache()
+            return response
             
-            # Si pas en cache, exécute la fonction
-            response = await func(self, prompt, context, *args, **kwargs)
+        wrapper._cached_response = True
+        # Accès des lectures groupées (generate_batch) : appel après un miss, rafraîchissement
+        wrapper._fetch = fetch
+        wrapper._refresh = refresh
+        return wrapper
+    return decorator 
+    
+def cached_stream(ttl_hours: int = 24, method: str = "generate_response"):
+    """
+    Décorateur pour mettre en cache le texte final des générateurs asynchrones de fragments
+    
+    Une réponse en cache est renvoyée en un seul fragment ; sinon les fragments du modèle
+    sont transmis au fur et à mesure, puis leur concaténation est mise en cache si le flux
+    va jusqu'au bout. Un flux interrompu par l'appelant, ou qui lève une exception (le
+    fournisseur n'a pas confirmé la fin de la génération), n'est pas mis en cache.
+    
+    Args:
+        ttl_hours: Durée de vie du cache en heures
+        method: Méthode dont les entrées sont partagées : le texte complet d'un flux
+                est celui que renverrait generate_response
+    """
+    def decorator(func: Callable):
+        @wraps(func)
+        async def wrapper(self, prompt: str, context: Optional[Dict] = None, *args, **kwargs) -> AsyncIterator[str]:
+            # aclosing : un flux abandonné par l'appelant est fermé aussitôt jusqu'au fournisseur
+            if _inside_cached_call.get():
+                async with aclosing(func(self, prompt, context, *args, **kwargs)) as stream:
+                    async for chunk in stream:
+                        yield chunk
+                return
+                
+            cache = get_cache()
+            tag = getattr(self, "template_version", None)
             
-            # Stocke dans le cache
+            try:
+                cached_response = await cache.aget(self.model_name, prompt, context, method=method, tag=tag)
+            except Exception as e:
+                print(f"Erreur de lecture du cache: {str(e)}")
+                cached_response = None
+            if cached_response is not None:
+                _served_from_cache()
+                yield cached_response
+                return
+                
+            chunks = []
+            async with aclosing(func(self, prompt, context, *args, **kwargs)) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    yield chunk
+                
+            response = "".join(chunks)
             if response:
-                cache.set(self.model_name, prompt, response, context, ttl_hours)
-            
-            return response
+                try:
+                    await cache.aset(self.model_name, prompt, response, context, ttl_hours,
+                                     method=method, tag=tag)
+                except Exception as e:
+                    print(f"Erreur d'écriture du cache: {str(e)}")
+                    
+        wrapper._cached_response = True
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
+    
\ No newline at end of file
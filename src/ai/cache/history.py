@@ -0,0 +1,103 @@
+"""
+Empreinte incrémentale de l'historique de conversation pour les clés de cache
+"""
+import json
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+def message_digest(message: Dict[str, Any]) -> bytes:
+    """Empreinte d'un message de l'historique"""
+    return hashlib.sha256(json.dumps(message, sort_keys=True).encode()).digest()
+    
+def chain_digest(previous: bytes, message: Dict[str, Any]) -> bytes:
+    """Étend l'empreinte chaînée de l'historique avec un nouveau message"""
+    return hashlib.sha256(previous + message_digest(message)).digest()
+    
+def history_digest(history: List[Dict[str, Any]]) -> str:
+    """
+    Empreinte chaînée d'un historique de conversation
+    
+    Constante pour un HashedHistory, linéaire en la taille de l'historique sinon.
+    """
+    if isinstance(history, HashedHistory):
+        return history.digest
+    digest = b""
+    for message in history:
+        digest = chain_digest(digest, message)
+    return digest.hex()
+    
+class HashedHistory(list):
+    """
+    Historique de conversation qui maintient son empreinte au fil des ajouts
+    
+    S'utilise comme une liste de messages ({"role": ..., "content": ...}).
+    Chaque append/extend étend l'empreinte en temps constant par message ;
+    les autres modifications provoquent un recalcul complet à la prochaine lecture.
+    Les messages ne doivent pas être modifiés après leur ajout.
+    """
+    
+    def __init__(self, messages: Optional[Iterable[Dict[str, Any]]] = None):
+        super().__init__()
+        self._digest: Optional[bytes] = b""
+        if messages is not None:
+            self.extend(messages)
+            
+    @property
+    def digest(self) -> str:
+        """Empreinte chaînée de l'historique"""
+        if self._digest is None:
+            digest = b""
+            for message in self:
+                digest = chain_digest(digest, message)
+            self._digest = digest
+        return self._digest.hex()
+        
+    def append(self, message: Dict[str, Any]) -> None:
+        if self._digest is not None:
+            self._digest = chain_digest(self._digest, message)
+        super().append(message)
+        
+    def extend(self, messages: Iterable[Dict[str, Any]]) -> None:
+        for message in messages:
+            self.append(message)
+            
+    def __iadd__(self, messages: Iterable[Dict[str, Any]]) -> "HashedHistory":
+        self.extend(messages)
+        return self
+        
+    def _invalidate(self) -> None:
+        """Force le recalcul de l'empreinte après une modification non incrémentale"""
+        self._digest = None
+        
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self._invalidate()
+        
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._invalidate()
+        
+    def insert(self, index: int, message: Dict[str, Any]) -> None:
+        super().insert(index, message)
+        self._invalidate()
+        
+    def pop(self, index: int = -1) -> Dict[str, Any]:
+        message = super().pop(index)
+        self._invalidate()
+        return message
+        
+    def remove(self, message: Dict[str, Any]) -> None:
+        super().remove(message)
+        self._invalidate()
+        
+    def clear(self) -> None:
+        super().clear()
+        self._digest = b""
+        
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._invalidate()
+        
+    def reverse(self) -> None:
+        super().reverse()
+        self._invalidate()
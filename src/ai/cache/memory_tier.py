@@ -0,0 +1,109 @@
+"""
+Cache mémoire LRU placé devant le stockage SQLite
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+
+class LRUMemoryTier:
+    """Cache LRU en mémoire, borné en nombre d'entrées et en octets"""
+    
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 max_age: Optional[float] = None):
+        """
+        Initialise le cache mémoire
+        
+        Args:
+            max_entries: Nombre maximal d'entrées conservées
+            max_bytes: Taille maximale cumulée des réponses (en octets)
+            max_age: Durée maximale de conservation d'une entrée, en secondes (None : jusqu'à
+                     son expiration), au-delà de laquelle elle est relue dans le stockage
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # cache_key -> (réponse, date d'expiration, taille en octets, date de péremption)
+        self._entries: "OrderedDict[str, Tuple[str, Optional[datetime], int, Optional[datetime]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        
+    @property
+    def enabled(self) -> bool:
+        """Indique si le cache mémoire peut contenir des entrées"""
+        return self.max_entries > 0 and self.max_bytes > 0
+        
+    def get(self, cache_key: str) -> Optional[str]:
+        """Récupère une réponse si elle est présente et non expirée"""
+        entry = self.get_entry(cache_key)
+        return entry[0] if entry is not None else None
+        
+    def get_entry(self, cache_key: str) -> Optional[Tuple[str, Optional[datetime]]]:
+        """Récupère une réponse non expirée et sa date de péremption (stale-while-revalidate)"""
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+                
+            response, expires_at, _, stale_at = entry
+            if expires_at is not None and expires_at < datetime.utcnow():
+                self._remove(cache_key)
+                self.misses += 1
+                return None
+                
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return response, stale_at
+            
+    def set(self, cache_key: str, response: str, expires_at: Optional[datetime] = None,
+            stale_at: Optional[datetime] = None) -> None:
+        """Stocke une réponse (dates en UTC) et évince les entrées les moins récemment utilisées"""
+        size = len(response.encode('utf-8'))
+        if not self.enabled or size > self.max_bytes:
+            self.delete(cache_key)
+            return
+            
+        if self.max_age is not None:
+            limit = datetime.utcnow() + timedelta(seconds=self.max_age)
+            expires_at = min(expires_at, limit) if expires_at is not None else limit
+            
+        with self._lock:
+            self._remove(cache_key)
+            self._entries[cache_key] = (response, expires_at, size, stale_at)
+            self.size_bytes += size
+            
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, (_, _, evicted_size, _) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                
+    def delete(self, cache_key: str) -> None:
+        """Supprime une entrée du cache mémoire"""
+        with self._lock:
+            self._remove(cache_key)
+            
+    def clear(self) -> None:
+        """Vide le cache mémoire"""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+            
+    def _remove(self, cache_key: str) -> None:
+        """Supprime une entrée (le verrou doit être détenu)"""
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self.size_bytes -= entry[2]
+            
+    def __len__(self) -> int:
+        return len(self._entries)
+        
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache mémoire"""
+        return {
+            "memory_entries": len(self._entries),
+            "memory_size_bytes": self.size_bytes,
+            "memory_hits": self.hits,
+            "memory_misses": self.misses
+        }
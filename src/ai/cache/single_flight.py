@@ -0,0 +1,57 @@
+"""
+Regroupement des appels concurrents identiques (single-flight)
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class _Call:
+    """Appel partagé : tâche en cours et nombre d'appelants qui l'attendent"""
+    
+    __slots__ = ("task", "waiters")
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        
+class SingleFlight:
+    """Partage le résultat d'un appel en cours entre tous les appelants d'une même clé"""
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        
+    def in_flight(self, key: Hashable) -> bool:
+        """Indique si un appel est en cours pour la clé"""
+        return key in self._calls
+        
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        """Retire l'appel terminé ; son exception est marquée comme lue s'il n'a plus d'appelant"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            call.task.exception()
+            
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécute func une seule fois pour les appels concurrents d'une même clé
+        
+        func s'exécute dans sa propre tâche, que chaque appelant (le premier compris)
+        attend à travers asyncio.shield : annuler un appelant le détache seulement, les
+        autres reçoivent toujours le résultat ou l'exception de l'appel. L'appel n'est
+        annulé que lorsque plus aucun appelant ne l'attend.
+        
+        Args:
+            key: Clé identifiant l'appel
+            func: Fabrique de la coroutine à exécuter
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.ensure_future(func()))
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+            
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
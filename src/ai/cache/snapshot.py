@@ -0,0 +1,68 @@
+"""
+Instantanés du cache : export et import au fil de l'eau des entrées les plus utilisées
+"""
+import gzip
+import json
+from datetime import datetime
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional
+
+# Première ligne de chaque instantané
+SNAPSHOT_FORMAT = "ai-cache-snapshot"
+SNAPSHOT_VERSION = 1
+
+class SnapshotEntry(NamedTuple):
+    """Entrée d'un instantané (valeurs en clair, dates en UTC)"""
+    cache_key: str
+    model_name: str
+    method: Optional[str]
+    tag: Optional[str]
+    prompt: str
+    response: str
+    context: Optional[str]
+    expires_at: Optional[datetime]
+    stale_at: Optional[datetime]
+    accessed_at: Optional[datetime]
+    usage_count: int
+    
+def _encode_date(value: Optional[datetime]) -> Optional[str]:
+    """Formate une date pour l'instantané"""
+    return value.isoformat() if value is not None else None
+    
+def _decode_date(value: Optional[str]) -> Optional[datetime]:
+    """Relit une date de l'instantané"""
+    return datetime.fromisoformat(value) if value else None
+    
+def write_snapshot(path: str, entries: Iterable[SnapshotEntry]) -> int:
+    """
+    Écrit un instantané : JSON Lines compressé en gzip, une entrée par ligne
+    
+    Args:
+        path: Fichier de destination
+        entries: Entrées, de la plus chaude à la moins chaude
+        
+    Returns:
+        Nombre d'entrées écrites
+    """
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as snapshot:
+        snapshot.write(json.dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION}) + "\n")
+        for entry in entries:
+            # Tableau plutôt qu'objet : les noms de champs ne sont pas répétés à chaque ligne
+            line: List[Any] = list(entry)
+            for index in (7, 8, 9):
+                line[index] = _encode_date(line[index])
+            snapshot.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+    
+def read_snapshot(path: str) -> Iterator[SnapshotEntry]:
+    """Relit un instantané ligne à ligne, dans l'ordre d'écriture"""
+    with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+        header = json.loads(snapshot.readline() or "{}")
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Instantané de cache non supporté : {path}")
+        for line in snapshot:
+            values = json.loads(line)
+            for index in (7, 8, 9):
+                values[index] = _decode_date(values[index])
+            yield SnapshotEntry(*values)
@@ -1,39 +1,107 @@
 """
 Implémentation du modèle Anthropic Claude
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional
+import asyncio
 import anthropic
-from src.ai.models.base import BaseAIModel
+from src.ai.models.base import BaseAIModel, IncompleteStreamError
+from src.ai.models.concurrency import provider_semaphore
+from src.ai.models.rate_limit import RateLimiter, estimate_tokens, provider_rate_limiter
 from src.config import settings
 
 class AnthropicModel(BaseAIModel):
     """Modèle utilisant l'API Anthropic Claude"""
     
+    MAX_TOKENS = 500  # longueur maximale des réponses
+    
     def __init__(self, config: Dict[str, Any]):
-        self.model_name = "claude-2"
+        self.model_name = config.get('model_name', 'claude-2')
         super().__init__(config)
     
     def initialize(self) -> None:
-        """Initialise le client Anthropic"""
-        self.client = anthropic.Client(api_key=settings.ANTHROPIC_API_KEY)
+        """Initialise le client Anthropic asynchrone (connexions HTTP réutilisées)"""
+        self.client: Optional[anthropic.AsyncAnthropic] = None
+        self._get_client()
+        self.max_concurrency = self.config.get('max_concurrency', settings.ANTHROPIC_MAX_CONCURRENCY)
+        self.requests_per_minute = self.config.get('requests_per_minute', settings.ANTHROPIC_REQUESTS_PER_MINUTE)
+        self.tokens_per_minute = self.config.get('tokens_per_minute', settings.ANTHROPIC_TOKENS_PER_MINUTE)
+        
+    def _get_client(self) -> anthropic.AsyncAnthropic:
+        """Retourne le client de l'instance, recréé au premier appel suivant aclose"""
+        if self.client is None:
+            self.client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                timeout=self.config.get('timeout', settings.ANTHROPIC_TIMEOUT)
+            )
+        return self.client
+        
+    def _concurrency(self) -> asyncio.Semaphore:
+        """Limite de requêtes simultanées, partagée par les instances Anthropic"""
+        return provider_semaphore("anthropic", self.max_concurrency)
+        
+    def _rate_limiter(self) -> RateLimiter:
+        """Quotas de requêtes et de tokens par minute, partagés par les instances Anthropic"""
+        return provider_rate_limiter("anthropic", self.requests_per_minute, self.tokens_per_minute)
+        
+    @staticmethod
+    def _format_prompt(prompt: str) -> str:
+        """Formatage du prompt selon les recommandations Anthropic"""
+        return f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}"
         
     async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
-        """Génère une réponse via Anthropic Claude"""
+        """Génère une réponse via Anthropic Claude, sans bloquer la boucle d'événements"""
+        formatted = self._format_prompt(prompt)
         try:
-            # Formatage du prompt selon les recommandations Anthropic
-            formatted_prompt = f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}"
-            
-            response = self.client.completion(
-                prompt=formatted_prompt,
-                model=self.model_name,
-                max_tokens_to_sample=500,
-                temperature=0.7
-            )
+            async with self._concurrency():
+                async with self._rate_limiter().reserve(estimate_tokens(formatted) + self.MAX_TOKENS) as reservation:
+                    response = await self._get_client().completions.create(
+                        prompt=formatted,
+                        model=self.model_name,
+                        max_tokens_to_sample=self.MAX_TOKENS,
+                        temperature=0.7
+                    )
+                    # L'API Completions ne renvoie pas d'usage : estimation sur le texte réel
+                    reservation.used = estimate_tokens(formatted) + estimate_tokens(response.completion)
             return response.completion
         except Exception as e:
             print(f"Erreur Anthropic: {str(e)}")
             return ""
             
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Génère une réponse via Anthropic Claude, fragment par fragment (Server-Sent Events)
+        
+        Le flux n'est complet qu'à la réception d'une raison d'arrêt (stop_reason) ;
+        sinon, ou en cas d'erreur, une exception est levée.
+        """
+        formatted = self._format_prompt(prompt)
+        try:
+            # La place dans la limite est occupée pendant toute la durée du flux
+            async with self._concurrency():
+                async with self._rate_limiter().reserve(estimate_tokens(formatted) + self.MAX_TOKENS):
+                    stream = await self._get_client().completions.create(
+                        prompt=formatted,
+                        model=self.model_name,
+                        max_tokens_to_sample=self.MAX_TOKENS,
+                        temperature=0.7,
+                        stream=True
+                    )
+                stop_reason = None
+                try:
+                    async for event in stream:
+                        if event.completion:
+                            yield event.completion
+                        stop_reason = event.stop_reason or stop_reason
+                finally:
+                    # Flux abandonné par l'appelant : la fermeture de la réponse interrompt la
+                    # génération côté serveur et rend la connexion au pool
+                    await stream.response.aclose()
+                if stop_reason is None:
+                    raise IncompleteStreamError("flux interrompu avant la fin de la génération")
+        except Exception as e:
+            print(f"Erreur Anthropic: {str(e)}")
+            raise
+            
     async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
         """Génère un post LinkedIn via Anthropic Claude"""
         prompt = f"""
@@ -65,4 +133,11 @@ class AnthropicModel(BaseAIModel):
         """
         response = await self.generate_response(prompt, context)
         # TODO: Parser la réponse JSON
-        return {"raw_analysis": response} 
\ No newline at end of file
+        return {"raw_analysis": response} 
+        
+    async def aclose(self) -> None:
+        """Ferme le client et ses connexions HTTP ; un appel ultérieur en crée un nouveau"""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+        
\ No newline at end of file
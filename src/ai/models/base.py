@@ -1,16 +1,52 @@
 """
 Classe de base pour tous les modèles d'IA
 """
+import asyncio
+import inspect
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from src.ai.cache.decorators import cached_response
+from functools import partial
+from typing import Dict, Any, AsyncIterator, Iterable, List, Optional, Tuple, Union
+from src.ai.cache.decorators import cached_response, cached_stream, lookup_cached
+
+# Élément d'un lot : prompt seul, ou couple (prompt, contexte)
+BatchItem = Union[str, Tuple[str, Optional[Dict]]]
+
+class IncompleteStreamError(Exception):
+    """Flux terminé sans que le fournisseur ait confirmé la fin de la génération"""
 
 class BaseAIModel(ABC):
     """Classe abstraite définissant l'interface pour tous les modèles d'IA"""
     
+    model_name = "base"
+    # Version des templates de prompt, incluse dans les clés de cache : l'incrémenter
+    # lorsqu'un template change écarte les anciennes réponses, qui expirent d'elles-mêmes
+    template_version = "1"
+    
+    # Politique de cache par méthode : arguments de cached_response, ou None pour ne pas
+    # mettre en cache. Appliquée automatiquement aux méthodes redéfinies par les sous-classes,
+    # qui peuvent l'ajuster (ex : {**BaseAIModel.CACHE_POLICY, "generate_post": None}).
+    CACHE_POLICY: Dict[str, Optional[Dict[str, Any]]] = {
+        "generate_response": {"ttl_hours": 24},
+        "generate_post": {"ttl_hours": 48, "stale_grace_hours": 24},
+        "analyze_message": {"ttl_hours": 24, "json_result": True},
+        # Flux : arguments de cached_stream, texte final partagé avec generate_response
+        "stream_response": {"ttl_hours": 24},
+    }
+    
+    # Requêtes simultanées par défaut de generate_batch
+    BATCH_CONCURRENCY = 4
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, policy in cls.CACHE_POLICY.items():
+            method = cls.__dict__.get(name)
+            if policy is None or method is None or getattr(method, "_cached_response", False):
+                continue
+            decorator = cached_stream if inspect.isasyncgenfunction(method) else cached_response
+            setattr(cls, name, decorator(**policy)(method))
+            
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.model_name = "base"
         self.initialize()
     
     @abstractmethod
@@ -18,24 +54,89 @@ class BaseAIModel(ABC):
         """Initialise le modèle et ses ressources"""
         pass
     
-    @cached_response(ttl_hours=24)
     @abstractmethod
     async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
         """Génère une réponse basée sur le prompt et le contexte"""
         pass
+        
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Génère une réponse fragment par fragment, au fil de la génération
+        
+        Par défaut, la réponse complète de generate_response est renvoyée en un seul fragment.
+        L'appelant peut interrompre la génération en cessant d'itérer (aclose).
+        
+        Un flux qui n'aboutit pas lève une exception (IncompleteStreamError ou l'erreur du
+        fournisseur) au lieu de se terminer normalement : le texte partiel n'est pas mis en cache.
+        """
+        yield await self.generate_response(prompt, context)
     
-    @cached_response(ttl_hours=48)
     @abstractmethod
     async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
         """Génère un post LinkedIn basé sur le sujet et le contexte"""
         pass
     
-    @cached_response(ttl_hours=24)
     @abstractmethod
     async def analyze_message(self, message: str, context: Optional[Dict] = None) -> Dict:
         """Analyse un message et retourne les informations pertinentes"""
         pass
     
+    def _batch_concurrency(self) -> int:
+        """Parallélisme par défaut d'un lot : limite de requêtes simultanées du fournisseur"""
+        return getattr(self, "max_concurrency", None) or self.BATCH_CONCURRENCY
+        
+    async def generate_batch(self, items: Iterable[BatchItem], max_concurrency: Optional[int] = None,
+                             method: str = "generate_response") -> List[Any]:
+        """
+        Traite un lot d'éléments en parallèle, avec un nombre borné d'appels simultanés
+        
+        Le cache est consulté pour tout le lot en une lecture groupée : seuls les éléments
+        absents sont envoyés au modèle, les réponses périmées étant servies puis rafraîchies
+        en arrière-plan. L'échec d'un élément n'interrompt pas le lot.
+        
+        Args:
+            items: Prompts, ou couples (prompt, contexte)
+            max_concurrency: Nombre maximal d'appels simultanés (par défaut, celui du modèle)
+            method: Méthode appliquée à chaque élément (generate_response, generate_post... mais
+                    pas stream_response)
+            
+        Returns:
+            Les résultats dans l'ordre des éléments ; l'exception levée pour ceux en échec
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError(f"Nombre d'appels simultanés invalide : {max_concurrency}")
+        call = getattr(self, method)
+        if inspect.isasyncgenfunction(call):
+            raise ValueError(f"Méthode de flux non supportée par generate_batch : {method}")
+        requests = [(item, None) if isinstance(item, str) else tuple(item) for item in items]
+        
+        policy = self.CACHE_POLICY.get(method)
+        if policy is not None and getattr(call, "_cached_response", False):
+            results: List[Any] = await lookup_cached(self, method, requests,
+                                                     json_result=policy.get("json_result", False))
+            # Les absents sont demandés au modèle sans relire le cache
+            call = partial(call._fetch, self)
+        else:
+            results = [None] * len(requests)
+            
+        # Files de travail : chaque worker prend l'élément suivant dès qu'il a fini le sien
+        pending = iter([index for index, result in enumerate(results) if result is None])
+        
+        async def worker():
+            for index in pending:
+                try:
+                    results[index] = await call(*requests[index])
+                except Exception as e:
+                    results[index] = e
+                    
+        workers = min(max_concurrency or self._batch_concurrency(), len(requests))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+        
+    async def aclose(self) -> None:
+        """Libère les ressources asynchrones du modèle (sessions HTTP), depuis sa boucle d'événements"""
+        self.cleanup()
+        
     def cleanup(self) -> None:
         """Nettoie les ressources utilisées par le modèle"""
         pass 
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Limites de requêtes simultanées par fournisseur d'IA
+"""
+import asyncio
+import weakref
+from typing import Dict
+
+# Sémaphores par boucle d'événements, puis par fournisseur
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
+    
+def provider_semaphore(provider: str, limit: int) -> asyncio.Semaphore:
+    """
+    Retourne le sémaphore partagé par toutes les instances d'un fournisseur
+    
+    Un appel lent à un fournisseur n'occupe ainsi qu'une place de son propre quota,
+    sans retenir les requêtes adressées aux autres.
+    
+    Args:
+        provider: Nom du fournisseur ('openai', 'anthropic'...)
+        limit: Nombre maximal de requêtes simultanées, fixé à la création du sémaphore
+        
+    Returns:
+        Sémaphore lié à la boucle d'événements courante
+    """
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(provider)
+    if semaphore is None:
+        semaphore = semaphores[provider] = asyncio.Semaphore(limit)
+    return semaphore
@@ -6,6 +6,7 @@ from src.ai.models.base import BaseAIModel
 from src.ai.models.openai_model import OpenAIModel
 from src.ai.models.anthropic_model import AnthropicModel
 from src.ai.models.ollama_model import OllamaModel
+from src.ai.models.routed_model import RoutedModel
 from src.config import settings
 
 class AIModelFactory:
@@ -17,8 +18,9 @@ class AIModelFactory:
         Crée une instance du modèle d'IA spécifié
         
         Args:
-            model_type: Type de modèle ('openai', 'anthropic', 'ollama')
-            config: Configuration spécifique au modèle
+            model_type: Type de modèle ('openai', 'anthropic', 'ollama', 'routed')
+            config: Configuration spécifique au modèle ; pour 'routed', 'providers' (noms
+                    des fournisseurs), 'policy' et la configuration de chacun sous son nom
             
         Returns:
             Instance de BaseAIModel
@@ -34,5 +36,13 @@ class AIModelFactory:
             return AnthropicModel(config)
         elif model_type == "ollama":
             return OllamaModel(config)
+        elif model_type == "routed":
+            names = config.get('providers', settings.AI_ROUTING_PROVIDERS)
+            providers = {name: AIModelFactory.create_model(name, config.get(name)) for name in names}
+            return RoutedModel({
+                **config,
+                "providers": providers,
+                "policy": config.get('policy', settings.AI_ROUTING_POLICY)
+            })
         else:
             raise ValueError(f"Type de modèle non supporté : {model_type}") 
\ No newline at end of file
@@ -1,15 +1,26 @@
 """
 Implémentation du modèle Ollama (local)
 """
-from typing import Dict, Any, Optional
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Optional
 import json
+import asyncio
 import aiohttp
-from src.ai.models.base import BaseAIModel
+from src.ai.models.base import BaseAIModel, IncompleteStreamError
 from src.config import settings
 
 class OllamaModel(BaseAIModel):
     """Modèle utilisant Ollama en local"""
     
+    # Pool de connexions et délais par défaut, surchargés par les clés de même nom
+    # (en minuscules) de la configuration du modèle
+    CONNECTION_LIMIT = 10  # connexions simultanées vers le serveur
+    KEEPALIVE_TIMEOUT = 30.0  # secondes de conservation d'une connexion inactive
+    DNS_CACHE_TTL = 300  # secondes
+    CONNECT_TIMEOUT = 5.0  # secondes
+    REQUEST_TIMEOUT = 300.0  # secondes, génération complète comprise
+    NUM_PARALLEL = 4  # requêtes traitées en parallèle par le serveur (OLLAMA_NUM_PARALLEL)
+    
     def __init__(self, config: Dict[str, Any]):
         self.model_name = config.get('model_name', 'llama2')
         self.api_url = settings.OLLAMA_API_URL
@@ -18,42 +29,111 @@ class OllamaModel(BaseAIModel):
     def initialize(self) -> None:
         """Initialise les paramètres Ollama"""
         self.generate_endpoint = f"{self.api_url}/api/generate"
+        # Session HTTP partagée par les requêtes, créée au premier appel
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+    def _setting(self, name: str):
+        """Retourne un paramètre de connexion de la configuration, ou sa valeur par défaut"""
+        return self.config.get(name.lower(), getattr(self, name))
+        
+    def _batch_concurrency(self) -> int:
+        """
+        Parallélisme d'un lot : une requête par emplacement de génération du serveur
+        
+        Au-delà, les requêtes attendent dans la file du serveur en occupant une connexion.
+        """
+        return self._setting("NUM_PARALLEL")
+        
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Retourne la session partagée : connexions conservées (keep-alive) entre les requêtes"""
+        loop = asyncio.get_running_loop()
+        # Une session est liée à sa boucle d'événements
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=max(self._setting("CONNECTION_LIMIT"), self._setting("NUM_PARALLEL")),
+                keepalive_timeout=self._setting("KEEPALIVE_TIMEOUT"),
+                ttl_dns_cache=self._setting("DNS_CACHE_TTL")
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self._setting("REQUEST_TIMEOUT"),
+                connect=self._setting("CONNECT_TIMEOUT")
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._session_loop = loop
+        return self._session
+        
+    def _payload(self, prompt: str, stream: bool = False) -> Dict[str, Any]:
+        """Construit le corps d'une requête de génération"""
+        return {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": 0.7,
+                "num_predict": 500
+            }
+        }
         
     async def _make_request(self, prompt: str) -> str:
         """Effectue une requête à l'API Ollama"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(
-                    self.generate_endpoint,
-                    json={
-                        "model": self.model_name,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": 0.7,
-                            "num_predict": 500
-                        }
-                    }
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get('response', '')
-                    else:
-                        print(f"Erreur Ollama: Status {response.status}")
-                        return ""
-            except Exception as e:
-                print(f"Erreur de connexion Ollama: {str(e)}")
-                return ""
+        try:
+            async with self._get_session().post(self.generate_endpoint, json=self._payload(prompt)) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get('response', '')
+                else:
+                    print(f"Erreur Ollama: Status {response.status}")
+                    return ""
+        except Exception as e:
+            print(f"Erreur de connexion Ollama: {str(e)}")
+            return ""
     
-    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
-        """Génère une réponse via Ollama"""
+    async def _stream_request(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Effectue une requête en streaming : une ligne JSON par fragment (NDJSON)
+        
+        Le flux n'est complet qu'à la réception de la ligne 'done' ; une erreur du serveur ou
+        une connexion interrompue avant lève une exception.
+        """
+        payload = self._payload(prompt, stream=True)
+        try:
+            async with self._get_session().post(self.generate_endpoint, json=payload) as response:
+                if response.status != 200:
+                    raise IncompleteStreamError(f"Status {response.status}")
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get('error'):
+                        raise IncompleteStreamError(data['error'])
+                    if data.get('response'):
+                        yield data['response']
+                    if data.get('done'):
+                        return
+                raise IncompleteStreamError("flux interrompu avant la fin de la génération")
+        except Exception as e:
+            print(f"Erreur Ollama: {str(e)}")
+            raise
+            
+    def _build_prompt(self, prompt: str, context: Optional[Dict] = None) -> str:
+        """Ajoute l'historique de conversation au prompt"""
         if context and context.get('conversation_history'):
-            # Ajoute l'historique au prompt
             history = "\n".join([f"{msg['role']}: {msg['content']}" 
                                for msg in context['conversation_history']])
             prompt = f"{history}\nUser: {prompt}"
+        return prompt
             
-        return await self._make_request(prompt)
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        """Génère une réponse via Ollama"""
+        return await self._make_request(self._build_prompt(prompt, context))
+        
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Génère une réponse via Ollama, fragment par fragment"""
+        # Fermé aussitôt si l'appelant abandonne le flux : la requête HTTP est interrompue
+        async with aclosing(self._stream_request(self._build_prompt(prompt, context))) as stream:
+            async for chunk in stream:
+                yield chunk
             
     async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
         """Génère un post LinkedIn via Ollama"""
@@ -92,4 +172,25 @@ class OllamaModel(BaseAIModel):
         try:
             return json.loads(response)
         except json.JSONDecodeError:
-            return {"raw_analysis": response} 
\ No newline at end of file
+            return {"raw_analysis": response} 
+            
+    async def aclose(self) -> None:
+        """Ferme la session HTTP partagée"""
+        session, self._session, self._session_loop = self._session, None, None
+        if session is not None and not session.closed:
+            await session.close()
+            
+    def cleanup(self) -> None:
+        """Ferme la session HTTP partagée depuis un contexte synchrone"""
+        session, loop = self._session, self._session_loop
+        if session is None or session.closed:
+            return
+        if loop.is_running():
+            # Appelé depuis la boucle de la session : fermeture planifiée
+            self._closing = loop.create_task(self.aclose())
+        elif not loop.is_closed():
+            loop.run_until_complete(self.aclose())
+        else:
+            # Boucle terminée : ses connexions sont déjà perdues
+            self._session = self._session_loop = None
+            
\ No newline at end of file
@@ -1,43 +1,147 @@
 """
 Implémentation du modèle OpenAI
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Optional
+import httpx
 import openai
-from src.ai.models.base import BaseAIModel
+from src.ai.models.base import BaseAIModel, IncompleteStreamError
+from src.ai.models.concurrency import provider_semaphore
+from src.ai.models.rate_limit import RateLimiter, estimate_tokens, provider_rate_limiter
 from src.config import settings
 
 class OpenAIModel(BaseAIModel):
     """Modèle utilisant l'API OpenAI"""
     
+    # Délais par défaut, surchargeables via la config ('connect_timeout', 'keepalive_expiry')
+    CONNECT_TIMEOUT = 5.0
+    KEEPALIVE_EXPIRY = 30.0
+    MAX_TOKENS = 500  # longueur maximale des réponses
+    
     def __init__(self, config: Dict[str, Any]):
-        self.model_name = "gpt-4"  # ou "gpt-3.5-turbo" selon la config
+        self.model_name = config.get('model_name', settings.OPENAI_MODEL)
         super().__init__(config)
     
     def initialize(self) -> None:
-        """Initialise le client OpenAI"""
-        openai.api_key = settings.OPENAI_API_KEY
+        """Initialise la configuration du client OpenAI"""
+        self.timeout = self.config.get('timeout', settings.OPENAI_TIMEOUT)
+        self.max_concurrency = self.config.get('max_concurrency', settings.OPENAI_MAX_CONCURRENCY)
+        self.requests_per_minute = self.config.get('requests_per_minute', settings.OPENAI_REQUESTS_PER_MINUTE)
+        self.tokens_per_minute = self.config.get('tokens_per_minute', settings.OPENAI_TOKENS_PER_MINUTE)
+        self._client: Optional[openai.AsyncOpenAI] = None
         
-    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
-        """Génère une réponse via OpenAI"""
+    def _get_client(self) -> openai.AsyncOpenAI:
+        """
+        Retourne le client asynchrone de l'instance, créé au premier appel
+        
+        Le transport httpx garde ses connexions ouvertes d'une requête à l'autre ;
+        le pool est dimensionné sur la limite de requêtes simultanées.
+        """
+        if self._client is None:
+            timeout = httpx.Timeout(
+                self.timeout,
+                connect=self.config.get('connect_timeout', self.CONNECT_TIMEOUT)
+            )
+            http_client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=self.config.get('keepalive_expiry', self.KEEPALIVE_EXPIRY)
+                )
+            )
+            self._client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=timeout,
+                http_client=http_client
+            )
+        return self._client
+        
+    def _concurrency(self):
+        """Sémaphore limitant les requêtes OpenAI simultanées"""
+        return provider_semaphore("openai", self.max_concurrency)
+        
+    def _rate_limiter(self) -> RateLimiter:
+        """Quotas de requêtes et de tokens par minute, partagés par les instances OpenAI"""
+        return provider_rate_limiter("openai", self.requests_per_minute, self.tokens_per_minute)
+        
+    def _estimate_tokens(self, messages: list) -> int:
+        """Estime les tokens d'un appel : messages envoyés et réponse maximale"""
+        return sum(estimate_tokens(message["content"]) for message in messages) + self.MAX_TOKENS
+        
+    def _build_messages(self, prompt: str, context: Optional[Dict] = None) -> list:
+        """Construit les messages : historique de conversation puis prompt"""
         messages = []
         
         if context and context.get('conversation_history'):
             messages.extend(context['conversation_history'])
             
         messages.append({"role": "user", "content": prompt})
+        return messages
+        
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        """Génère une réponse via OpenAI"""
+        messages = self._build_messages(prompt, context)
         
         try:
-            response = await openai.ChatCompletion.acreate(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=500
-            )
+            async with self._concurrency():
+                async with self._rate_limiter().reserve(self._estimate_tokens(messages)) as reservation:
+                    response = await self._get_client().chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=self.MAX_TOKENS
+                    )
+                    if response.usage is not None:
+                        reservation.used = response.usage.total_tokens
             return response.choices[0].message.content
         except Exception as e:
             print(f"Erreur OpenAI: {str(e)}")
             return ""
             
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Génère une réponse via OpenAI, fragment par fragment (Server-Sent Events)
+        
+        Le flux n'est complet qu'à la réception d'une raison de fin (finish_reason) ;
+        sinon, ou en cas d'erreur, une exception est levée.
+        """
+        messages = self._build_messages(prompt, context)
+        try:
+            # La place est conservée jusqu'à la fin du flux
+            async with self._concurrency():
+                # Les flux ne renvoient pas d'usage : l'estimation est conservée
+                async with self._rate_limiter().reserve(self._estimate_tokens(messages)):
+                    stream = await self._get_client().chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=self.MAX_TOKENS,
+                        stream=True
+                    )
+                finish_reason = None
+                try:
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        if chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                        finish_reason = chunk.choices[0].finish_reason or finish_reason
+                finally:
+                    # Flux abandonné par l'appelant : la fermeture de la réponse interrompt la
+                    # génération côté serveur et rend la connexion au pool
+                    await stream.response.aclose()
+                if finish_reason is None:
+                    raise IncompleteStreamError("flux interrompu avant la fin de la génération")
+        except Exception as e:
+            print(f"Erreur OpenAI: {str(e)}")
+            raise
+            
+    async def aclose(self) -> None:
+        """Ferme le client et son pool de connexions"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            
     async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
         """Génère un post LinkedIn via OpenAI"""
         prompt = f"""
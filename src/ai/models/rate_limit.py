@@ -0,0 +1,130 @@
+"""
+Limitation de débit par fournisseur d'IA : requêtes et tokens par minute
+"""
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+def estimate_tokens(text: str) -> int:
+    """Estime le nombre de tokens d'un texte (environ 4 caractères par token)"""
+    return len(text) // 4 + 1
+    
+class TokenBucket:
+    """
+    Seau à jetons : se remplit en continu au débit du quota, jusqu'à une minute de quota
+    
+    Le niveau peut devenir négatif lorsqu'une consommation réelle dépasse l'estimation :
+    les appels suivants attendent alors que la dette soit résorbée.
+    """
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0  # jetons par seconde
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        
+    def _refill(self) -> None:
+        """Ajoute les jetons accumulés depuis la dernière mise à jour"""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+        
+    def delay(self, amount: float) -> float:
+        """Retourne le délai en secondes avant que amount jetons soient disponibles"""
+        self._refill()
+        # Une demande plus grande que le seau attend seulement qu'il soit plein
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+        
+    def consume(self, amount: float) -> None:
+        """Retire des jetons du seau (une quantité négative les restitue)"""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+        
+class Reservation:
+    """Tokens réservés pour un appel ; used reçoit la consommation réelle (usage) si connue"""
+    
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.used: Optional[int] = None
+        
+class RateLimiter:
+    """Limiteur d'un fournisseur : seau de requêtes et seau de tokens, 0 = pas de limite"""
+    
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        # Les appels sont servis dans leur ordre d'arrivée
+        self._lock = asyncio.Lock()
+        
+    def _delay(self, tokens: int) -> float:
+        """Délai avant que la requête et ses tokens puissent être consommés"""
+        delays = [0.0]
+        if self.requests is not None:
+            delays.append(self.requests.delay(1))
+        if self.tokens is not None:
+            delays.append(self.tokens.delay(tokens))
+        return max(delays)
+        
+    async def acquire(self, tokens: int) -> None:
+        """Attend que le quota permette un appel de tokens tokens, puis les consomme"""
+        async with self._lock:
+            delay = self._delay(tokens)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self._delay(tokens)
+            if self.requests is not None:
+                self.requests.consume(1)
+            if self.tokens is not None:
+                self.tokens.consume(tokens)
+                
+    def record_usage(self, reserved: int, used: int) -> None:
+        """Corrige le seau de tokens avec la consommation réelle d'un appel"""
+        if self.tokens is not None:
+            self.tokens.consume(used - reserved)
+            
+    @asynccontextmanager
+    async def reserve(self, tokens: int) -> AsyncIterator[Reservation]:
+        """
+        Réserve le quota d'un appel, puis le corrige à sa sortie
+        
+        Si l'appel échoue, ses tokens sont restitués (un refus du fournisseur n'est pas
+        décompté) ; sinon l'estimation est remplacée par reservation.used s'il a été renseigné.
+        
+        Args:
+            tokens: Estimation des tokens de l'appel (prompt et réponse maximale)
+        """
+        await self.acquire(tokens)
+        reservation = Reservation(tokens)
+        try:
+            yield reservation
+        except BaseException:
+            self.record_usage(tokens, 0)
+            raise
+        if reservation.used is not None:
+            self.record_usage(tokens, reservation.used)
+            
+# Limiteurs par boucle d'événements, puis par fournisseur
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, RateLimiter]]" = \
+    weakref.WeakKeyDictionary()
+    
+def provider_rate_limiter(provider: str, requests_per_minute: float = 0,
+                          tokens_per_minute: float = 0) -> RateLimiter:
+    """
+    Retourne le limiteur de débit partagé par toutes les instances d'un fournisseur
+    
+    Args:
+        provider: Nom du fournisseur ('openai', 'anthropic'...)
+        requests_per_minute: Quota de requêtes par minute, fixé à la création du limiteur
+        tokens_per_minute: Quota de tokens par minute, fixé à la création du limiteur
+        
+    Returns:
+        Limiteur lié à la boucle d'événements courante
+    """
+    limiters = _limiters.setdefault(asyncio.get_running_loop(), {})
+    limiter = limiters.get(provider)
+    if limiter is None:
+        limiter = limiters[provider] = RateLimiter(requests_per_minute, tokens_per_minute)
+    return limiter
@@ -0,0 +1,321 @@
+"""
+Routage des appels entre plusieurs fournisseurs d'IA, avec bascule automatique
+"""
+from collections import deque
+from contextlib import aclosing, nullcontext
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+import asyncio
+import time
+from src.ai.cache.decorators import is_failed_result, report_call, uncached
+from src.ai.models.base import BaseAIModel
+from src.ai.models.rate_limit import estimate_tokens
+from src.config import settings
+from src.utils.monitoring import metrics
+
+ROUTING_POLICIES = ("primary", "cheapest", "fastest")
+
+class ProviderStats:
+    """Statistiques glissantes d'un fournisseur : latences, erreurs et coût"""
+    
+    def __init__(self, window: int = 100):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.cost = 0.0
+        self.last_failure: Optional[float] = None
+        
+    def record(self, success: bool, latency: Optional[float] = None, cost: float = 0.0) -> None:
+        """Enregistre le résultat d'un appel"""
+        self.calls += 1
+        self.outcomes.append(success)
+        if latency is not None:
+            self.latencies.append(latency)
+        if success:
+            self.cost += cost
+        else:
+            self.errors += 1
+            self.last_failure = time.monotonic()
+            
+    def record_censored(self, latency: float) -> None:
+        """
+        Enregistre la durée d'un appel annulé (perdant d'une couverture) comme minorant
+        
+        Sans ces mesures, les appels les plus lents n'entreraient jamais dans la fenêtre :
+        les percentiles, et avec eux le délai de couverture, baisseraient sans cesse.
+        """
+        self.latencies.append(latency)
+        
+    def percentile(self, q: float) -> Optional[float]:
+        """Retourne le percentile q (entre 0 et 1) des latences récentes, None sans mesure"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        
+    @property
+    def error_rate(self) -> float:
+        """Part des appels récents en échec"""
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Statistiques exportées"""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.error_rate,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "cost": self.cost,
+        }
+        
+class RoutedModel(BaseAIModel):
+    """
+    Modèle répartissant les appels entre plusieurs fournisseurs
+    
+    Chaque appel est envoyé au meilleur fournisseur en bonne santé selon la politique
+    ('primary' : ordre de configuration, 'cheapest' : coût par token, 'fastest' : latence
+    médiane) ; en cas d'échec, il est relancé sur le fournisseur suivant.
+    
+    Configuration :
+        providers: Fournisseurs par nom ({'openai': OpenAIModel(...), ...}), par ordre de préférence
+        policy: Politique de routage
+        costs: Coût par millier de tokens, par fournisseur (surcharge COST_PER_1K_TOKENS)
+        hedge_percentile: Percentile de latence du fournisseur choisi au-delà duquel la même
+                          requête est envoyée au suivant, ou à une réplique (0 = désactivé)
+        hedge_budget: Part maximale des appels donnant lieu à une requête de couverture
+    """
+    
+    # Les fournisseurs gèrent leur propre cache
+    CACHE_POLICY = {name: None for name in BaseAIModel.CACHE_POLICY}
+    
+    # Coût indicatif par millier de tokens (prompt et réponse confondus)
+    COST_PER_1K_TOKENS = {"openai": 0.03, "anthropic": 0.01, "ollama": 0.0}
+    STATS_WINDOW = 100  # appels conservés par fournisseur
+    MAX_ERROR_RATE = 0.5  # au-delà, le fournisseur passe après les autres
+    MIN_SAMPLES = 5  # appels récents nécessaires pour juger un fournisseur
+    RETRY_AFTER = 30.0  # secondes sans échec avant de refaire confiance à un fournisseur
+    HEDGE_MIN_DELAY = 0.05  # secondes, délai minimal avant une requête de couverture
+    HEDGE_MAX_CREDIT = 5.0  # requêtes de couverture pouvant s'enchaîner après une période calme
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.providers: Dict[str, BaseAIModel] = dict(config.get('providers', {}))
+        self.model_name = "routed:" + ",".join(self.providers)
+        super().__init__(config)
+        
+    def initialize(self) -> None:
+        """Vérifie la configuration et prépare les statistiques des fournisseurs"""
+        if not self.providers:
+            raise ValueError("Aucun fournisseur configuré pour le routage")
+        self.policy = self.config.get('policy', 'primary')
+        if self.policy not in ROUTING_POLICIES:
+            raise ValueError(f"Politique de routage non supportée : {self.policy}")
+        self.costs = {**self.COST_PER_1K_TOKENS, **self.config.get('costs', {})}
+        self.stats = {name: ProviderStats(self.STATS_WINDOW) for name in self.providers}
+        self.hedge_percentile = self.config.get('hedge_percentile', settings.AI_HEDGE_PERCENTILE)
+        self.hedge_budget = self.config.get('hedge_budget', settings.AI_HEDGE_BUDGET)
+        # Crédit de couverture : chaque appel rapporte hedge_budget, chaque couverture coûte 1
+        self._hedge_credit = 0.0
+        
+    def _is_healthy(self, name: str) -> bool:
+        """Vrai si le fournisseur échoue peu, ou n'a pas échoué depuis RETRY_AFTER secondes"""
+        stats = self.stats[name]
+        if len(stats.outcomes) < self.MIN_SAMPLES or stats.error_rate <= self.MAX_ERROR_RATE:
+            return True
+        return time.monotonic() - stats.last_failure >= self.RETRY_AFTER
+        
+    def _order(self) -> List[str]:
+        """Ordre d'essai des fournisseurs : ceux en bonne santé d'abord, selon la politique"""
+        names = list(self.providers)
+        if self.policy == "cheapest":
+            names.sort(key=lambda name: self.costs.get(name, 0.0))
+        elif self.policy == "fastest":
+            # Un fournisseur sans mesure est essayé en premier, pour être évalué
+            names.sort(key=lambda name: self.stats[name].percentile(0.5) or 0.0)
+        return sorted(names, key=lambda name: not self._is_healthy(name))
+        
+    def _cost(self, name: str, prompt: str, result: Any) -> float:
+        """Coût estimé d'un appel réussi"""
+        tokens = estimate_tokens(prompt) + estimate_tokens(str(result))
+        return tokens / 1000 * self.costs.get(name, 0.0)
+        
+    async def _attempt(self, name: str, method: str, prompt: str, context: Optional[Dict] = None) -> Any:
+        """
+        Appelle la méthode sur un fournisseur et enregistre le résultat ('' en cas d'exception)
+        
+        Seuls les appels ayant atteint le fournisseur sont enregistrés : une réponse servie
+        par le cache ne dit rien de sa latence ni de son coût.
+        """
+        start = time.monotonic()
+        with report_call() as report:
+            try:
+                result = await getattr(self.providers[name], method)(prompt, context)
+            except asyncio.CancelledError:
+                self.stats[name].record_censored(time.monotonic() - start)
+                raise
+            except Exception as e:
+                print(f"Erreur du fournisseur {name}: {str(e)}")
+                result = ""
+        latency = time.monotonic() - start
+        
+        if report.served_from_cache:
+            return result
+        if is_failed_result(result):
+            self.stats[name].record(False, latency)
+        else:
+            self.stats[name].record(True, latency, self._cost(name, prompt, result))
+        return result
+        
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        """Délai avant couverture d'un appel au fournisseur, None si la couverture est impossible"""
+        stats = self.stats[name]
+        if not self.hedge_percentile or len(stats.latencies) < self.MIN_SAMPLES:
+            return None
+        return max(self.HEDGE_MIN_DELAY, stats.percentile(self.hedge_percentile))
+        
+    def _hedge_target(self, order: List[str]) -> str:
+        """Destination de la couverture : le fournisseur suivant s'il est sain, sinon une réplique"""
+        if len(order) > 1 and self._is_healthy(order[1]):
+            return order[1]
+        return order[0]
+        
+    async def _hedged_attempt(self, order: List[str], method: str, prompt: str,
+                              context: Optional[Dict] = None) -> Tuple[Any, List[str]]:
+        """
+        Appelle le premier fournisseur, puis couvre l'appel s'il tarde au-delà du percentile
+        
+        Le premier résultat non vide l'emporte et l'autre requête est annulée.
+        
+        Returns:
+            Le résultat et les fournisseurs essayés
+        """
+        primary = order[0]
+        delay = self._hedge_delay(primary)
+        task = asyncio.create_task(self._attempt(primary, method, prompt, context))
+        tasks = {task}
+        try:
+            if delay is None:
+                return await task, [primary]
+                
+            self._hedge_credit = min(self.HEDGE_MAX_CREDIT, self._hedge_credit + self.hedge_budget)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or self._hedge_credit < 1:
+                metrics.record_hedge(False)
+                return await task, [primary]
+                
+            self._hedge_credit -= 1
+            target = self._hedge_target(order)
+            # Une réplique du même modèle partagerait sinon l'appel en cours (single-flight)
+            same_model = self.providers[target].model_name == self.providers[primary].model_name
+            with uncached() if same_model else nullcontext():
+                hedge = asyncio.create_task(self._attempt(target, method, prompt, context))
+            tasks.add(hedge)
+            
+            result: Any = ""
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    result = finished.result()
+                    if not is_failed_result(result):
+                        metrics.record_hedge(True, won=finished is hedge)
+                        return result, [primary, target]
+            metrics.record_hedge(True)
+            return result, [primary, target]
+        finally:
+            # Requête perdante, ou appelant annulé
+            for pending_task in tasks:
+                pending_task.cancel()
+                
+    async def _route(self, method: str, prompt: str, context: Optional[Dict] = None) -> Any:
+        """
+        Appelle la méthode sur les fournisseurs, dans l'ordre, jusqu'au premier succès
+        
+        Returns:
+            Le premier résultat non vide, sinon le dernier résultat obtenu
+        """
+        order = self._order()
+        result, tried = await self._hedged_attempt(order, method, prompt, context)
+        if not is_failed_result(result):
+            return result
+            
+        for name in order:
+            if name in tried:
+                continue
+            result = await self._attempt(name, method, prompt, context)
+            if not is_failed_result(result):
+                return result
+                
+        print("Erreur de routage: aucun fournisseur n'a répondu")
+        return result
+        
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        """Génère une réponse via le meilleur fournisseur disponible"""
+        return await self._route("generate_response", prompt, context)
+        
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        Génère une réponse en flux via le meilleur fournisseur disponible
+        
+        Un fournisseur qui échoue avant son premier fragment est remplacé par le suivant ;
+        une fois un fragment transmis, le flux reste sur ce fournisseur et son erreur
+        éventuelle est propagée.
+        """
+        error: Optional[Exception] = None
+        for name in self._order():
+            chunks = []
+            try:
+                async with aclosing(self.providers[name].stream_response(prompt, context)) as stream:
+                    async for chunk in stream:
+                        if chunk:
+                            chunks.append(chunk)
+                            yield chunk
+            except Exception as e:
+                self.stats[name].record(False)
+                if chunks:
+                    raise
+                error = e
+                continue
+                
+            # Durée totale d'un flux : non comparable aux latences des appels simples
+            if chunks:
+                self.stats[name].record(True, cost=self._cost(name, prompt, "".join(chunks)))
+                return
+            self.stats[name].record(False)
+            
+        if error is not None:
+            raise error
+            
+    async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
+        """Génère un post LinkedIn via le meilleur fournisseur disponible"""
+        return await self._route("generate_post", topic, context)
+        
+    async def analyze_message(self, message: str, context: Optional[Dict] = None) -> Dict:
+        """Analyse un message via le meilleur fournisseur disponible"""
+        return await self._route("analyze_message", message, context)
+        
+    def _batch_concurrency(self) -> int:
+        """Parallélisme d'un lot : celui du fournisseur préféré"""
+        return self.providers[self._order()[0]]._batch_concurrency()
+        
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retourne les statistiques de routage
+        
+        Returns:
+            Par fournisseur : appels, erreurs, taux d'erreur récent, latences p50/p95, coût, santé
+        """
+        return {
+            name: {**stats.to_dict(), "healthy": self._is_healthy(name)}
+            for name, stats in self.stats.items()
+        }
+        
+    async def aclose(self) -> None:
+        """Libère les ressources de tous les fournisseurs"""
+        for model in self.providers.values():
+            await model.aclose()
+            
+    def cleanup(self) -> None:
+        """Nettoie les ressources de tous les fournisseurs"""
+        for model in self.providers.values():
+            model.cleanup()
@@ -21,10 +21,37 @@ LINKEDIN_REDIRECT_URI = os.getenv('LINKEDIN_REDIRECT_URI')
 
 # Configuration IA
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8'))  # requêtes simultanées
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '60'))  # secondes
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))  # 0 = pas de limite
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '10000'))  # 0 = pas de limite
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+ANTHROPIC_MAX_CONCURRENCY = int(os.getenv('ANTHROPIC_MAX_CONCURRENCY', '4'))  # requêtes simultanées
+ANTHROPIC_TIMEOUT = float(os.getenv('ANTHROPIC_TIMEOUT', '60'))  # secondes
+ANTHROPIC_REQUESTS_PER_MINUTE = int(os.getenv('ANTHROPIC_REQUESTS_PER_MINUTE', '50'))  # 0 = pas de limite
+ANTHROPIC_TOKENS_PER_MINUTE = int(os.getenv('ANTHROPIC_TOKENS_PER_MINUTE', '40000'))  # 0 = pas de limite
 OLLAMA_API_URL = os.getenv('OLLAMA_API_URL', 'http://localhost:11434')
 LLAMA_MODEL_PATH = os.getenv('LLAMA_MODEL_PATH')
 DEFAULT_AI_MODEL = os.getenv('DEFAULT_AI_MODEL', 'openai')
+AI_ROUTING_PROVIDERS = [name.strip() for name in os.getenv('AI_ROUTING_PROVIDERS', 'openai,anthropic,ollama').split(',') if name.strip()]
+AI_ROUTING_POLICY = os.getenv('AI_ROUTING_POLICY', 'primary')  # primary, cheapest ou fastest
+AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', '0'))  # ex : 0.95 ; 0 = pas de requête de couverture
+AI_HEDGE_BUDGET = float(os.getenv('AI_HEDGE_BUDGET', '0.05'))  # part maximale des appels couverts
+
+# Configuration du cache IA
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '0')) or None
+AI_CACHE_MAX_SIZE_BYTES = int(os.getenv('AI_CACHE_MAX_SIZE_BYTES', '0')) or None
+AI_CACHE_EVICTION_POLICY = os.getenv('AI_CACHE_EVICTION_POLICY', 'lru')  # lru, lfu ou ttl
+AI_CACHE_SWEEP_INTERVAL = int(os.getenv('AI_CACHE_SWEEP_INTERVAL', '300'))  # secondes, 0 = désactivé
+AI_CACHE_COMPRESSION = os.getenv('AI_CACHE_COMPRESSION', 'zlib')  # vide = désactivée
+AI_CACHE_COMPRESSION_THRESHOLD = int(os.getenv('AI_CACHE_COMPRESSION_THRESHOLD', '512'))  # octets
+AI_CACHE_SHARDS = int(os.getenv('AI_CACHE_SHARDS', '1'))  # fichiers SQLite, 1 = fichier unique
+AI_CACHE_BACKEND = os.getenv('AI_CACHE_BACKEND', 'sqlite')  # sqlite, memory ou sqlalchemy
+AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', './ai_cache.db')  # base du backend sqlite
+AI_CACHE_SNAPSHOT_PATH = os.getenv('AI_CACHE_SNAPSHOT_PATH', '')  # instantané importé au démarrage, exporté à l'arrêt ; vide = désactivé
+AI_CACHE_WARMUP_ENTRIES = int(os.getenv('AI_CACHE_WARMUP_ENTRIES', '0'))  # entrées préchargées en mémoire au démarrage, 0 = désactivé
+AI_CACHE_MEMORY_MAX_AGE = float(os.getenv('AI_CACHE_MEMORY_MAX_AGE', '60'))  # secondes en mémoire d'une entrée d'un backend partagé (délai de prise en compte des invalidations des autres instances)
 
 # Configuration Base de données
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./linkedin_bot.db')
@@ -2,11 +2,13 @@
 Point d'entrée principal de l'application
 """
 import asyncio
+from pathlib import Path
 from typing import Optional
 from src.config import settings
 from src.linkedin.client import LinkedInClient
 from src.ai.models.base import BaseAIModel
 from src.ai.models.factory import AIModelFactory
+from src.ai.cache.cache_manager import get_cache
 
 class SofiaBot:
     """Classe principale du bot Sofia"""
@@ -27,6 +29,36 @@ class SofiaBot:
             self.ai_model = AIModelFactory.create_model(self.model_type)
         except Exception as e:
             raise Exception(f"Échec de l'initialisation du modèle d'IA: {str(e)}")
+            
+        # Préchauffage du cache : dernier instantané, puis entrées les plus utilisées
+        await self.warm_up_cache()
+        
+        # Nettoyage périodique des entrées expirées du cache
+        if settings.AI_CACHE_SWEEP_INTERVAL > 0:
+            get_cache().start_sweeper(settings.AI_CACHE_SWEEP_INTERVAL)
+            
+    async def warm_up_cache(self):
+        """Recharge le cache après un redémarrage (échecs sans conséquence sur le démarrage)"""
+        cache = get_cache()
+        try:
+            snapshot_path = settings.AI_CACHE_SNAPSHOT_PATH
+            if snapshot_path and Path(snapshot_path).exists():
+                await cache.aimport_snapshot(snapshot_path)
+            if settings.AI_CACHE_WARMUP_ENTRIES > 0:
+                await cache.awarm_up(settings.AI_CACHE_WARMUP_ENTRIES)
+        except Exception as e:
+            print(f"Erreur de préchauffage du cache: {str(e)}")
+            
+    async def shutdown(self):
+        """Arrête le bot : nettoyage du cache, instantané et libération des ressources du modèle"""
+        await get_cache().stop_sweeper()
+        if settings.AI_CACHE_SNAPSHOT_PATH:
+            try:
+                await get_cache().aexport_snapshot(settings.AI_CACHE_SNAPSHOT_PATH)
+            except Exception as e:
+                print(f"Erreur d'export du cache: {str(e)}")
+        if self.ai_model:
+            await self.ai_model.aclose()
         
     async def process_message(self, message: str) -> str:
         """Traite un message et génère une réponse"""
@@ -70,6 +102,8 @@ async def main():
         await bot.run()
     except Exception as e:
         print(f"Erreur lors de l'exécution du bot: {str(e)}")
+    finally:
+        await bot.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -7,9 +7,11 @@ import asyncio
 import psutil
 import random
 import string
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 from pathlib import Path
 from src.ai.cache.cache_manager import AIResponseCache
+from src.ai.cache.history import HashedHistory
 
 def generate_random_string(length: int) -> str:
     """Génère une chaîne aléatoire de longueur donnée"""
@@ -26,7 +28,9 @@ def perf_cache():
     db_path = "perf_test_cache.db"
     cache = AIResponseCache(db_path)
     yield cache
-    Path(db_path).unlink(missing_ok=True)
+    cache.close()
+    for suffix in ("", "-wal", "-shm"):
+        Path(db_path + suffix).unlink(missing_ok=True)
 
 @pytest.mark.performance
 def test_write_performance(perf_cache):
@@ -52,7 +56,7 @@ def test_write_performance(perf_cache):
     print(f"Temps moyen par entrée: {(write_time/num_entries)*1000:.2f} ms")
     print(f"Mémoire utilisée: {memory_used:.2f} MB")
     
-    assert write_time/num_entries < 0.01  # Max 10ms par écriture
+    assert write_time/num_entries < 0.001  # Max 1ms par écriture
 
 @pytest.mark.performance
 def test_read_performance(perf_cache):
@@ -81,16 +85,35 @@ def test_read_performance(perf_cache):
     print(f"Temps moyen par lecture: {(read_time/len(prompts))*1000:.2f} ms")
     print(f"Taux de hits: {(hits/len(prompts))*100:.1f}%")
     
-    assert read_time/len(prompts) < 0.005  # Max 5ms par lecture
+    assert read_time/len(prompts) < 0.0005  # Max 0.5ms par lecture
+    
+@pytest.mark.performance
+def test_memory_tier_read_performance(perf_cache):
+    """Test les performances en lecture des clés chaudes (niveau mémoire)"""
+    prompts = [generate_random_string(50) for _ in range(100)]
+    for prompt in prompts:
+        perf_cache.set("test-model", prompt, generate_random_string(200))
+        
+    num_reads = 10000
+    start_time = time.perf_counter()
+    for i in range(num_reads):
+        perf_cache.get("test-model", prompts[i % len(prompts)])
+    read_time = time.perf_counter() - start_time
+    
+    print(f"\nPerformance de lecture (niveau mémoire):")
+    print(f"Temps moyen par lecture: {(read_time/num_reads)*1e6:.1f} µs")
+    
+    assert perf_cache.get_stats()["memory_hits"] == num_reads
+    assert read_time/num_reads < 0.00005  # Max 50µs par lecture
 
 @pytest.mark.performance
 def test_concurrent_access(perf_cache):
     """Test les accès concurrents"""
     async def concurrent_operation(operation: str, prompt: str):
         if operation == "write":
-            perf_cache.set("test-model", prompt, generate_random_string(200))
+            await perf_cache.aset("test-model", prompt, generate_random_string(200))
         else:
-            perf_cache.get("test-model", prompt)
+            await perf_cache.aget("test-model", prompt)
     
     async def run_concurrent_operations():
         num_operations = 100
@@ -113,7 +136,7 @@ def test_concurrent_access(perf_cache):
     print(f"\nPerformance des accès concurrents:")
     print(f"Temps total: {total_time:.2f} secondes")
     
-    assert total_time < 2.0  # Max 2 secondes pour 100 opérations concurrentes
+    assert total_time < 0.2  # Max 200ms pour 100 opérations concurrentes
 
 @pytest.mark.performance
 def test_cache_size_impact(perf_cache):
@@ -152,8 +175,8 @@ def test_cache_size_impact(perf_cache):
         print(f"Temps d'écriture moyen: {(times['write_time']/100)*1000:.2f} ms")
         
         # Les performances ne devraient pas se dégrader de manière significative
-        assert times['read_time']/100 < 0.01  # Max 10ms par lecture
-        assert times['write_time']/100 < 0.02  # Max 20ms par écriture
+        assert times['read_time']/100 < 0.001  # Max 1ms par lecture
+        assert times['write_time']/100 < 0.002  # Max 2ms par écriture
 
 @pytest.mark.performance
 def test_memory_cleanup(perf_cache):
@@ -183,4 +206,127 @@ def test_memory_cleanup(perf_cache):
     print(f"Entrées supprimées: {deleted}")
     
     assert cleanup_time < 1.0  # Max 1 seconde pour le nettoyage
-    assert deleted == num_entries  # Toutes les entrées doivent être supprimées 
\ No newline at end of file
+    assert deleted == num_entries  # Toutes les entrées doivent être supprimées 
+    
+@pytest.mark.performance
+def test_cache_key_history_scaling(perf_cache):
+    """Test que le coût de la clé ne croît pas avec la longueur de l'historique"""
+    history = HashedHistory()
+    timings = {}
+    
+    for turn in range(1, 2001):
+        history.append({"role": "user", "content": generate_random_string(200)})
+        if turn in (10, 2000):
+            context = {"conversation_history": history}
+            start_time = time.perf_counter()
+            for _ in range(100):
+                perf_cache._generate_cache_key("test-model", "prompt", context)
+            timings[turn] = (time.perf_counter() - start_time) / 100
+            
+    print(f"\nGénération de clé avec historique:")
+    for turn, duration in timings.items():
+        print(f"{turn} messages: {duration*1e6:.1f} µs")
+        
+    # Coût constant : pas plus de 3 fois plus lent avec 200 fois plus de messages
+    assert timings[2000] < timings[10] * 3
+    
+@pytest.mark.performance
+def test_bulk_operations_performance(tmp_path):
+    """Compare get_many/set_many à une boucle d'appels unitaires"""
+    num_entries = 1000
+    entries = [
+        {"model_name": "test-model", "prompt": f"prompt_{i}", "response": generate_random_string(200)}
+        for i in range(num_entries)
+    ]
+    requests = [(entry["model_name"], entry["prompt"]) for entry in entries]
+    
+    # Écritures dans des bases neuves à chaque essai (meilleur de 3) ; niveau mémoire
+    # désactivé : on mesure les accès SQLite
+    single_write = bulk_write = float("inf")
+    for attempt in range(3):
+        single = AIResponseCache(str(tmp_path / f"single{attempt}.db"), memory_max_entries=0)
+        bulk = AIResponseCache(str(tmp_path / f"bulk{attempt}.db"), memory_max_entries=0)
+    
+        start_time = time.perf_counter()
+        for entry in entries:
+            single.set(**entry)
+        single_write = min(single_write, time.perf_counter() - start_time)
+    
+        start_time = time.perf_counter()
+        bulk.set_many(entries)
+        bulk_write = min(bulk_write, time.perf_counter() - start_time)
+        if attempt < 2:
+            single.close()
+            bulk.close()
+    
+    # Compteurs d'utilisation différés : on compare les seules lectures (meilleur de 3)
+    single_read = bulk_read = float("inf")
+    for cache in (single, bulk):
+        cache.HIT_FLUSH_THRESHOLD = cache.HIT_FLUSH_INTERVAL = float("inf")
+    for _ in range(3):
+        start_time = time.perf_counter()
+        single_results = [single.get(*request) for request in requests]
+        single_read = min(single_read, time.perf_counter() - start_time)
+        
+        start_time = time.perf_counter()
+        bulk_results = bulk.get_many(requests)
+        bulk_read = min(bulk_read, time.perf_counter() - start_time)
+        
+    print(f"\nOpérations groupées ({num_entries} entrées):")
+    print(f"Écriture: {single_write*1000:.1f} ms unitaire, {bulk_write*1000:.1f} ms groupée")
+    print(f"Lecture: {single_read*1000:.1f} ms unitaire, {bulk_read*1000:.1f} ms groupée")
+    
+    assert bulk_results == single_results == [entry["response"] for entry in entries]
+    assert bulk_write < single_write
+    assert bulk_read < single_read
+    single.close()
+    bulk.close()
+    
+@pytest.mark.performance
+def test_stats_performance(perf_cache):
+    """Test que get_stats ne dépend pas du nombre d'entrées"""
+    perf_cache.set_many([
+        {"model_name": "test-model", "prompt": f"prompt_{i}", "response": generate_random_string(500)}
+        for i in range(20000)
+    ])
+    
+    start_time = time.perf_counter()
+    for _ in range(100):
+        stats = perf_cache.get_stats()
+    avg_time = (time.perf_counter() - start_time) / 100
+    
+    print(f"\nStatistiques ({stats['total_entries']} entrées): {avg_time*1000:.3f} ms")
+    
+    assert stats["total_entries"] == 20000
+    assert avg_time < 0.001  # Max 1ms, indépendamment de la taille de la table
+    
+@pytest.mark.performance
+def test_sharded_write_throughput(tmp_path):
+    """Compare le débit d'écriture concurrent d'un fichier unique et de plusieurs shards"""
+    num_writers = 8
+    writes_per_writer = 200
+    response = generate_random_string(1000)
+    throughputs = {}
+    
+    for shards in (1, 4):
+        cache = AIResponseCache(str(tmp_path / f"shards{shards}.db"), memory_max_entries=0, shards=shards)
+        
+        def write(writer: int):
+            for i in range(writes_per_writer):
+                cache.set("test-model", f"prompt_{writer}_{i}", response)
+                
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(num_writers) as executor:
+            list(executor.map(write, range(num_writers)))
+        throughputs[shards] = num_writers * writes_per_writer / (time.perf_counter() - start_time)
+        
+        assert cache.get_stats()["total_entries"] == num_writers * writes_per_writer
+        cache.close()
+        
+    print(f"\nDébit d'écriture concurrent ({num_writers} threads):")
+    for shards, throughput in throughputs.items():
+        print(f"{shards} shard(s): {throughput:.0f} écritures/s")
+        
+    # Aucun verrou global : le mode réparti ne doit pas dégrader le débit
+    assert throughputs[4] > throughputs[1] * 0.5
+    
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""
+Tests unitaires pour les backends de stockage du cache
+"""
+import pytest
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from src.ai.cache.cache_manager import AIResponseCache
+from src.ai.cache.backends.factory import CacheBackendFactory
+from src.ai.cache.backends.memory_backend import MemoryBackend
+from src.ai.cache.backends.sqlalchemy_backend import SQLAlchemyBackend
+from src.ai.cache.backends.sqlite_backend import SQLiteBackend
+
+@pytest.fixture(params=["memory", "sqlite", "sqlalchemy"])
+def backend(request, tmp_path):
+    """Fixture créant chaque backend (SQLAlchemy sur un moteur SQLite temporaire)"""
+    if request.param == "memory":
+        backend = MemoryBackend()
+    elif request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    else:
+        engine = create_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+        backend = SQLAlchemyBackend(engine)
+    yield backend
+    backend.close()
+    
+@pytest.fixture
+def cache(backend):
+    """Cache sans niveau mémoire : chaque lecture atteint le backend"""
+    return AIResponseCache(memory_max_entries=0, compression="zlib", compression_threshold=64,
+                           backend=backend)
+                           
+def _stats(cache):
+    """Statistiques à jour (l'instantané partagé du backend SQLAlchemy est d'abord recalculé)"""
+    if isinstance(cache.backend, SQLAlchemyBackend):
+        cache.recompute_stats()
+    return cache.get_stats()
+    
+def test_set_and_get(cache):
+    """Test l'aller-retour des réponses, brutes et compressées"""
+    long_response = "réponse " * 100
+    cache.set("gpt-4", "court", "réponse", {"lang": "fr"})
+    cache.set("gpt-4", "long", long_response, method="generate_post")
+    
+    assert cache.get("gpt-4", "court", {"lang": "fr"}) == "réponse"
+    assert cache.get("gpt-4", "long", method="generate_post") == long_response
+    assert cache.get("gpt-4", "absent") is None
+    
+def test_replace_and_delete(cache):
+    """Test le remplacement d'une clé et sa suppression"""
+    cache.set("gpt-4", "prompt", "v1")
+    cache.set("gpt-4", "prompt", "v2")
+    assert cache.get("gpt-4", "prompt") == "v2"
+    assert _stats(cache)["total_entries"] == 1
+    
+    cache.delete(cache._generate_cache_key("gpt-4", "prompt"))
+    assert cache.get("gpt-4", "prompt") is None
+    assert _stats(cache)["total_entries"] == 0
+    
+def test_get_many_and_hits(cache):
+    """Test la lecture groupée et l'écriture des compteurs d'utilisation"""
+    cache.set_many([{"model_name": "gpt-4", "prompt": f"p{i}", "response": f"r{i}"} for i in range(5)])
+    
+    assert cache.get_many([("gpt-4", "p3"), ("gpt-4", "absent"), ("gpt-4", "p0")]) == ["r3", None, "r0"]
+    stats = _stats(cache)
+    assert stats["total_entries"] == 5
+    assert stats["total_hits"] == 2
+    
+def test_invalidate(cache):
+    """Test l'invalidation par espace de noms"""
+    for i in range(4):
+        cache.set("gpt-4", f"p{i}", "r", method="generate_post" if i % 2 else "generate_response")
+    cache.set("claude", "p0", "r", method="generate_post")
+    
+    assert cache.invalidate(model="gpt-4", method="generate_post", batch_size=1) == 2
+    assert cache.get("gpt-4", "p0", method="generate_response") == "r"
+    assert cache.get("claude", "p0", method="generate_post") == "r"
+    
+def test_sweep_expired(cache):
+    """Test la suppression des entrées expirées"""
+    cache.set("gpt-4", "expired", "r", ttl_hours=-1)
+    cache.set("gpt-4", "valid", "r")
+    
+    assert cache.get("gpt-4", "expired") is None
+    assert _stats(cache)["expired_entries"] == 1
+    assert cache.clear_expired() == 1
+    assert _stats(cache)["total_entries"] == 1
+    
+def test_lfu_eviction(cache):
+    """Test l'éviction des entrées les moins utilisées"""
+    cache.max_entries = 3
+    cache.eviction_policy = "lfu"
+    for i in range(4):
+        cache.set("gpt-4", f"p{i}", "r")
+    for i in (0, 1, 3):
+        cache.get("gpt-4", f"p{i}")
+    cache.flush_hits()
+    
+    assert cache.enforce_limits() == 2
+    assert cache.get("gpt-4", "p2") is None
+    assert _stats(cache)["total_entries"] == 2
+    
+def test_stale_entry(cache):
+    """Test la date de péremption conservée par le backend"""
+    cache.set("gpt-4", "prompt", "r", ttl_hours=-1, stale_grace_hours=2)
+    assert cache.get_entry("gpt-4", "prompt") == ("r", True)
+    
+def test_add_usage_keeps_latest_access(backend, cache):
+    """Test que la date de dernier accès ne recule pas"""
+    cache.set("gpt-4", "prompt", "r")
+    cache_key = cache._generate_cache_key("gpt-4", "prompt")
+    backend.add_usage({cache_key: (2, datetime.utcnow() - timedelta(days=1))})
+    cache.set("gpt-4", "recent", "r")
+    
+    # L'entrée la plus ancienne reste "prompt" malgré l'ajout de hits
+    assert backend.evict(1, "lru") == [cache_key]
+    
+def test_counters_match_recompute(backend, cache):
+    """Test que les agrégats tenus par les écritures restent égaux à un recalcul complet"""
+    if isinstance(backend, SQLAlchemyBackend):
+        pytest.skip("Agrégats non tenus par les écritures (voir test_sqlalchemy_stats_snapshot)")
+    cache.set_many([{"model_name": "gpt-4", "prompt": f"p{i}", "response": f"r{i}" * 50} for i in range(6)])
+    cache.get_many([("gpt-4", "p0"), ("gpt-4", "p1"), ("gpt-4", "p1")])
+    cache.flush_hits()
+    # Remplacement d'une entrée utilisée, suppression, expiration et éviction
+    cache.set("gpt-4", "p1", "autre réponse")
+    cache.delete(cache._generate_cache_key("gpt-4", "p2"))
+    cache.set("gpt-4", "vieux", "r", ttl_hours=-1)
+    cache.sweep_expired()
+    backend.evict(1, "lfu")
+    
+    maintained = cache.get_stats()
+    cache.recompute_stats()
+    assert cache.get_stats() == maintained
+    assert maintained["total_entries"] == 4
+    assert backend.usage() == (4, maintained["total_size_bytes"])
+    
+def test_sqlalchemy_stats_snapshot(tmp_path):
+    """Test l'instantané partagé des agrégats et l'usage exact du backend SQLAlchemy"""
+    backend = SQLAlchemyBackend(create_engine(f"sqlite:///{tmp_path / 'shared.db'}"))
+    cache = AIResponseCache(memory_max_entries=0, backend=backend)
+    
+    # Une clé en double dans un lot : la dernière valeur l'emporte, une seule entrée
+    cache.set_many([{"model_name": "gpt-4", "prompt": "p", "response": response} for response in ("r1", "r2")])
+    cache.set("gpt-4", "autre", "r")
+    assert cache.get("gpt-4", "p") == "r2"
+    entries, stored_bytes = backend.usage()
+    assert entries == 2
+    assert backend.stats()["total_entries"] == 2
+    
+    # Les écritures ne touchent pas l'instantané tant qu'il a moins de STATS_TTL secondes
+    cache.delete(cache._generate_cache_key("gpt-4", "autre"))
+    assert backend.stats()["total_entries"] == 2
+    assert backend.usage()[0] == 1
+    
+    # Les hits d'une entrée supprimée entre-temps ne sont pas comptés
+    cache.get("gpt-4", "p")
+    backend.add_usage({cache._generate_cache_key("gpt-4", "autre"): (5, datetime.utcnow())})
+    cache.recompute_stats()
+    stats = backend.stats()
+    assert (stats["total_entries"], stats["total_hits"]) == (1, 2)
+    assert stats["total_size_bytes"] < stored_bytes
+    
+    backend.STATS_TTL = 0
+    cache.set("gpt-4", "nouveau", "r")
+    assert backend.stats()["total_entries"] == 2
+    cache.close()
+    
+def test_shared_backend_invalidation_reaches_other_instances(tmp_path):
+    """Test qu'une invalidation sur une instance s'applique aux autres après memory_max_age"""
+    from src.config import settings
+    engine = create_engine(f"sqlite:///{tmp_path / 'shared.db'}")
+    replica = AIResponseCache(backend=SQLAlchemyBackend(engine), memory_max_age=0.05)
+    other = AIResponseCache(backend=SQLAlchemyBackend(engine))
+    assert other.memory.max_age == settings.AI_CACHE_MEMORY_MAX_AGE
+    
+    replica.set("gpt-4", "prompt", "r", tag="v1")
+    assert replica.get("gpt-4", "prompt", tag="v1") == "r"
+    assert other.invalidate(tag="v1") == 1
+    
+    # Servie par le niveau mémoire de l'instance, puis relue (absente) dans le backend
+    assert replica.get("gpt-4", "prompt", tag="v1") == "r"
+    time.sleep(0.1)
+    assert replica.get("gpt-4", "prompt", tag="v1") is None
+    replica.close()
+    other.close()
+    
+def test_factory(tmp_path):
+    """Test la création des backends par type"""
+    assert isinstance(CacheBackendFactory.create_backend("memory"), MemoryBackend)
+    sqlite_backend = CacheBackendFactory.create_backend("sqlite", db_path=str(tmp_path / "f.db"), shards=2)
+    assert isinstance(sqlite_backend, SQLiteBackend)
+    assert sqlite_backend.shards == 2
+    sqlite_backend.close()
+    
+    with pytest.raises(ValueError) as exc_info:
+        CacheBackendFactory.create_backend("redis")
+    assert "Type de backend de cache non supporté" in str(exc_info.value)
+    
+def test_default_path_from_settings(monkeypatch, tmp_path):
+    """Test que le chemin par défaut vient d'AI_CACHE_PATH et non de DATABASE_URL"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "AI_CACHE_PATH", str(tmp_path / "default.db"))
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://user@host/db")
+    
+    cache = AIResponseCache()
+    assert cache.db_path == str(tmp_path / "default.db")
+    cache.close()
+    
+def test_iter_hottest(backend, cache):
+    """Test le parcours des entrées valides, des plus utilisées aux moins utilisées"""
+    for i in range(4):
+        cache.set("gpt-4", f"p{i}", "r" * 100)
+        for _ in range(i):
+            cache.get("gpt-4", f"p{i}")
+    cache.set("gpt-4", "expired", "r", ttl_hours=-1)
+    cache.flush_hits()
+    
+    hottest = list(backend.iter_hottest(3))
+    assert [usage for _, usage in hottest] == [3, 2, 1]
+    assert hottest[0][0].cache_key == cache._generate_cache_key("gpt-4", "p3")
+    assert hottest[0][0].prompt == "p3"
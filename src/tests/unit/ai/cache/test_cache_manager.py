@@ -3,9 +3,12 @@ Tests unitaires pour le gestionnaire de cache
 """
 import pytest
 import json
+import asyncio
+import sqlite3
 from datetime import datetime, timedelta
 from pathlib import Path
 from src.ai.cache.cache_manager import AIResponseCache
+from src.ai.cache.history import HashedHistory
 
 @pytest.fixture
 def cache():
@@ -15,7 +18,9 @@ def cache():
     cache = AIResponseCache(db_path)
     yield cache
     # Nettoyage après les tests
-    Path(db_path).unlink(missing_ok=True)
+    cache.close()
+    for suffix in ("", "-wal", "-shm"):
+        Path(db_path + suffix).unlink(missing_ok=True)
 
 def test_cache_initialization(cache):
     """Test l'initialisation du cache"""
@@ -27,6 +32,50 @@ def test_cache_initialization(cache):
             WHERE type='table' AND name='ai_cache'
         """)
         assert cursor.fetchone() is not None
+        
+def test_persistent_connection(cache):
+    """Test la réutilisation de la connexion et le mode WAL"""
+    conn = cache._get_connection()
+    assert cache._get_connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    cache.set("test-model", "prompt", "response")
+    assert cache.get("test-model", "prompt") == "response"
+    assert len(cache.backend._connections) == 1
+    
+def test_connection_per_thread(cache):
+    """Test qu'une connexion distincte est ouverte par thread"""
+    import threading
+    
+    results = []
+    cache.set("test-model", "prompt", "response")
+    
+    def read():
+        results.append((cache._get_connection(), cache.get("test-model", "prompt")))
+        
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join()
+    
+    thread_conn, response = results[0]
+    assert response == "response"
+    assert thread_conn is not cache._get_connection()
+    # La connexion du thread terminé est fermée et oubliée
+    assert cache.backend._connections == [cache._get_connection()]
+    with pytest.raises(sqlite3.ProgrammingError):
+        thread_conn.execute("SELECT 1")
+        
+def test_short_lived_threads_release_connections(cache):
+    """Test que les threads éphémères ne laissent pas de connexions ouvertes"""
+    import threading
+    
+    cache.set("test-model", "prompt", "response")
+    key = cache._generate_cache_key("test-model", "prompt")
+    for _ in range(50):
+        thread = threading.Thread(target=cache.backend.fetch, args=([key],))
+        thread.start()
+        thread.join()
+    assert len(cache.backend._connections) == 1
 
 def test_generate_cache_key(cache):
     """Test la génération des clés de cache"""
@@ -77,6 +126,8 @@ def test_cache_expiration(cache):
             SET expires_at = datetime('now', '-1 hour')
             WHERE model_name = 'test-model'
         """)
+    # La modification directe en base n'est pas visible du niveau mémoire
+    cache.memory.clear()
     
     # Vérifie que l'entrée expirée n'est pas retournée
     assert cache.get("test-model", "prompt") is None
@@ -132,4 +183,653 @@ def test_get_stats(cache):
     assert stats["total_entries"] == 2
     assert stats["total_hits"] == 3
     assert stats["avg_hits_per_entry"] == 1.5
-    assert "total_size_bytes" in stats 
\ No newline at end of file
+    assert "total_size_bytes" in stats 
+    
+def test_memory_tier_hit(cache):
+    """Test que les clés chaudes sont servies par le niveau mémoire"""
+    cache.set("test-model", "prompt", "response")
+    
+    # Supprime la ligne SQLite : seule la mémoire peut encore répondre
+    with cache._get_connection() as conn:
+        conn.execute("DELETE FROM ai_cache")
+        
+    assert cache.get("test-model", "prompt") == "response"
+    stats = cache.get_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["disk_hits"] == 0
+    
+def test_memory_tier_promotion(cache):
+    """Test la promotion en mémoire d'une entrée lue depuis SQLite"""
+    cache.set("test-model", "prompt", "response")
+    cache.memory.clear()
+    
+    assert cache.get("test-model", "prompt") == "response"
+    assert cache.get("test-model", "prompt") == "response"
+    assert cache.get("test-model", "missing") is None
+    
+    stats = cache.get_stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["disk_misses"] == 1
+    assert stats["memory_entries"] == 1
+    
+def test_memory_tier_disabled(tmp_path):
+    """Test le cache sans niveau mémoire"""
+    cache = AIResponseCache(str(tmp_path / "cache.db"), memory_max_entries=0)
+    cache.set("test-model", "prompt", "response")
+    
+    assert cache.get("test-model", "prompt") == "response"
+    assert len(cache.memory) == 0
+    assert cache.get_stats()["disk_hits"] == 1
+    cache.close()
+    
+def test_delete_invalidates_memory(cache):
+    """Test que la suppression invalide aussi le niveau mémoire"""
+    cache.set("test-model", "prompt", "response")
+    cache.delete(cache._generate_cache_key("test-model", "prompt"))
+    
+    assert cache.get("test-model", "prompt") is None
+    
+@pytest.mark.asyncio
+async def test_async_api(cache):
+    """Test l'API asynchrone du cache"""
+    await cache.aset("test-model", "prompt", "response")
+    assert await cache.aget("test-model", "prompt") == "response"
+    
+    # Lecture depuis SQLite via le pool de threads
+    cache.memory.clear()
+    assert await cache.aget("test-model", "prompt") == "response"
+    assert cache.get_stats()["disk_hits"] == 1
+    
+    await cache.adelete(cache._generate_cache_key("test-model", "prompt"))
+    assert await cache.aget("test-model", "prompt") is None
+    
+def _usage_count(cache, prompt):
+    """Lit directement le compteur d'utilisation en base"""
+    cache_key = cache._generate_cache_key("test-model", prompt)
+    with cache._get_connection() as conn:
+        return conn.execute(
+            "SELECT usage_count FROM ai_cache WHERE cache_key = ?", (cache_key,)
+        ).fetchone()[0]
+        
+def test_hits_are_written_behind(cache):
+    """Test que les lectures n'écrivent pas immédiatement le compteur"""
+    cache.set("test-model", "prompt", "response")
+    cache.get("test-model", "prompt")
+    cache.get("test-model", "prompt")
+    
+    assert _usage_count(cache, "prompt") == 0
+    assert cache.flush_hits() == 1
+    assert _usage_count(cache, "prompt") == 2
+    assert cache.flush_hits() == 0
+    
+def test_hits_flushed_on_threshold(cache):
+    """Test l'écriture groupée dès que le seuil est atteint"""
+    cache.HIT_FLUSH_THRESHOLD = 3
+    for i in range(3):
+        cache.set("test-model", f"prompt{i}", "response")
+        
+    cache.get("test-model", "prompt0")
+    cache.get("test-model", "prompt1")
+    assert _usage_count(cache, "prompt0") == 0
+    
+    cache.get("test-model", "prompt2")
+    assert [_usage_count(cache, f"prompt{i}") for i in range(3)] == [1, 1, 1]
+    
+def test_hits_flushed_on_close(tmp_path):
+    """Test l'écriture des compteurs à la fermeture"""
+    db_path = str(tmp_path / "cache.db")
+    cache = AIResponseCache(db_path)
+    cache.set("test-model", "prompt", "response")
+    cache.get("test-model", "prompt")
+    cache.close()
+    
+    reopened = AIResponseCache(db_path)
+    assert reopened.get_stats()["total_hits"] == 1
+    reopened.close()
+    
+def _bounded_cache(tmp_path, **kwargs):
+    """Crée un cache borné qui vérifie ses limites à chaque écriture"""
+    cache = AIResponseCache(str(tmp_path / "bounded.db"), memory_max_entries=0, **kwargs)
+    cache.EVICTION_CHECK_INTERVAL = 1
+    return cache
+    
+def test_invalid_eviction_policy(tmp_path):
+    """Test le refus d'une politique d'éviction inconnue"""
+    with pytest.raises(ValueError) as exc_info:
+        AIResponseCache(str(tmp_path / "cache.db"), eviction_policy="random")
+    assert "Politique d'éviction non supportée" in str(exc_info.value)
+    
+def test_max_entries_lru(tmp_path):
+    """Test l'éviction LRU lorsque le nombre d'entrées est dépassé"""
+    cache = _bounded_cache(tmp_path, max_entries=3, eviction_policy="lru")
+    for i in range(3):
+        cache.set("test-model", f"prompt{i}", "response")
+        
+    # prompt0 devient l'entrée la plus récemment utilisée
+    cache.get("test-model", "prompt0")
+    cache.flush_hits()
+    cache.set("test-model", "prompt3", "response")
+    
+    stats = cache.get_stats()
+    assert stats["total_entries"] <= 3
+    assert stats["evictions"] >= 1
+    assert cache.get("test-model", "prompt0") == "response"
+    assert cache.get("test-model", "prompt1") is None
+    cache.close()
+    
+def test_max_entries_lfu(tmp_path):
+    """Test l'éviction LFU sur usage_count"""
+    cache = _bounded_cache(tmp_path, max_entries=2, eviction_policy="lfu")
+    cache.set("test-model", "popular", "response")
+    cache.set("test-model", "rare", "response")
+    for _ in range(3):
+        cache.get("test-model", "popular")
+    cache.flush_hits()
+    
+    cache.set("test-model", "new", "response")
+    
+    assert cache.get("test-model", "popular") == "response"
+    assert cache.get("test-model", "rare") is None
+    cache.close()
+    
+def test_eviction_flushes_pending_hits(tmp_path):
+    """Test que l'éviction tient compte des hits encore en attente d'écriture"""
+    cache = _bounded_cache(tmp_path, max_entries=2, eviction_policy="lfu")
+    cache.set("test-model", "popular", "response")
+    cache.set("test-model", "rare", "response")
+    for _ in range(3):
+        cache.get("test-model", "popular")
+        
+    cache.set("test-model", "new", "response")
+    
+    assert cache.get("test-model", "popular") == "response"
+    assert cache.get("test-model", "rare") is None
+    cache.close()
+    
+def test_max_entries_ttl(tmp_path):
+    """Test l'éviction des entrées expirant le plus tôt"""
+    cache = _bounded_cache(tmp_path, max_entries=2, eviction_policy="ttl")
+    cache.set("test-model", "short", "response", ttl_hours=1)
+    cache.set("test-model", "long", "response", ttl_hours=48)
+    cache.set("test-model", "medium", "response", ttl_hours=24)
+    
+    assert cache.get("test-model", "short") is None
+    assert cache.get("test-model", "long") == "response"
+    cache.close()
+    
+def test_max_size_bytes(tmp_path):
+    """Test la limite de taille en octets"""
+    cache = _bounded_cache(tmp_path, max_size_bytes=5000)
+    for i in range(20):
+        cache.set("test-model", f"prompt{i}", "x" * 500)
+        
+    stats = cache.get_stats()
+    assert stats["evictions"] > 0
+    entries, size_bytes = cache.backend.usage()
+    assert size_bytes <= 5000
+    assert cache.get("test-model", "prompt19") == "x" * 500
+    cache.close()
+    
+def test_eviction_uses_index(cache):
+    """Test que la sélection des entrées à évincer passe par un index"""
+    for policy, order_by in [("lru", "last_accessed_at"), ("lfu", "usage_count, last_accessed_at"), ("ttl", "expires_at")]:
+        plan = cache._get_connection().execute(
+            f"EXPLAIN QUERY PLAN SELECT cache_key FROM ai_cache ORDER BY {order_by} LIMIT 10"
+        ).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        assert "USING INDEX" in details or "USING COVERING INDEX" in details
+        assert "TEMP B-TREE" not in details
+        
+def _expire_all(cache):
+    """Rend toutes les entrées expirées directement en base"""
+    with cache._get_connection() as conn:
+        conn.execute("UPDATE ai_cache SET expires_at = datetime('now', '-1 hour')")
+    cache.memory.clear()
+    
+def test_expired_read_is_pure_miss(cache):
+    """Test qu'une lecture d'entrée expirée ne la supprime pas"""
+    cache.set("test-model", "prompt", "response")
+    _expire_all(cache)
+    
+    assert cache.get("test-model", "prompt") is None
+    assert cache.get_stats()["total_entries"] == 1
+    assert cache.get_stats()["expired_entries"] == 1
+    
+def test_sweep_expired_in_batches(cache):
+    """Test la suppression des entrées expirées par lots bornés"""
+    for i in range(5):
+        cache.set("test-model", f"prompt{i}", "response")
+    _expire_all(cache)
+    cache.set("test-model", "valid", "response")
+    
+    assert cache.sweep_expired(batch_size=2) == 2
+    assert cache.sweep_expired(batch_size=2) == 2
+    assert cache.sweep_expired(batch_size=2) == 1
+    assert cache.sweep_expired(batch_size=2) == 0
+    assert cache.get("test-model", "valid") == "response"
+    
+def test_clear_expired_uses_index(cache):
+    """Test que la recherche des entrées expirées utilise l'index sur expires_at"""
+    plan = cache._get_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT cache_key FROM ai_cache WHERE expires_at < datetime('now')"
+    ).fetchall()
+    assert "idx_ai_cache_expires" in " ".join(row[-1] for row in plan)
+    
+def test_incremental_vacuum(cache):
+    """Test que les pages libérées sont rendues au système"""
+    conn = cache._get_connection()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+    
+    for i in range(200):
+        cache.set("test-model", f"prompt{i}", "x" * 2000)
+    _expire_all(cache)
+    cache.clear_expired()
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    
+    cache.vacuum(pages=100000)
+    assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    
+def test_legacy_database_gets_incremental_vacuum(tmp_path):
+    """Test l'activation de l'auto_vacuum incrémental sur une base créée sans"""
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE ai_cache (cache_key TEXT PRIMARY KEY, model_name TEXT NOT NULL, "
+                 "prompt TEXT NOT NULL, response TEXT NOT NULL, context TEXT, expires_at TIMESTAMP, "
+                 "usage_count INTEGER DEFAULT 1)")
+    conn.execute("INSERT INTO ai_cache (cache_key, model_name, prompt, response) VALUES ('k', 'm', 'p', 'r')")
+    conn.commit()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    conn.close()
+    
+    cache = AIResponseCache(db_path)
+    assert cache._get_connection().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert cache.get_stats()["total_entries"] == 1
+    cache.close()
+    
+def test_legacy_expires_at_migrated(tmp_path):
+    """Test la conversion des dates d'expiration au format ISO local"""
+    db_path = str(tmp_path / "legacy.db")
+    cache = AIResponseCache(db_path)
+    cache.set("test-model", "prompt", "response")
+    with cache._get_connection() as conn:
+        conn.execute("UPDATE ai_cache SET expires_at = ?", (
+            (datetime.now() + timedelta(hours=1)).isoformat(),
+        ))
+    # Base antérieure à la numérotation des migrations
+    cache._get_connection().execute("PRAGMA user_version = 0")
+    cache.close()
+    
+    reopened = AIResponseCache(db_path, memory_max_entries=0)
+    assert reopened.get("test-model", "prompt") == "response"
+    assert reopened.get_stats()["expired_entries"] == 0
+    conn = reopened._get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    
+    # Migration déjà faite : la table n'est plus parcourue aux ouvertures suivantes
+    conn.execute("UPDATE ai_cache SET expires_at = '2999-01-01T00:00:00'")
+    reopened.close()
+    again = AIResponseCache(db_path, memory_max_entries=0)
+    assert again._get_connection().execute("SELECT expires_at FROM ai_cache").fetchone()[0] == \
+        "2999-01-01T00:00:00"
+    again.close()
+    
+@pytest.mark.asyncio
+async def test_background_sweeper(cache):
+    """Test la tâche de fond de nettoyage"""
+    cache.set("test-model", "prompt", "response")
+    _expire_all(cache)
+    
+    cache.start_sweeper(interval=0.01)
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if cache.get_stats()["total_entries"] == 0:
+            break
+    await cache.stop_sweeper()
+    
+    assert cache.get_stats()["total_entries"] == 0
+    
+@pytest.mark.asyncio
+async def test_sweeper_flushes_idle_hits(cache):
+    """Test l'écriture périodique des compteurs d'un processus inactif"""
+    cache.set("test-model", "prompt", "response")
+    cache.get("test-model", "prompt")
+    
+    cache.start_sweeper(interval=0.01)
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if not cache._pending_hits:
+            break
+    await cache.stop_sweeper()
+    
+    assert _usage_count(cache, "prompt") == 1
+    
+def test_compressed_storage(tmp_path):
+    """Test la compression transparente des grandes valeurs"""
+    cache = AIResponseCache(str(tmp_path / "compressed.db"), memory_max_entries=0,
+                            compression="zlib", compression_threshold=100)
+    long_response = "Réponse très détaillée. " * 200
+    context = {"conversation_history": [{"role": "user", "content": "Bonjour " * 100}]}
+    cache.set("test-model", "prompt", long_response, context)
+    cache.set("test-model", "short", "ok")
+    
+    # L'API chaîne est inchangée
+    assert cache.get("test-model", "prompt", context) == long_response
+    assert cache.get("test-model", "short") == "ok"
+    
+    with cache._get_connection() as conn:
+        stored = conn.execute(
+            "SELECT typeof(response), typeof(context) FROM ai_cache WHERE prompt = 'prompt'"
+        ).fetchone()
+    assert stored == ("blob", "blob")
+    
+    stats = cache.get_stats()
+    assert stats["logical_size_bytes"] > stats["total_size_bytes"]
+    assert stats["compression_ratio"] > 2
+    cache.close()
+    
+def test_cache_key_with_hashed_history(cache, mock_conversation_history):
+    """Test que l'historique incrémental produit la même clé qu'une liste"""
+    messages = mock_conversation_history["conversation_history"]
+    plain = {"conversation_history": list(messages), "lang": "fr"}
+    hashed = {"conversation_history": HashedHistory(messages), "lang": "fr"}
+    
+    assert cache._generate_cache_key("gpt-4", "prompt", plain) == \
+        cache._generate_cache_key("gpt-4", "prompt", hashed)
+        
+    hashed["conversation_history"].append({"role": "assistant", "content": "Oui ?"})
+    assert cache._generate_cache_key("gpt-4", "prompt", plain) != \
+        cache._generate_cache_key("gpt-4", "prompt", hashed)
+        
+    cache.set("gpt-4", "prompt", "response", plain)
+    assert cache.get("gpt-4", "prompt", {"conversation_history": HashedHistory(messages), "lang": "fr"}) == "response"
+    
+def test_get_many_preserves_order(tmp_path):
+    """Test la lecture groupée : ordre des requêtes, absents et doublons"""
+    cache = AIResponseCache(str(tmp_path / "bulk.db"), memory_max_entries=0)
+    cache.backend.BULK_CHUNK_SIZE = 2  # Force plusieurs requêtes IN (...)
+    for i in range(5):
+        cache.set("test-model", f"prompt_{i}", f"response_{i}", {"i": i})
+        
+    results = cache.get_many([
+        ("test-model", "prompt_3", {"i": 3}),
+        ("test-model", "missing"),
+        ("test-model", "prompt_0", {"i": 0}),
+        ("test-model", "prompt_3", {"i": 3}),
+        ("test-model", "prompt_4", {"i": 4}),
+    ])
+    assert results == ["response_3", None, "response_0", "response_3", "response_4"]
+    
+    cache.flush_hits()
+    key = cache._generate_cache_key("test-model", "prompt_3", {"i": 3})
+    with cache._get_connection() as conn:
+        assert conn.execute(
+            "SELECT usage_count FROM ai_cache WHERE cache_key = ?", (key,)
+        ).fetchone()[0] == 2
+    assert cache.get_many([]) == []
+    cache.close()
+    
+def test_get_many_uses_memory_tier(cache):
+    """Test que les clés chaudes sont servies sans lecture SQLite"""
+    cache.set("test-model", "hot", "chaud")
+    cache.memory.hits = 0
+    
+    assert cache.get_many([("test-model", "hot"), ("test-model", "cold")]) == ["chaud", None]
+    assert cache.memory.hits == 1
+    assert cache.disk_misses == 1
+    
+def test_get_many_skips_expired(cache):
+    """Test que les entrées expirées sont des miss en lecture groupée"""
+    cache.set_many([
+        {"model_name": "test-model", "prompt": "old", "response": "ancienne", "ttl_hours": -1},
+        {"model_name": "test-model", "prompt": "new", "response": "récente"},
+    ])
+    cache.memory.clear()
+    assert cache.get_many([("test-model", "old"), ("test-model", "new")]) == [None, "récente"]
+    
+def test_set_many_single_transaction(tmp_path):
+    """Test l'écriture groupée avec compression et limites de taille"""
+    cache = AIResponseCache(str(tmp_path / "bulk.db"), max_entries=50,
+                            compression="zlib", compression_threshold=100)
+    cache.EVICTION_CHECK_INTERVAL = 10
+    entries = [
+        {"model_name": "test-model", "prompt": f"prompt_{i}", "response": "x" * 500,
+         "context": {"i": i}, "ttl_hours": 1}
+        for i in range(100)
+    ]
+    cache.set_many(entries)
+    cache.set_many([])
+    
+    assert cache.get_stats()["total_entries"] <= 50
+    assert cache.get("test-model", "prompt_99", {"i": 99}) == "x" * 500
+    cache.close()
+    
+@pytest.mark.asyncio
+async def test_async_bulk_api(cache):
+    """Test les versions asynchrones des opérations groupées"""
+    await cache.aset_many([
+        {"model_name": "test-model", "prompt": "a", "response": "A"},
+        {"model_name": "test-model", "prompt": "b", "response": "B"},
+    ])
+    assert await cache.aget_many([("test-model", "b"), ("test-model", "a")]) == ["B", "A"]
+    
+def _stored_stats(cache):
+    """Lit les agrégats tenus à jour par les triggers"""
+    return cache._get_connection().execute(
+        "SELECT total_entries, total_hits, size_bytes, stored_bytes FROM ai_cache_stats"
+    ).fetchone()
+    
+def test_stats_counters_follow_writes(tmp_path):
+    """Test que les agrégats suivent insertions, remplacements, suppressions et évictions"""
+    cache = AIResponseCache(str(tmp_path / "stats.db"), max_entries=20,
+                            compression="zlib", compression_threshold=100)
+    cache.EVICTION_CHECK_INTERVAL = 1
+    for i in range(30):
+        cache.set("test-model", f"prompt{i}", "réponse " * (i * 10))
+    cache.set("test-model", "prompt29", "remplacée")
+    cache.set_many([{"model_name": "test-model", "prompt": "bulk", "response": "x" * 300}])
+    cache.get("test-model", "prompt29")
+    cache.delete(cache._generate_cache_key("test-model", "bulk"))
+    cache.set("test-model", "old", "ancienne", ttl_hours=-1)
+    cache.clear_expired()
+    cache.flush_hits()
+    
+    counters = _stored_stats(cache)
+    assert counters[0] <= 20
+    cache.recompute_stats()
+    assert _stored_stats(cache) == counters
+    
+    stats = cache.get_stats()
+    assert stats["total_entries"] == counters[0]
+    assert stats["total_hits"] == 1
+    assert stats["logical_size_bytes"] == counters[2]
+    cache.close()
+    
+def test_recompute_stats_after_external_changes(cache):
+    """Test que recompute_stats reconstruit des agrégats exacts"""
+    cache.set("test-model", "prompt", "response")
+    with cache._get_connection() as conn:
+        conn.execute("UPDATE ai_cache_stats SET total_entries = 42, total_hits = 7")
+    assert cache.get_stats()["total_entries"] == 42
+    
+    cache.recompute_stats()
+    stats = cache.get_stats()
+    assert stats["total_entries"] == 1
+    assert stats["total_hits"] == 0
+    
+def test_stats_backfilled_for_existing_database(tmp_path):
+    """Test l'initialisation des agrégats pour une base créée sans table de statistiques"""
+    db_path = str(tmp_path / "legacy.db")
+    cache = AIResponseCache(db_path)
+    cache.set("test-model", "a", "réponse a")
+    cache.set("test-model", "b", "réponse b")
+    with cache._get_connection() as conn:
+        conn.execute("DROP TABLE ai_cache_stats")
+    cache.close()
+    
+    reopened = AIResponseCache(db_path)
+    assert reopened.get_stats()["total_entries"] == 2
+    reopened.close()
+    
+def _make_stale(cache):
+    """Fait dépasser leur durée de fraîcheur à toutes les entrées, sans les faire expirer"""
+    with cache._get_connection() as conn:
+        conn.execute("UPDATE ai_cache SET stale_at = datetime('now', '-1 minute') WHERE stale_at IS NOT NULL")
+    cache.memory.clear()
+    
+def test_stale_entry_served_in_grace_window(cache):
+    """Test qu'une entrée périmée reste servie pendant sa fenêtre de grâce"""
+    cache.set("test-model", "grace", "ancienne", ttl_hours=1, stale_grace_hours=2)
+    cache.set("test-model", "plain", "réponse", ttl_hours=1)
+    assert cache.get_entry("test-model", "grace") == ("ancienne", False)
+    
+    _make_stale(cache)
+    assert cache.get_entry("test-model", "grace") == ("ancienne", True)
+    # Promue en mémoire avec sa date de péremption
+    assert cache.get_entry("test-model", "grace") == ("ancienne", True)
+    assert cache.get_entry("test-model", "plain") == ("réponse", False)
+    assert cache.get("test-model", "grace") == "ancienne"
+    assert cache.get_stats()["stale_serves"] == 3
+    
+    # Au-delà de la fenêtre de grâce, l'entrée est expirée
+    _expire_all(cache)
+    assert cache.get_entry("test-model", "grace") is None
+    
+def test_grace_window_extends_expiry(cache):
+    """Test que la fenêtre de grâce repousse l'expiration et la suppression"""
+    cache.set("test-model", "grace", "réponse", ttl_hours=1, stale_grace_hours=2)
+    with cache._get_connection() as conn:
+        delay = conn.execute(
+            "SELECT (julianday(expires_at) - julianday(stale_at)) * 24 FROM ai_cache"
+        ).fetchone()[0]
+    assert abs(delay - 2) < 1e-3
+    
+    _make_stale(cache)
+    assert cache.clear_expired() == 0
+    
+@pytest.mark.asyncio
+async def test_async_get_entry(cache):
+    """Test la version asynchrone de get_entry"""
+    await cache.aset("test-model", "grace", "réponse", ttl_hours=1, stale_grace_hours=1)
+    _make_stale(cache)
+    assert await cache.aget_entry("test-model", "grace") == ("réponse", True)
+    assert await cache.aget_entry("test-model", "missing") is None
+    
+def test_invalidate_by_namespace(cache):
+    """Test l'invalidation groupée par modèle, méthode et étiquette"""
+    for model in ("gpt-4", "claude-2"):
+        for method in ("generate_response", "generate_post"):
+            for i in range(3):
+                cache.set(model, f"prompt{i}", "réponse", method=method, tag="v1")
+    cache.set("gpt-4", "prompt0", "réponse", method="generate_post", tag="v2")
+    
+    assert cache.invalidate(model="gpt-4", method="generate_post", tag="v1") == 3
+    assert cache.get("gpt-4", "prompt0", method="generate_post", tag="v1") is None
+    assert cache.get("gpt-4", "prompt0", method="generate_post", tag="v2") == "réponse"
+    assert cache.get("gpt-4", "prompt0", method="generate_response", tag="v1") == "réponse"
+    
+    assert cache.invalidate(model="claude-2", batch_size=2) == 6
+    assert cache.invalidate(tag="v1") == 3
+    assert cache.get_stats()["total_entries"] == 1
+    
+def test_invalidate_requires_filter(cache):
+    """Test qu'une invalidation sans critère est refusée"""
+    with pytest.raises(ValueError):
+        cache.invalidate()
+        
+def test_invalidation_uses_indexes(cache):
+    """Test que chaque critère d'invalidation est servi par un index"""
+    for column in ("model_name", "method", "tag"):
+        plan = cache._get_connection().execute(
+            f"EXPLAIN QUERY PLAN SELECT cache_key FROM ai_cache WHERE {column} = ? LIMIT 10", ("x",)
+        ).fetchall()
+        assert "USING INDEX" in " ".join(row[-1] for row in plan)
+        
+def test_tag_is_part_of_key(cache):
+    """Test qu'un changement d'étiquette écarte les anciennes entrées"""
+    cache.set("gpt-4", "prompt", "ancien template", method="generate_post", tag="1")
+    assert cache.get("gpt-4", "prompt", method="generate_post", tag="2") is None
+    assert cache.get("gpt-4", "prompt") is None
+    
+@pytest.mark.asyncio
+async def test_async_invalidate(cache):
+    """Test la version asynchrone de invalidate"""
+    await cache.aset("gpt-4", "prompt", "réponse", method="generate_response")
+    assert await cache.ainvalidate(model="gpt-4") == 1
+    
+@pytest.fixture
+def sharded_cache(tmp_path):
+    """Fixture pour créer un cache réparti sur plusieurs fichiers"""
+    cache = AIResponseCache(str(tmp_path / "sharded.db"), memory_max_entries=0, shards=4)
+    yield cache
+    cache.close()
+    
+def _shard_counts(cache):
+    """Compte les entrées de chaque shard directement en base"""
+    return [
+        cache._get_connection(shard).execute("SELECT COUNT(*) FROM ai_cache").fetchone()[0]
+        for shard in range(cache.backend.shards)
+    ]
+    
+def test_sharded_files(sharded_cache, tmp_path):
+    """Test que chaque shard a son propre fichier et que les clés y sont réparties"""
+    assert [Path(path).name for path in sharded_cache.backend.shard_paths] == [
+        "sharded.0.db", "sharded.1.db", "sharded.2.db", "sharded.3.db"
+    ]
+    for i in range(200):
+        sharded_cache.set("test-model", f"prompt{i}", f"response{i}")
+        
+    counts = _shard_counts(sharded_cache)
+    assert sum(counts) == 200
+    assert all(count > 20 for count in counts)
+    assert all(Path(path).exists() for path in sharded_cache.backend.shard_paths)
+    
+def test_sharded_operations(sharded_cache):
+    """Test lectures, écritures groupées, suppression et invalidation sur plusieurs shards"""
+    sharded_cache.set_many([
+        {"model_name": "gpt-4", "prompt": f"prompt{i}", "response": f"response{i}", "method": "generate_post"}
+        for i in range(50)
+    ])
+    sharded_cache.set("claude-2", "prompt", "response")
+    
+    requests = [("gpt-4", f"prompt{i}", None, "generate_post") for i in range(50)]
+    assert sharded_cache.get_many(requests) == [f"response{i}" for i in range(50)]
+    assert sharded_cache.get("gpt-4", "prompt7", method="generate_post") == "response7"
+    
+    sharded_cache.delete(sharded_cache._generate_cache_key("gpt-4", "prompt7", method="generate_post"))
+    assert sharded_cache.get("gpt-4", "prompt7", method="generate_post") is None
+    
+    assert sharded_cache.invalidate(model="gpt-4") == 49
+    assert sharded_cache.get("claude-2", "prompt") == "response"
+    
+def test_sharded_stats_and_cleanup(sharded_cache):
+    """Test l'agrégation des statistiques et le nettoyage sur tous les shards"""
+    for i in range(40):
+        sharded_cache.set("test-model", f"prompt{i}", "response", ttl_hours=1 if i % 2 else -1)
+    sharded_cache.get("test-model", "prompt1")
+    
+    stats = sharded_cache.get_stats()
+    assert stats["total_entries"] == 40
+    assert stats["expired_entries"] == 20
+    assert stats["total_hits"] == 1
+    
+    sharded_cache.SWEEP_BATCH_SIZE = 2
+    assert sharded_cache.clear_expired() == 20
+    assert sharded_cache.get_stats()["total_entries"] == 20
+    
+def test_sharded_eviction(tmp_path):
+    """Test que les limites de taille s'appliquent à l'ensemble des shards"""
+    cache = AIResponseCache(str(tmp_path / "sharded.db"), max_entries=40, shards=4)
+    cache.EVICTION_CHECK_INTERVAL = 10
+    for i in range(200):
+        cache.set("test-model", f"prompt{i}", "response")
+        
+    assert cache.get_stats()["total_entries"] <= 40
+    assert cache.evictions > 0
+    cache.close()
+    
+def test_invalid_shard_count(tmp_path):
+    """Test le refus d'un nombre de shards invalide"""
+    with pytest.raises(ValueError):
+        AIResponseCache(str(tmp_path / "cache.db"), shards=0)
+        
\ No newline at end of file
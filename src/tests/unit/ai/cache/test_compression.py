@@ -0,0 +1,65 @@
+"""
+Tests unitaires pour la compression des valeurs du cache
+"""
+import pytest
+from src.ai.cache.compression import (
+    Codec, ValueCompressor, register_codec, decode_value, stored_size, CODECS
+)
+
+class HalfCodec(Codec):
+    """Codec de test pour les valeurs formées de deux moitiés identiques"""
+    name = "half"
+    
+    def compress(self, data: bytes) -> bytes:
+        return data[:len(data) // 2]
+        
+    def decompress(self, data: bytes) -> bytes:
+        return data * 2
+        
+def test_small_values_stay_raw():
+    """Test qu'une valeur sous le seuil n'est pas compressée"""
+    compressor = ValueCompressor(threshold=100)
+    assert compressor.encode("response", "short") == "short"
+    assert compressor.encode("response", None) is None
+    
+def test_roundtrip():
+    """Test la compression puis la relecture d'une valeur"""
+    compressor = ValueCompressor(threshold=10)
+    value = "Réponse répétée " * 100
+    
+    encoded = compressor.encode("response", value)
+    assert isinstance(encoded, bytes)
+    assert stored_size(encoded) < stored_size(value)
+    assert decode_value(encoded) == value
+    
+def test_column_selection():
+    """Test que seules les colonnes configurées sont compressées"""
+    compressor = ValueCompressor(threshold=10, columns=("response",))
+    value = "a" * 1000
+    assert compressor.encode("prompt", value) == value
+    assert isinstance(compressor.encode("response", value), bytes)
+    
+def test_incompressible_value_stays_raw():
+    """Test qu'une valeur que la compression n'améliore pas reste brute"""
+    import random, string
+    value = "".join(random.choices(string.printable, k=40))
+    compressor = ValueCompressor(threshold=10)
+    assert compressor.encode("response", value) == value
+    
+def test_pluggable_codec():
+    """Test l'enregistrement d'un codec personnalisé"""
+    register_codec(HalfCodec())
+    try:
+        compressor = ValueCompressor(codec="half", threshold=1)
+        value = "ab" * 50
+        encoded = compressor.encode("response", value)
+        assert encoded.startswith(b"half\x00")
+        assert decode_value(encoded) == value
+    finally:
+        del CODECS["half"]
+        
+def test_unknown_codec():
+    """Test le refus d'un codec inconnu"""
+    with pytest.raises(ValueError) as exc_info:
+        ValueCompressor(codec="unknown")
+    assert "Codec de compression non supporté" in str(exc_info.value)
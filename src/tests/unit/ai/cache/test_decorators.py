@@ -2,7 +2,9 @@
 Tests unitaires pour le décorateur de cache
 """
 import pytest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
+from functools import partial
 from src.ai.cache.decorators import cached_response
 from src.ai.cache.cache_manager import AIResponseCache
 from typing import Optional, Dict
@@ -27,8 +29,11 @@ def mock_model():
 @pytest.fixture
 def mock_cache():
     """Fixture pour créer un mock du cache"""
-    with patch('src.ai.cache.decorators.AIResponseCache') as mock:
+    with patch('src.ai.cache.decorators.get_cache') as mock:
         cache_instance = MagicMock()
+        cache_instance.aget = AsyncMock(return_value=None)
+        cache_instance.aset = AsyncMock()
+        cache_instance._generate_cache_key.side_effect = partial(AIResponseCache._generate_cache_key, None)
         mock.return_value = cache_instance
         yield cache_instance
 
@@ -36,7 +41,7 @@ def mock_cache():
 async def test_cached_response_hit(mock_model, mock_cache):
     """Test quand la réponse est dans le cache"""
     # Configure le mock pour simuler un hit dans le cache
-    mock_cache.get.return_value = "Cached response"
+    mock_cache.aget.return_value = "Cached response"
     
     # Premier appel
     response = await mock_model.generate_response("test prompt")
@@ -44,17 +49,19 @@ async def test_cached_response_hit(mock_model, mock_cache):
     assert mock_model.call_count == 0  # La méthode originale n'est pas appelée
     
     # Vérifie que le cache a été consulté
-    mock_cache.get.assert_called_once_with(
+    mock_cache.aget.assert_called_once_with(
         "test-model",
         "test prompt",
-        None
+        None,
+        method="generate_response",
+        tag=None
     )
 
 @pytest.mark.asyncio
 async def test_cached_response_miss(mock_model, mock_cache):
     """Test quand la réponse n'est pas dans le cache"""
     # Configure le mock pour simuler un miss dans le cache
-    mock_cache.get.return_value = None
+    mock_cache.aget.return_value = None
     
     # Premier appel
     response = await mock_model.generate_response("test prompt")
@@ -62,34 +69,38 @@ async def test_cached_response_miss(mock_model, mock_cache):
     assert mock_model.call_count == 1  # La méthode originale est appelée
     
     # Vérifie que la réponse a été mise en cache
-    mock_cache.set.assert_called_once_with(
+    mock_cache.aset.assert_called_once_with(
         "test-model",
         "test prompt",
         "Response 1",
         None,
-        1  # ttl_hours
+        1,  # ttl_hours
+        method="generate_response",
+        tag=None
     )
 
 @pytest.mark.asyncio
 async def test_cached_response_with_context(mock_model, mock_cache):
     """Test le cache avec un contexte"""
     context = {"test": "value"}
-    mock_cache.get.return_value = None
+    mock_cache.aget.return_value = None
     
     await mock_model.generate_response("test prompt", context)
     
     # Vérifie que le contexte est utilisé pour la clé de cache
-    mock_cache.get.assert_called_once_with(
+    mock_cache.aget.assert_called_once_with(
         "test-model",
         "test prompt",
-        context
+        context,
+        method="generate_response",
+        tag=None
     )
 
 @pytest.mark.asyncio
 async def test_cached_response_error_handling(mock_model, mock_cache):
     """Test la gestion des erreurs du cache"""
     # Simule une erreur lors de l'accès au cache
-    mock_cache.get.side_effect = Exception("Cache error")
+    mock_cache.aget.side_effect = Exception("Cache error")
     
     # La méthode devrait quand même fonctionner
     response = await mock_model.generate_response("test prompt")
@@ -110,10 +121,140 @@ async def test_different_ttl(mock_model, mock_cache):
     await mock_model.long_cached_method("test prompt")
     
     # Vérifie que le TTL correct est utilisé
-    mock_cache.set.assert_called_once_with(
+    mock_cache.aset.assert_called_once_with(
         "test-model",
         "test prompt",
         "Long cached response",
         None,
-        48  # ttl_hours
-    ) 
\ No newline at end of file
+        48,  # ttl_hours
+        method="long_cached_method",
+        tag=None
+    ) 
+    
+@pytest.mark.asyncio
+async def test_cache_write_error_handling(mock_model, mock_cache):
+    """Test qu'une erreur d'écriture du cache n'interrompt pas la réponse"""
+    mock_cache.aset.side_effect = Exception("Cache error")
+    
+    response = await mock_model.generate_response("test prompt")
+    assert response == "Response 1"
+    
+class SlowModel(MockModel):
+    """Modèle de test dont les appels prennent du temps"""
+    
+    @cached_response(ttl_hours=1)
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        self.call_count += 1
+        await asyncio.sleep(0.01)
+        if prompt == "error":
+            raise ValueError("API Error")
+        return f"Response {self.call_count}"
+        
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_coalesced(mock_cache):
+    """Test que les appels identiques simultanés ne déclenchent qu'un appel au modèle"""
+    model = SlowModel()
+    
+    responses = await asyncio.gather(*[model.generate_response("test prompt") for _ in range(5)])
+    
+    assert responses == ["Response 1"] * 5
+    assert model.call_count == 1
+    mock_cache.aset.assert_called_once()
+    
+@pytest.mark.asyncio
+async def test_concurrent_different_calls_not_coalesced(mock_cache):
+    """Test que des prompts différents ne sont pas regroupés"""
+    model = SlowModel()
+    
+    await asyncio.gather(
+        model.generate_response("prompt 1"),
+        model.generate_response("prompt 2")
+    )
+    
+    assert model.call_count == 2
+    
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_exception(mock_cache):
+    """Test que l'exception du modèle est transmise à tous les appelants regroupés"""
+    model = SlowModel()
+    
+    results = await asyncio.gather(
+        *[model.generate_response("error") for _ in range(3)],
+        return_exceptions=True
+    )
+    
+    assert all(isinstance(r, ValueError) for r in results)
+    assert model.call_count == 1
+    
+@pytest.mark.asyncio
+async def test_json_result_roundtrip(mock_model, mock_cache):
+    """Test la sérialisation JSON des résultats non textuels"""
+    
+    @cached_response(ttl_hours=1, json_result=True)
+    async def analyze(self, prompt: str, context: Optional[Dict] = None) -> Dict:
+        return {"intention": "question"}
+        
+    mock_model.analyze = analyze.__get__(mock_model)
+    assert await mock_model.analyze("message") == {"intention": "question"}
+    assert mock_cache.aset.call_args.args[2] == '{"intention": "question"}'
+    
+    mock_cache.aget.return_value = '{"intention": "cache"}'
+    assert await mock_model.analyze("message") == {"intention": "cache"}
+    
+@pytest.mark.asyncio
+async def test_failed_results_not_cached(mock_model, mock_cache):
+    """Test que les résultats signalant un échec (vides) ne sont pas mis en cache"""
+    
+    @cached_response(ttl_hours=1, json_result=True)
+    async def analyze(self, prompt: str, context: Optional[Dict] = None) -> Dict:
+        return {"raw_analysis": ""}
+        
+    @cached_response(ttl_hours=1)
+    async def generate(self, prompt: str, context: Optional[Dict] = None) -> str:
+        return ""
+        
+    assert await analyze(mock_model, "message") == {"raw_analysis": ""}
+    assert await generate(mock_model, "message") == ""
+    mock_cache.aset.assert_not_called()
+    
+class StaleModel(MockModel):
+    """Modèle de test servant ses réponses périmées pendant le rafraîchissement"""
+    
+    @cached_response(ttl_hours=1, stale_grace_hours=1)
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        self.call_count += 1
+        await asyncio.sleep(0.05)
+        return f"Response {self.call_count}"
+        
+@pytest.fixture
+def real_cache(tmp_path):
+    """Fixture fournissant un vrai cache SQLite au décorateur"""
+    cache = AIResponseCache(str(tmp_path / "cache.db"))
+    with patch('src.ai.cache.decorators.get_cache', return_value=cache):
+        yield cache
+    cache.close()
+    
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(real_cache):
+    """Test qu'une réponse périmée est servie aussitôt et rafraîchie une seule fois"""
+    model = StaleModel()
+    assert await model.generate_response("test prompt") == "Response 1"
+    
+    with real_cache._get_connection() as conn:
+        conn.execute("UPDATE ai_cache SET stale_at = datetime('now', '-1 minute')")
+    real_cache.memory.clear()
+    
+    # Les appels concurrents reçoivent la réponse périmée sans attendre le modèle
+    start = asyncio.get_running_loop().time()
+    responses = await asyncio.gather(*[model.generate_response("test prompt") for _ in range(5)])
+    assert asyncio.get_running_loop().time() - start < 0.05
+    assert responses == ["Response 1"] * 5
+    
+    await asyncio.sleep(0.1)
+    assert model.call_count == 2
+    assert await model.generate_response("test prompt") == "Response 2"
+    
+    stats = real_cache.get_stats()
+    assert stats["stale_serves"] == 5
+    assert stats["stale_refreshes"] == 1
+    
\ No newline at end of file
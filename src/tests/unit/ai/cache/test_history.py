@@ -0,0 +1,49 @@
+"""
+Tests unitaires pour l'empreinte incrémentale de l'historique
+"""
+import json
+from src.ai.cache.history import HashedHistory, history_digest
+
+MESSAGES = [
+    {"role": "user", "content": "Bonjour"},
+    {"role": "assistant", "content": "Bonjour ! Comment puis-je vous aider ?"},
+    {"role": "user", "content": "J'ai une question"}
+]
+
+def test_digest_matches_plain_list():
+    """Test que l'empreinte incrémentale égale celle calculée sur une liste"""
+    history = HashedHistory()
+    for message in MESSAGES:
+        history.append(message)
+        
+    assert history.digest == history_digest(list(MESSAGES))
+    assert history_digest(history) == history.digest
+    assert HashedHistory(MESSAGES).digest == history.digest
+    
+def test_digest_depends_on_order_and_content():
+    """Test que l'empreinte change avec le contenu et l'ordre"""
+    assert history_digest(MESSAGES) != history_digest(MESSAGES[::-1])
+    assert history_digest(MESSAGES) != history_digest(MESSAGES[:2])
+    assert history_digest([]) == HashedHistory().digest
+    
+def test_mutations_invalidate_digest():
+    """Test le recalcul après une modification non incrémentale"""
+    history = HashedHistory(MESSAGES)
+    history[0] = {"role": "user", "content": "Salut"}
+    assert history.digest == history_digest([{"role": "user", "content": "Salut"}] + MESSAGES[1:])
+    
+    history.pop()
+    assert history.digest == history_digest(list(history))
+    
+    history.clear()
+    history.append(MESSAGES[0])
+    assert history.digest == history_digest(MESSAGES[:1])
+    
+def test_behaves_like_list():
+    """Test la compatibilité avec les usages de liste"""
+    history = HashedHistory(MESSAGES)
+    history += [{"role": "assistant", "content": "Je vous écoute"}]
+    
+    assert len(history) == 4
+    assert json.loads(json.dumps(history))[-1]["content"] == "Je vous écoute"
+    assert [m["role"] for m in history] == ["user", "assistant", "user", "assistant"]
@@ -0,0 +1,84 @@
+"""
+Tests unitaires pour le cache mémoire LRU
+"""
+import pytest
+from datetime import datetime, timedelta
+from src.ai.cache.memory_tier import LRUMemoryTier
+
+def test_get_and_set():
+    """Test l'écriture et la lecture"""
+    tier = LRUMemoryTier()
+    tier.set("key", "value")
+    
+    assert tier.get("key") == "value"
+    assert tier.get("missing") is None
+    assert tier.hits == 1
+    assert tier.misses == 1
+    
+def test_entry_limit_evicts_lru():
+    """Test l'éviction de l'entrée la moins récemment utilisée"""
+    tier = LRUMemoryTier(max_entries=2)
+    tier.set("a", "1")
+    tier.set("b", "2")
+    tier.get("a")  # "b" devient la moins récemment utilisée
+    tier.set("c", "3")
+    
+    assert tier.get("b") is None
+    assert tier.get("a") == "1"
+    assert tier.get("c") == "3"
+    assert len(tier) == 2
+    
+def test_byte_limit():
+    """Test la limite en octets"""
+    tier = LRUMemoryTier(max_entries=100, max_bytes=10)
+    tier.set("a", "x" * 6)
+    tier.set("b", "y" * 6)
+    
+    assert tier.get("a") is None
+    assert tier.get("b") == "y" * 6
+    assert tier.size_bytes == 6
+    
+    # Une valeur trop grande n'est jamais conservée
+    tier.set("c", "z" * 11)
+    assert tier.get("c") is None
+    
+def test_expiration():
+    """Test le respect de la date d'expiration"""
+    tier = LRUMemoryTier()
+    tier.set("expired", "value", datetime.utcnow() - timedelta(seconds=1))
+    tier.set("valid", "value", datetime.utcnow() + timedelta(hours=1))
+    
+    assert tier.get("expired") is None
+    assert tier.get("valid") == "value"
+    assert len(tier) == 1
+    
+def test_max_age():
+    """Test la durée maximale de conservation, plus courte que l'expiration"""
+    tier = LRUMemoryTier(max_age=-1)
+    tier.set("no_expiry", "value")
+    tier.set("later", "value", datetime.utcnow() + timedelta(hours=1))
+    
+    assert tier.get("no_expiry") is None
+    assert tier.get("later") is None
+    assert len(tier) == 0
+    
+def test_replace_updates_size():
+    """Test le remplacement d'une entrée existante"""
+    tier = LRUMemoryTier()
+    tier.set("key", "abc")
+    tier.set("key", "abcdef")
+    
+    assert tier.size_bytes == 6
+    tier.delete("key")
+    assert tier.size_bytes == 0
+    
+def test_get_entry_returns_stale_at():
+    """Test que la date de péremption accompagne la réponse"""
+    tier = LRUMemoryTier()
+    stale_at = datetime.utcnow() - timedelta(minutes=1)
+    tier.set("key", "value", datetime.utcnow() + timedelta(hours=1), stale_at)
+    tier.set("plain", "value")
+    
+    assert tier.get_entry("key") == ("value", stale_at)
+    assert tier.get_entry("plain") == ("value", None)
+    assert tier.get_entry("missing") is None
@@ -0,0 +1,113 @@
+"""
+Tests unitaires pour le regroupement des appels concurrents
+"""
+import pytest
+import asyncio
+from src.ai.cache.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_result():
+    """Test que les appels concurrents d'une même clé partagent un seul appel"""
+    flight = SingleFlight()
+    calls = 0
+    
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+        
+    results = await asyncio.gather(*[flight.do("key", load) for _ in range(5)])
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert not flight.in_flight("key")
+    
+@pytest.mark.asyncio
+async def test_different_keys_are_independent():
+    """Test que des clés différentes déclenchent des appels distincts"""
+    flight = SingleFlight()
+    calls = []
+    
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+        
+    results = await asyncio.gather(
+        flight.do("a", lambda: load("a")),
+        flight.do("b", lambda: load("b"))
+    )
+    assert results == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+    
+@pytest.mark.asyncio
+async def test_exception_is_shared():
+    """Test que l'exception du premier appel est transmise à tous les appelants"""
+    flight = SingleFlight()
+    
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ValueError("API Error")
+        
+    results = await asyncio.gather(
+        *[flight.do("key", load) for _ in range(3)],
+        return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    assert not flight.in_flight("key")
+    
+@pytest.mark.asyncio
+async def test_sequential_calls_are_not_coalesced():
+    """Test qu'un appel terminé n'est pas réutilisé"""
+    flight = SingleFlight()
+    calls = 0
+    
+    async def load():
+        nonlocal calls
+        calls += 1
+        return calls
+        
+    assert await flight.do("key", load) == 1
+    assert await flight.do("key", load) == 2
+    
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    """Test que l'annulation du premier appelant ne détache que lui"""
+    flight = SingleFlight()
+    calls = 0
+    
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "result"
+        
+    leader = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    
+    leader.cancel()
+    assert await follower == "result"
+    assert leader.cancelled() and not follower.cancelled()
+    assert calls == 1
+    
+@pytest.mark.asyncio
+async def test_call_cancelled_without_callers():
+    """Test que l'appel est annulé lorsque son dernier appelant l'est"""
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+    
+    async def load():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+            
+    caller = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), 0.5)
+    await asyncio.sleep(0)
+    assert not flight.in_flight("key")
@@ -0,0 +1,91 @@
+"""
+Tests unitaires pour les instantanés du cache
+"""
+import gzip
+import pytest
+from src.ai.cache.cache_manager import AIResponseCache
+from src.ai.cache.backends.memory_backend import MemoryBackend
+
+@pytest.fixture(params=["sqlite", "sharded", "memory"])
+def make_cache(request, tmp_path):
+    """Fabrique de caches vides sur le backend testé"""
+    caches = []
+    
+    def make(**kwargs):
+        name = f"cache{len(caches)}.db"
+        if request.param == "memory":
+            kwargs["backend"] = MemoryBackend()
+        elif request.param == "sharded":
+            kwargs["shards"] = 3
+        cache = AIResponseCache(str(tmp_path / name), **kwargs)
+        caches.append(cache)
+        return cache
+        
+    yield make
+    for cache in caches:
+        cache.close()
+        
+def _fill(cache):
+    """Remplit un cache : p{i} est lu i fois, 'expired' a expiré"""
+    for i in range(5):
+        cache.set("gpt-4", f"p{i}", f"réponse {i} " * 100, {"i": i}, method="generate_post")
+        for _ in range(i):
+            cache.get("gpt-4", f"p{i}", {"i": i}, method="generate_post")
+    cache.set("gpt-4", "expired", "r", ttl_hours=-1)
+    cache.flush_hits()
+    
+def test_export_import_roundtrip(make_cache, tmp_path):
+    """Test l'export des entrées les plus utilisées et leur réimport"""
+    source = make_cache(compression="zlib", compression_threshold=64)
+    _fill(source)
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    
+    assert source.export_snapshot(path, limit=3) == 3
+    
+    target = make_cache(memory_max_entries=2)
+    assert target.import_snapshot(path) == 3
+    
+    # Les deux plus chaudes sont déjà en mémoire, la troisième est lue depuis le backend
+    assert target.get("gpt-4", "p4", {"i": 4}, method="generate_post") == "réponse 4 " * 100
+    assert target.get("gpt-4", "p3", {"i": 3}, method="generate_post") == "réponse 3 " * 100
+    assert target.disk_hits == 0
+    assert target.get("gpt-4", "p2", {"i": 2}, method="generate_post") == "réponse 2 " * 100
+    assert target.get("gpt-4", "p1", {"i": 1}, method="generate_post") is None
+    
+    # Les compteurs d'utilisation sont conservés
+    stats = target.get_stats()
+    assert stats["total_entries"] == 3
+    assert stats["total_hits"] == 4 + 3 + 2 + 3
+    
+def test_snapshot_is_ordered_and_skips_expired(make_cache, tmp_path):
+    """Test l'ordre de l'instantané : des plus utilisées aux moins utilisées"""
+    cache = make_cache()
+    _fill(cache)
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    
+    assert cache.export_snapshot(path) == 5
+    with gzip.open(path, "rt", encoding="utf-8") as snapshot:
+        lines = snapshot.read().splitlines()
+    assert len(lines) == 6
+    assert [line.split('"p')[1][0] for line in lines[1:]] == ["4", "3", "2", "1", "0"]
+    
+def test_import_rejects_unknown_format(make_cache, tmp_path):
+    """Test le refus d'un fichier qui n'est pas un instantané"""
+    path = tmp_path / "other.gz"
+    with gzip.open(path, "wt") as other:
+        other.write('{"format": "other"}\n')
+        
+    with pytest.raises(ValueError) as exc_info:
+        make_cache().import_snapshot(str(path))
+    assert "Instantané de cache non supporté" in str(exc_info.value)
+    
+def test_warm_up(make_cache):
+    """Test le préchargement des entrées les plus utilisées dans le niveau mémoire"""
+    cache = make_cache(memory_max_entries=2)
+    _fill(cache)
+    cache.memory.clear()
+    
+    assert cache.warm_up() == 2
+    assert cache.get("gpt-4", "p4", {"i": 4}, method="generate_post") is not None
+    assert cache.get("gpt-4", "p3", {"i": 3}, method="generate_post") is not None
+    assert cache.disk_hits == 0
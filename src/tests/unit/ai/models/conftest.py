@@ -0,0 +1,14 @@
+"""
+Fixtures partagées pour les tests des modèles d'IA
+"""
+import pytest
+from unittest.mock import patch
+from src.ai.cache.cache_manager import AIResponseCache
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path):
+    """Cache propre à chaque test : les réponses simulées ne fuient pas d'un test à l'autre"""
+    cache = AIResponseCache(str(tmp_path / "ai_cache.db"))
+    with patch('src.ai.cache.decorators.get_cache', return_value=cache):
+        yield cache
+    cache.close()
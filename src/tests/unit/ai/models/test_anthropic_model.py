@@ -1,16 +1,19 @@
 """
 Tests unitaires pour le modèle Anthropic
 """
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 from src.ai.models.anthropic_model import AnthropicModel
+from src.ai.models.base import IncompleteStreamError
 import anthropic
 
 @pytest.fixture
 def anthropic_model():
     """Fixture pour créer une instance du modèle Anthropic"""
     config = {"model_name": "claude-2"}
-    with patch('anthropic.Client'):  # Mock le client Anthropic
+    with patch('anthropic.AsyncAnthropic'):  # Mock le client Anthropic
         model = AnthropicModel(config)
         return model
 
@@ -20,7 +23,7 @@ async def test_generate_response(anthropic_model):
     mock_response = MagicMock()
     mock_response.completion = "Test response"
     
-    with patch.object(anthropic_model.client, 'completion', return_value=mock_response):
+    with patch.object(anthropic_model.client.completions, 'create', AsyncMock(return_value=mock_response)):
         response = await anthropic_model.generate_response("Test prompt")
         assert response == "Test response"
 
@@ -36,7 +39,7 @@ async def test_generate_response_with_context(anthropic_model):
         ]
     }
     
-    with patch.object(anthropic_model.client, 'completion', return_value=mock_response):
+    with patch.object(anthropic_model.client.completions, 'create', AsyncMock(return_value=mock_response)):
         response = await anthropic_model.generate_response("Test prompt", context)
         assert response == "Test response with context"
 
@@ -46,7 +49,7 @@ async def test_generate_post(anthropic_model):
     mock_response = MagicMock()
     mock_response.completion = "Test LinkedIn post #AI #Innovation"
     
-    with patch.object(anthropic_model.client, 'completion', return_value=mock_response):
+    with patch.object(anthropic_model.client.completions, 'create', AsyncMock(return_value=mock_response)):
         response = await anthropic_model.generate_post("AI Technology")
         assert response == "Test LinkedIn post #AI #Innovation"
 
@@ -56,14 +59,14 @@ async def test_analyze_message(anthropic_model):
     mock_response = MagicMock()
     mock_response.completion = '{"intention": "test", "priorite": 3}'
     
-    with patch.object(anthropic_model.client, 'completion', return_value=mock_response):
+    with patch.object(anthropic_model.client.completions, 'create', AsyncMock(return_value=mock_response)):
         response = await anthropic_model.analyze_message("Test message")
         assert "raw_analysis" in response
 
 @pytest.mark.asyncio
 async def test_error_handling(anthropic_model):
     """Test la gestion des erreurs"""
-    with patch.object(anthropic_model.client, 'completion', side_effect=Exception("API Error")):
+    with patch.object(anthropic_model.client.completions, 'create', AsyncMock(side_effect=Exception("API Error"))):
         response = await anthropic_model.generate_response("Test prompt")
         assert response == ""
 
@@ -72,4 +75,127 @@ def test_prompt_formatting(anthropic_model):
     prompt = "Test prompt"
     formatted = f"{anthropic.HUMAN_PROMPT} {prompt}{anthropic.AI_PROMPT}"
     assert formatted.startswith(anthropic.HUMAN_PROMPT)
-    assert formatted.endswith(anthropic.AI_PROMPT) 
\ No newline at end of file
+    assert formatted.endswith(anthropic.AI_PROMPT) 
+    
+class _Events:
+    """Simule un flux du SDK (AsyncStream) : événements et réponse HTTP sous-jacente"""
+    
+    def __init__(self, *events):
+        self.events = events
+        self.response = MagicMock(aclose=AsyncMock())
+        
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+            
+class _TrackedBody(httpx.AsyncByteStream):
+    """Corps d'une réponse HTTP en flux, qui note sa fermeture"""
+    
+    def __init__(self, *events: str):
+        self.events = events
+        self.closed = False
+        
+    async def __aiter__(self):
+        for event in self.events:
+            yield event.encode()
+            
+    async def aclose(self) -> None:
+        self.closed = True
+        
+def _transport(body: _TrackedBody) -> httpx.AsyncClient:
+    """Client HTTP dont chaque requête reçoit le corps en flux donné"""
+    return httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=body)
+    ))
+        
+@pytest.mark.asyncio
+async def test_stream_response(anthropic_model):
+    """Test la lecture des fragments d'une réponse en streaming"""
+    events = [
+        MagicMock(completion=" Test", stop_reason=None),
+        MagicMock(completion=" response", stop_reason=None),
+        MagicMock(completion="", stop_reason="stop_sequence"),
+    ]
+    client = MagicMock()
+    client.completions.create = AsyncMock(return_value=_Events(*events))
+    
+    with patch.object(anthropic_model, 'client', client):
+        response = [chunk async for chunk in anthropic_model.stream_response("Test prompt")]
+    assert response == [" Test", " response"]
+    assert client.completions.create.call_args.kwargs["stream"] is True
+    
+    
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_shared():
+    """Test la limite de requêtes simultanées, partagée par les instances, sans bloquer la boucle"""
+    active = []
+    peak = []
+    
+    async def slow_completion(**kwargs):
+        active.append(kwargs["prompt"])
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(kwargs["prompt"])
+        return MagicMock(completion=kwargs["prompt"])
+        
+    with patch('anthropic.AsyncAnthropic'):
+        models = [AnthropicModel({"max_concurrency": 2}) for _ in range(2)]
+    for model in models:
+        model.client.completions.create = AsyncMock(side_effect=slow_completion)
+        
+    ticks = 0
+    
+    async def ticker():
+        nonlocal ticks
+        while len(peak) < 6:
+            ticks += 1
+            await asyncio.sleep(0.001)
+            
+    await asyncio.gather(
+        ticker(),
+        *(models[i % 2].generate_response(f"prompt {i}") for i in range(6))
+    )
+    assert len(peak) == 6
+    assert max(peak) == 2
+    # La boucle d'événements reste disponible pendant les appels
+    assert ticks > 1
+    
+@pytest.mark.asyncio
+async def test_truncated_stream_raises(anthropic_model):
+    """Test qu'un flux sans raison d'arrêt lève une erreur au lieu de se terminer normalement"""
+    client = MagicMock()
+    client.completions.create = AsyncMock(return_value=_Events(MagicMock(completion=" Test", stop_reason=None)))
+    
+    with patch.object(anthropic_model, 'client', client):
+        with pytest.raises(IncompleteStreamError):
+            _ = [chunk async for chunk in anthropic_model.stream_response("Test prompt")]
+            
+@pytest.mark.asyncio
+async def test_aborted_stream_closes_response(anthropic_model):
+    """Test qu'un flux abandonné par l'appelant ferme la réponse HTTP"""
+    event = 'event: completion\ndata: {"completion": " Test", "stop_reason": null, "model": "claude-2"}\n\n'
+    body = _TrackedBody(event, event, event)
+    client = anthropic.AsyncAnthropic(api_key="test-key", http_client=_transport(body))
+    
+    with patch.object(anthropic_model, 'client', client):
+        stream = anthropic_model.stream_response("Test prompt")
+        assert await stream.__anext__() == " Test"
+        await stream.aclose()
+    assert body.closed
+    
+    
+@pytest.mark.asyncio
+async def test_client_rebuilt_after_aclose():
+    """Test qu'un appel suivant aclose utilise un nouveau client"""
+    model = AnthropicModel({})
+    client = model.client
+    await model.aclose()
+    assert client.is_closed()
+    assert model.client is None
+    
+    mock_response = MagicMock(completion="Test response")
+    with patch('anthropic.AsyncAnthropic') as client_class:
+        client_class.return_value.completions.create = AsyncMock(return_value=mock_response)
+        assert await model.generate_response("Test prompt") == "Test response"
+    assert model.client is client_class.return_value
+    
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Tests unitaires pour la classe de base des modèles d'IA
+"""
+import asyncio
+import pytest
+from typing import Dict, Optional
+from src.ai.models.base import BaseAIModel
+from src.ai.cache.decorators import cached_response
+
+class FakeModel(BaseAIModel):
+    """Modèle de test comptant les appels au fournisseur"""
+    
+    def __init__(self, config: Dict):
+        self.model_name = "fake-model"
+        self.calls = []
+        super().__init__(config)
+        
+    def initialize(self) -> None:
+        pass
+        
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        self.calls.append(prompt)
+        return f"réponse à {prompt}"
+        
+    async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
+        return await self.generate_response(f"post sur {topic}", context)
+        
+    async def analyze_message(self, message: str, context: Optional[Dict] = None) -> Dict:
+        return {"raw_analysis": await self.generate_response(message, context)}
+        
+class UncachedPostModel(FakeModel):
+    """Sous-classe désactivant le cache des posts"""
+    CACHE_POLICY = {**BaseAIModel.CACHE_POLICY, "generate_post": None}
+    
+    async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
+        self.calls.append(topic)
+        return f"post sur {topic}"
+        
+def _cached_methods(cache):
+    """Liste les entrées en base"""
+    return cache._get_connection().execute("SELECT prompt, response FROM ai_cache").fetchall()
+    
+def test_model_name_preserved():
+    """Test que la classe de base ne remplace pas le nom du modèle"""
+    assert FakeModel({}).model_name == "fake-model"
+    
+@pytest.mark.asyncio
+async def test_subclass_overrides_are_cached(isolated_cache):
+    """Test que la politique de cache s'applique aux méthodes des sous-classes"""
+    model = FakeModel({})
+    
+    assert await model.generate_response("bonjour") == "réponse à bonjour"
+    assert await model.generate_response("bonjour") == "réponse à bonjour"
+    assert model.calls == ["bonjour"]
+    
+    # Une autre instance du même modèle profite du cache
+    other = FakeModel({})
+    assert await other.generate_response("bonjour") == "réponse à bonjour"
+    assert other.calls == []
+    
+@pytest.mark.asyncio
+async def test_nested_calls_cached_once(isolated_cache):
+    """Test que generate_post n'ajoute pas d'entrée pour son appel à generate_response"""
+    model = FakeModel({})
+    
+    assert await model.generate_post("IA") == "réponse à post sur IA"
+    assert await model.generate_post("IA") == "réponse à post sur IA"
+    assert model.calls == ["post sur IA"]
+    assert _cached_methods(isolated_cache) == [("IA", "réponse à post sur IA")]
+    
+@pytest.mark.asyncio
+async def test_methods_do_not_share_entries(isolated_cache):
+    """Test que des méthodes différentes ne partagent pas leurs entrées pour un même texte"""
+    model = FakeModel({})
+    
+    post = await model.generate_post("IA")
+    response = await model.generate_response("IA")
+    analysis = await model.analyze_message("IA")
+    
+    assert post != response
+    assert analysis == {"raw_analysis": "réponse à IA"}
+    assert await model.analyze_message("IA") == analysis
+    assert model.calls == ["post sur IA", "IA", "IA"]
+    
+@pytest.mark.asyncio
+async def test_policy_can_disable_cache(isolated_cache):
+    """Test qu'une politique à None désactive le cache de la méthode"""
+    model = UncachedPostModel({})
+    
+    await model.generate_post("IA")
+    await model.generate_post("IA")
+    await model.generate_response("IA")
+    await model.generate_response("IA")
+    
+    assert model.calls == ["IA", "IA", "IA"]
+    
+def test_explicit_decorator_not_wrapped_twice():
+    """Test qu'une méthode déjà décorée n'est pas enveloppée une seconde fois"""
+    
+    class DecoratedModel(FakeModel):
+        @cached_response(ttl_hours=1)
+        async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+            return prompt
+            
+    assert DecoratedModel.generate_response.__wrapped__.__name__ == "generate_response"
+    assert not hasattr(DecoratedModel.generate_response.__wrapped__, "_cached_response")
+    
+@pytest.mark.asyncio
+async def test_template_version_separates_entries(isolated_cache):
+    """Test qu'un changement de version des templates écarte les réponses en cache"""
+    model = FakeModel({})
+    await model.generate_response("bonjour")
+    
+    model.template_version = "2"
+    await model.generate_response("bonjour")
+    assert model.calls == ["bonjour", "bonjour"]
+    
+    assert isolated_cache.invalidate(model="fake-model", tag="1") == 1
+    assert isolated_cache.invalidate(method="generate_response") == 1
+    
+class StreamingModel(FakeModel):
+    """Modèle de test renvoyant sa réponse mot par mot"""
+    
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None):
+        self.calls.append(prompt)
+        for word in ["réponse ", "à ", prompt]:
+            yield word
+            
+async def _collect(stream):
+    """Concatène les fragments d'un flux"""
+    return [chunk async for chunk in stream]
+    
+@pytest.mark.asyncio
+async def test_default_stream_uses_generate_response(isolated_cache):
+    """Test le flux par défaut : la réponse complète en un seul fragment"""
+    model = FakeModel({})
+    assert await _collect(model.stream_response("bonjour")) == ["réponse à bonjour"]
+    
+@pytest.mark.asyncio
+async def test_stream_result_is_cached(isolated_cache):
+    """Test que le texte final d'un flux complet est partagé avec generate_response"""
+    model = StreamingModel({})
+    
+    assert await _collect(model.stream_response("bonjour")) == ["réponse ", "à ", "bonjour"]
+    assert await model.generate_response("bonjour") == "réponse à bonjour"
+    # Une réponse en cache est renvoyée en un seul fragment
+    assert await _collect(model.stream_response("bonjour")) == ["réponse à bonjour"]
+    assert model.calls == ["bonjour"]
+    
+@pytest.mark.asyncio
+async def test_interrupted_stream_not_cached(isolated_cache):
+    """Test qu'un flux interrompu par l'appelant n'est pas mis en cache"""
+    model = StreamingModel({})
+    
+    stream = model.stream_response("bonjour")
+    assert await stream.__anext__() == "réponse "
+    await stream.aclose()
+    
+    assert _cached_methods(isolated_cache) == []
+    
+class SlowModel(FakeModel):
+    """Modèle de test lent, mesurant ses appels simultanés et échouant sur 'erreur'"""
+    
+    def __init__(self, config: Dict):
+        self.active = 0
+        self.peak = 0
+        super().__init__(config)
+        
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if prompt == "erreur":
+                raise RuntimeError("échec du fournisseur")
+            self.calls.append(prompt)
+            return f"réponse à {prompt}"
+        finally:
+            self.active -= 1
+            
+@pytest.mark.asyncio
+async def test_generate_batch_keeps_order_and_bounds_concurrency(isolated_cache):
+    """Test un lot : ordre conservé, parallélisme borné, échecs rendus par élément"""
+    model = SlowModel({})
+    prompts = [f"p{i}" for i in range(7)] + ["erreur"]
+    
+    results = await model.generate_batch(prompts, max_concurrency=3)
+    
+    assert results[:7] == [f"réponse à p{i}" for i in range(7)]
+    assert isinstance(results[7], RuntimeError)
+    assert model.peak == 3
+    
+@pytest.mark.asyncio
+async def test_generate_batch_uses_cache_first(isolated_cache):
+    """Test que seuls les éléments absents du cache sont envoyés au modèle"""
+    model = FakeModel({})
+    await model.generate_response("a")
+    await model.generate_post("b", {"ton": "formel"})
+    model.calls.clear()
+    
+    assert await model.generate_batch(["a", "c"]) == ["réponse à a", "réponse à c"]
+    assert await model.generate_batch([("b", {"ton": "formel"}), ("d", None)], method="generate_post") == \
+        ["réponse à post sur b", "réponse à post sur d"]
+    assert model.calls == ["c", "post sur d"]
+    
+    # Résultats JSON relus depuis le cache
+    await model.analyze_message("m")
+    assert await model.generate_batch(["m"], method="analyze_message") == [{"raw_analysis": "réponse à m"}]
+    
+@pytest.mark.asyncio
+async def test_generate_batch_refreshes_stale_entries(isolated_cache):
+    """Test qu'un lot sert les réponses périmées et les rafraîchit en arrière-plan"""
+    model = FakeModel({})
+    await model.generate_post("a")
+    with isolated_cache._get_connection() as conn:
+        conn.execute("UPDATE ai_cache SET stale_at = datetime('now', '-1 minute')")
+    isolated_cache.memory.clear()
+    model.calls.clear()
+    
+    assert await model.generate_batch(["a"], method="generate_post") == ["réponse à post sur a"]
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if isolated_cache.stale_refreshes:
+            break
+    assert model.calls == ["post sur a"]
+    stats = isolated_cache.get_stats()
+    assert stats["stale_serves"] == 1 and stats["stale_refreshes"] == 1
+    
+@pytest.mark.asyncio
+async def test_generate_batch_reads_cache_once(isolated_cache, monkeypatch):
+    """Test que les absents du lot sont demandés au modèle sans seconde lecture du cache"""
+    model = FakeModel({})
+    reads = []
+    original = isolated_cache.aget_entry
+    
+    async def counting_aget_entry(*args, **kwargs):
+        reads.append(args)
+        return await original(*args, **kwargs)
+        
+    monkeypatch.setattr(isolated_cache, "aget_entry", counting_aget_entry)
+    assert await model.generate_batch(["a", "b"]) == ["réponse à a", "réponse à b"]
+    assert reads == []
+    # Les réponses obtenues sont mises en cache
+    assert isolated_cache.get_many([("fake-model", "a", None, "generate_response", "1")]) == ["réponse à a"]
+    
+@pytest.mark.asyncio
+async def test_generate_batch_rejects_invalid_arguments(isolated_cache):
+    """Test le refus d'un parallélisme inférieur à 1 et des méthodes de flux"""
+    model = FakeModel({})
+    for max_concurrency in (0, -1):
+        with pytest.raises(ValueError):
+            await model.generate_batch(["a"], max_concurrency=max_concurrency)
+    with pytest.raises(ValueError):
+        await model.generate_batch(["a"], method="stream_response")
+    assert model.calls == []
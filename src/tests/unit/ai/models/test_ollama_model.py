@@ -2,8 +2,11 @@
 Tests unitaires pour le modèle Ollama
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import aiohttp
+import json
+import asyncio
+from src.ai.models.base import IncompleteStreamError
 from src.ai.models.ollama_model import OllamaModel
 
 @pytest.fixture
@@ -17,15 +20,25 @@ def ollama_model():
     model = OllamaModel(config)
     return model
 
-@pytest.mark.asyncio
-async def test_make_request(ollama_model):
-    """Test la requête à l'API Ollama"""
+def _mock_session(status, data=None):
+    """Crée une session aiohttp simulée dont post renvoie une réponse de statut donné"""
     mock_response = MagicMock()
-    mock_response.status = 200
-    mock_response.json = MagicMock(return_value={"response": "Test response"})
+    mock_response.status = status
+    mock_response.json = AsyncMock(return_value=data)
     
     mock_session = MagicMock()
-    mock_session.post = MagicMock(return_value=MagicMock(__aenter__=MagicMock(return_value=mock_response)))
+    mock_session.closed = False
+    mock_session.close = AsyncMock()
+    mock_session.post = MagicMock(return_value=MagicMock(
+        __aenter__=AsyncMock(return_value=mock_response),
+        __aexit__=AsyncMock(return_value=False)
+    ))
+    return mock_session
+    
+@pytest.mark.asyncio
+async def test_make_request(ollama_model):
+    """Test la requête à l'API Ollama"""
+    mock_session = _mock_session(200, {"response": "Test response"})
     
     with patch('aiohttp.ClientSession', return_value=mock_session):
         response = await ollama_model._make_request("Test prompt")
@@ -34,16 +47,66 @@ async def test_make_request(ollama_model):
 @pytest.mark.asyncio
 async def test_make_request_error(ollama_model):
     """Test la gestion des erreurs de l'API Ollama"""
-    mock_response = MagicMock()
-    mock_response.status = 500
-    
-    mock_session = MagicMock()
-    mock_session.post = MagicMock(return_value=MagicMock(__aenter__=MagicMock(return_value=mock_response)))
+    mock_session = _mock_session(500)
     
     with patch('aiohttp.ClientSession', return_value=mock_session):
         response = await ollama_model._make_request("Test prompt")
         assert response == ""
+        
+@pytest.mark.asyncio
+async def test_session_is_shared(ollama_model):
+    """Test la réutilisation d'une seule session (keep-alive) et sa fermeture"""
+    mock_session = _mock_session(200, {"response": "Test response"})
+    
+    with patch('aiohttp.ClientSession', return_value=mock_session) as session_class:
+        await ollama_model._make_request("Prompt 1")
+        await ollama_model._make_request("Prompt 2")
+        assert session_class.call_count == 1
+        assert mock_session.post.call_count == 2
+        
+        await ollama_model.aclose()
+        mock_session.close.assert_awaited_once()
+        
+        # Une nouvelle session est créée après la fermeture
+        await ollama_model._make_request("Prompt 3")
+        assert session_class.call_count == 2
+        
+@pytest.mark.asyncio
+async def test_session_configuration():
+    """Test la configuration du pool de connexions et des délais"""
+    model = OllamaModel({"connection_limit": 4, "request_timeout": 60})
+    session = model._get_session()
+    try:
+        assert session.connector.limit == 4
+        assert session.timeout.total == 60
+        assert session.timeout.connect == OllamaModel.CONNECT_TIMEOUT
+    finally:
+        await model.aclose()
+    assert session.closed
 
+@pytest.mark.asyncio
+async def test_batch_fills_server_slots():
+    """Test qu'un lot occupe les emplacements de génération du serveur, sans les dépasser"""
+    model = OllamaModel({"num_parallel": 2, "connection_limit": 1})
+    active = []
+    peak = []
+    
+    async def slow_request(prompt):
+        active.append(prompt)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(prompt)
+        return prompt
+        
+    with patch.object(model, '_make_request', side_effect=slow_request):
+        results = await model.generate_batch([f"p{i}" for i in range(5)])
+    assert results == [f"p{i}" for i in range(5)]
+    assert max(peak) == 2
+    
+    session = model._get_session()
+    assert session.connector.limit == 2
+    await model.aclose()
+    
 @pytest.mark.asyncio
 async def test_generate_response(ollama_model):
     """Test la génération de réponse"""
@@ -90,6 +153,62 @@ async def test_analyze_message_invalid_json(ollama_model):
         assert "raw_analysis" in response
         assert response["raw_analysis"] == "Invalid JSON"
 
+async def _ndjson(*objects):
+    """Simule le corps d'une réponse en streaming, ligne par ligne"""
+    for obj in objects:
+        yield (json.dumps(obj) + "\n").encode()
+        
+@pytest.mark.asyncio
+async def test_stream_response(ollama_model):
+    """Test la lecture des fragments NDJSON d'une génération en streaming"""
+    mock_session = _mock_session(200)
+    mock_response = mock_session.post.return_value.__aenter__.return_value
+    mock_response.content = _ndjson(
+        {"response": "Bonjour", "done": False},
+        {"response": " à tous", "done": False},
+        {"response": "", "done": True}
+    )
+    
+    with patch('aiohttp.ClientSession', return_value=mock_session):
+        chunks = [chunk async for chunk in ollama_model.stream_response("Test prompt")]
+    assert chunks == ["Bonjour", " à tous"]
+    assert mock_session.post.call_args.kwargs["json"]["stream"] is True
+    
+    # Le texte complet est en cache pour generate_response
+    with patch.object(ollama_model, '_make_request') as make_request:
+        assert await ollama_model.generate_response("Test prompt") == "Bonjour à tous"
+        make_request.assert_not_called()
+        
 def test_endpoint_configuration(ollama_model):
     """Test la configuration de l'endpoint"""
-    assert ollama_model.generate_endpoint == f"{ollama_model.api_url}/api/generate" 
\ No newline at end of file
+    assert ollama_model.generate_endpoint == f"{ollama_model.api_url}/api/generate" 
+    
+@pytest.mark.asyncio
+async def test_stream_error_is_not_cached(ollama_model):
+    """Test qu'une erreur en cours de flux est levée et que le texte partiel n'est pas mis en cache"""
+    mock_session = _mock_session(200)
+    mock_response = mock_session.post.return_value.__aenter__.return_value
+    mock_response.content = _ndjson({"response": "Bon", "done": False}, {"error": "model crashed"})
+    
+    chunks = []
+    with patch('aiohttp.ClientSession', return_value=mock_session):
+        with pytest.raises(IncompleteStreamError):
+            async for chunk in ollama_model.stream_response("salut"):
+                chunks.append(chunk)
+    assert chunks == ["Bon"]
+    
+    with patch.object(ollama_model, '_make_request', return_value="Bonjour") as make_request:
+        assert await ollama_model.generate_response("salut") == "Bonjour"
+        make_request.assert_called_once()
+        
+@pytest.mark.asyncio
+async def test_stream_without_done_raises(ollama_model):
+    """Test qu'un flux coupé avant la ligne 'done' est signalé"""
+    mock_session = _mock_session(200)
+    mock_response = mock_session.post.return_value.__aenter__.return_value
+    mock_response.content = _ndjson({"response": "Bon", "done": False})
+    
+    with patch('aiohttp.ClientSession', return_value=mock_session):
+        with pytest.raises(IncompleteStreamError):
+            _ = [chunk async for chunk in ollama_model.stream_response("salut")]
+            
\ No newline at end of file
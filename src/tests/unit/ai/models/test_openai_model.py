@@ -1,9 +1,13 @@
 """
 Tests unitaires pour le modèle OpenAI
 """
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from src.ai.models.base import IncompleteStreamError
 from src.ai.models.openai_model import OpenAIModel
+from src.config import settings
+import openai
 
 @pytest.fixture
 def openai_model():
@@ -13,13 +17,22 @@ def openai_model():
         model = OpenAIModel(config)
         return model
 
+def _mock_client(**kwargs):
+    """Simule un client AsyncOpenAI dont chat.completions.create est configuré par kwargs"""
+    client = MagicMock()
+    if "return_value" in kwargs:
+        # Consommation réelle renvoyée par l'API
+        kwargs["return_value"].usage = MagicMock(total_tokens=42)
+    client.chat.completions.create = AsyncMock(**kwargs)
+    return client
+    
 @pytest.mark.asyncio
 async def test_generate_response(openai_model):
     """Test la génération de réponse"""
     mock_response = MagicMock()
     mock_response.choices = [MagicMock(message=MagicMock(content="Test response"))]
     
-    with patch('openai.ChatCompletion.acreate', return_value=mock_response):
+    with patch.object(openai_model, '_get_client', return_value=_mock_client(return_value=mock_response)):
         response = await openai_model.generate_response("Test prompt")
         assert response == "Test response"
 
@@ -35,7 +48,7 @@ async def test_generate_response_with_context(openai_model):
         ]
     }
     
-    with patch('openai.ChatCompletion.acreate', return_value=mock_response):
+    with patch.object(openai_model, '_get_client', return_value=_mock_client(return_value=mock_response)):
         response = await openai_model.generate_response("Test prompt", context)
         assert response == "Test response with context"
 
@@ -45,7 +58,7 @@ async def test_generate_post(openai_model):
     mock_response = MagicMock()
     mock_response.choices = [MagicMock(message=MagicMock(content="Test LinkedIn post"))]
     
-    with patch('openai.ChatCompletion.acreate', return_value=mock_response):
+    with patch.object(openai_model, '_get_client', return_value=_mock_client(return_value=mock_response)):
         response = await openai_model.generate_post("AI Technology")
         assert response == "Test LinkedIn post"
 
@@ -55,13 +68,125 @@ async def test_analyze_message(openai_model):
     mock_response = MagicMock()
     mock_response.choices = [MagicMock(message=MagicMock(content='{"intention": "test"}'))]
     
-    with patch('openai.ChatCompletion.acreate', return_value=mock_response):
+    with patch.object(openai_model, '_get_client', return_value=_mock_client(return_value=mock_response)):
         response = await openai_model.analyze_message("Test message")
         assert "raw_analysis" in response
 
 @pytest.mark.asyncio
 async def test_error_handling(openai_model):
     """Test la gestion des erreurs"""
-    with patch('openai.ChatCompletion.acreate', side_effect=Exception("API Error")):
+    with patch.object(openai_model, '_get_client', return_value=_mock_client(side_effect=Exception("API Error"))):
         response = await openai_model.generate_response("Test prompt")
-        assert response == "" 
\ No newline at end of file
+        assert response == "" 
+        
+class _Events:
+    """Simule un flux du SDK (AsyncStream) : événements et réponse HTTP sous-jacente"""
+    
+    def __init__(self, *events):
+        self.events = events
+        self.response = MagicMock(aclose=AsyncMock())
+        
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+            
+class _TrackedBody(httpx.AsyncByteStream):
+    """Corps d'une réponse HTTP en flux, qui note sa fermeture"""
+    
+    def __init__(self, *events: str):
+        self.events = events
+        self.closed = False
+        
+    async def __aiter__(self):
+        for event in self.events:
+            yield event.encode()
+            
+    async def aclose(self) -> None:
+        self.closed = True
+        
+def _transport(body: _TrackedBody) -> httpx.AsyncClient:
+    """Client HTTP dont chaque requête reçoit le corps en flux donné"""
+    return httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=body)
+    ))
+        
+@pytest.mark.asyncio
+async def test_stream_response(openai_model):
+    """Test la lecture des fragments d'une réponse en streaming"""
+    chunks = [
+        MagicMock(choices=[MagicMock(delta=MagicMock(content="Test "), finish_reason=None)]),
+        MagicMock(choices=[MagicMock(delta=MagicMock(content="response"), finish_reason=None)]),
+        MagicMock(choices=[MagicMock(delta=MagicMock(content=None), finish_reason="stop")]),
+    ]
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=_Events(*chunks))
+    
+    with patch.object(openai_model, '_get_client', return_value=client):
+        response = [chunk async for chunk in openai_model.stream_response("Test prompt")]
+    assert response == ["Test ", "response"]
+    assert client.chat.completions.create.call_args.kwargs["stream"] is True
+    
+def test_model_name_from_config():
+    """Test le nom du modèle : config, puis réglage OPENAI_MODEL"""
+    assert OpenAIModel({"model_name": "gpt-3.5-turbo"}).model_name == "gpt-3.5-turbo"
+    with patch.object(settings, 'OPENAI_MODEL', 'gpt-4o'):
+        assert OpenAIModel({}).model_name == "gpt-4o"
+    
+@pytest.mark.asyncio
+async def test_client_is_shared_and_pooled():
+    """Test le client unique par instance, avec pool de connexions et délais configurés"""
+    model = OpenAIModel({"timeout": 12.0, "max_concurrency": 3})
+    with patch.object(settings, 'OPENAI_API_KEY', 'test-key'):
+        client = model._get_client()
+    assert model._get_client() is client
+    assert client.timeout.read == 12.0
+    
+    pool = client._client._transport._pool
+    assert pool._max_connections == 3
+    assert pool._max_keepalive_connections == 3
+    
+    await model.aclose()
+    assert client.is_closed()
+    assert model._client is None
+    
+@pytest.mark.asyncio
+async def test_rate_limiter_uses_response_usage():
+    """Test la correction du quota de tokens par l'usage renvoyé par l'API"""
+    model = OpenAIModel({"tokens_per_minute": 10000, "requests_per_minute": 100})
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock(message=MagicMock(content="Test response"))]
+    
+    with patch.object(model, '_get_client', return_value=_mock_client(return_value=mock_response)):
+        assert await model.generate_response("Test prompt") == "Test response"
+    limiter = model._rate_limiter()
+    assert limiter.tokens.level == pytest.approx(10000 - 42, abs=1)
+    assert limiter.requests.level == pytest.approx(99, abs=0.1)
+    
+@pytest.mark.asyncio
+async def test_truncated_stream_is_not_cached(openai_model, isolated_cache):
+    """Test qu'un flux sans raison de fin lève une erreur et n'est pas mis en cache"""
+    chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content="Test "), finish_reason=None)])]
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=_Events(*chunks))
+    
+    with patch.object(openai_model, '_get_client', return_value=client):
+        with pytest.raises(IncompleteStreamError):
+            _ = [chunk async for chunk in openai_model.stream_response("Test prompt")]
+    assert isolated_cache.get(openai_model.model_name, "Test prompt", method="generate_response",
+                              tag=openai_model.template_version) is None
+                              
+@pytest.mark.asyncio
+async def test_aborted_stream_closes_response():
+    """Test qu'un flux abandonné par l'appelant ferme la réponse HTTP"""
+    chunk = ('data: {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4", '
+             '"choices": [{"index": 0, "delta": {"content": "Bon"}, "finish_reason": null}]}\n\n')
+    body = _TrackedBody(chunk, chunk, chunk)
+    model = OpenAIModel({"model_name": "gpt-4"})
+    model._client = openai.AsyncOpenAI(api_key="test-key", http_client=_transport(body))
+    
+    stream = model.stream_response("Test prompt")
+    assert await stream.__anext__() == "Bon"
+    await stream.aclose()
+    assert body.closed
+    
+    
\ No newline at end of file
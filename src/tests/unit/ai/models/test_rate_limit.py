@@ -0,0 +1,68 @@
+"""
+Tests unitaires pour la limitation de débit des fournisseurs
+"""
+import time
+import pytest
+from src.ai.models.rate_limit import RateLimiter, TokenBucket, estimate_tokens, provider_rate_limiter
+
+def test_estimate_tokens():
+    """Test l'estimation du nombre de tokens d'un texte"""
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 400) == 101
+    
+def test_bucket_delay():
+    """Test le délai avant disponibilité des jetons"""
+    bucket = TokenBucket(600)  # 10 jetons par seconde
+    assert bucket.delay(600) == 0
+    
+    bucket.consume(600)
+    assert bucket.delay(5) == pytest.approx(0.5, abs=0.01)
+    # Une demande plus grande que le seau attend seulement qu'il soit plein
+    assert bucket.delay(6000) == pytest.approx(60, abs=0.01)
+    
+@pytest.mark.asyncio
+async def test_acquire_waits_for_quota():
+    """Test qu'un appel attend que le quota de requêtes se reconstitue"""
+    limiter = RateLimiter(requests_per_minute=6000)  # 100 requêtes par seconde
+    limiter.requests.consume(limiter.requests.capacity)
+    
+    start = time.monotonic()
+    await limiter.acquire(10)
+    await limiter.acquire(10)
+    assert time.monotonic() - start >= 0.015
+    
+@pytest.mark.asyncio
+async def test_reserve_corrects_with_usage():
+    """Test la correction de l'estimation par la consommation réelle"""
+    limiter = RateLimiter(tokens_per_minute=1000)
+    
+    async with limiter.reserve(500) as reservation:
+        assert limiter.tokens.level == pytest.approx(500, abs=1)
+        reservation.used = 100
+    assert limiter.tokens.level == pytest.approx(900, abs=1)
+    
+    # Une consommation supérieure à l'estimation crée une dette
+    async with limiter.reserve(500) as reservation:
+        reservation.used = 1500
+    assert limiter.tokens.level == pytest.approx(-600, abs=1)
+    
+@pytest.mark.asyncio
+async def test_reserve_refunds_failed_calls():
+    """Test la restitution des tokens d'un appel refusé"""
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    
+    with pytest.raises(RuntimeError):
+        async with limiter.reserve(500):
+            raise RuntimeError("429")
+    assert limiter.tokens.level == pytest.approx(1000, abs=1)
+    # La requête reste décomptée
+    assert limiter.requests.level == pytest.approx(9, abs=0.01)
+    
+@pytest.mark.asyncio
+async def test_unlimited_and_shared_limiters():
+    """Test le limiteur sans quota et son partage entre instances d'un fournisseur"""
+    limiter = provider_rate_limiter("test-provider")
+    assert limiter.requests is None and limiter.tokens is None
+    await limiter.acquire(10 ** 9)
+    
+    assert provider_rate_limiter("test-provider", 10, 10) is limiter
@@ -0,0 +1,259 @@
+"""
+Tests unitaires pour le routage entre fournisseurs
+"""
+import asyncio
+import pytest
+from typing import Dict, Optional
+from unittest.mock import patch
+from src.ai.models.base import BaseAIModel, IncompleteStreamError
+from src.ai.models.factory import AIModelFactory
+from src.ai.models.ollama_model import OllamaModel
+from src.ai.models.openai_model import OpenAIModel
+from src.ai.models.routed_model import ProviderStats, RoutedModel
+from src.utils.monitoring import metrics
+
+class FakeProvider(BaseAIModel):
+    """Fournisseur de test : répond par son nom, ou '' (échec) si failing est vrai"""
+    
+    def __init__(self, name: str, failing: bool = False):
+        self.model_name = name
+        self.failing = failing
+        self.calls = []
+        super().__init__({})
+        
+    def initialize(self) -> None:
+        pass
+        
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        self.calls.append(prompt)
+        return "" if self.failing else f"{self.model_name} : {prompt}"
+        
+    async def generate_post(self, topic: str, context: Optional[Dict] = None) -> str:
+        return await self.generate_response(f"post sur {topic}", context)
+        
+    async def analyze_message(self, message: str, context: Optional[Dict] = None) -> Dict:
+        return {"raw_analysis": await self.generate_response(message, context)}
+        
+def _router(policy: str = "primary", **providers) -> RoutedModel:
+    """Routeur sur les fournisseurs de test donnés"""
+    return RoutedModel({"providers": providers, "policy": policy})
+    
+@pytest.mark.asyncio
+async def test_fallback_to_next_provider():
+    """Test la relance d'un appel en échec sur le fournisseur suivant"""
+    openai, anthropic = FakeProvider("openai", failing=True), FakeProvider("anthropic")
+    router = _router(openai=openai, anthropic=anthropic)
+    
+    assert await router.generate_response("bonjour") == "anthropic : bonjour"
+    assert await router.analyze_message("m") == {"raw_analysis": "anthropic : m"}
+    stats = router.get_stats()
+    assert stats["openai"]["errors"] == 2
+    assert stats["anthropic"]["calls"] == 2 and stats["anthropic"]["errors"] == 0
+    
+@pytest.mark.asyncio
+async def test_unhealthy_provider_is_skipped_then_retried():
+    """Test qu'un fournisseur défaillant passe après les autres, puis est réessayé"""
+    openai, ollama = FakeProvider("openai", failing=True), FakeProvider("ollama")
+    router = _router(openai=openai, ollama=ollama)
+    
+    for i in range(RoutedModel.MIN_SAMPLES):
+        await router.generate_response(f"p{i}")
+    assert not router.get_stats()["openai"]["healthy"]
+    
+    # Le trafic part directement vers Ollama
+    openai.calls.clear()
+    assert await router.generate_response("suivant") == "ollama : suivant"
+    assert openai.calls == []
+    
+    # Après RETRY_AFTER secondes sans échec, OpenAI est de nouveau essayé en premier
+    openai.failing = False
+    router.stats["openai"].last_failure -= RoutedModel.RETRY_AFTER
+    assert await router.generate_response("rétabli") == "openai : rétabli"
+    
+@pytest.mark.asyncio
+async def test_all_providers_failing():
+    """Test le résultat vide lorsque aucun fournisseur ne répond"""
+    router = _router(openai=FakeProvider("openai", failing=True), ollama=FakeProvider("ollama", failing=True))
+    assert await router.generate_response("bonjour") == ""
+    
+@pytest.mark.asyncio
+async def test_cache_hits_are_not_measured():
+    """Test que les réponses servies par le cache n'entrent ni dans les latences ni dans le coût"""
+    openai = FakeProvider("openai")
+    router = _router(openai=openai)
+    
+    for _ in range(3):
+        assert await router.generate_response("bonjour") == "openai : bonjour"
+    assert openai.calls == ["bonjour"]
+    stats = router.stats["openai"]
+    assert stats.calls == 1 and len(stats.latencies) == 1
+    assert stats.cost == pytest.approx(router._cost("openai", "bonjour", "openai : bonjour"))
+    
+def test_policies():
+    """Test l'ordre des fournisseurs selon la politique"""
+    providers = {name: FakeProvider(name) for name in ("openai", "anthropic", "ollama")}
+    
+    assert _router("primary", **providers)._order() == ["openai", "anthropic", "ollama"]
+    assert _router("cheapest", **providers)._order() == ["ollama", "anthropic", "openai"]
+    
+    router = _router("fastest", **providers)
+    for name, latency in (("openai", 0.5), ("anthropic", 0.2), ("ollama", 1.5)):
+        router.stats[name].record(True, latency)
+    assert router._order() == ["anthropic", "openai", "ollama"]
+    
+    with pytest.raises(ValueError):
+        _router("random", **providers)
+        
+def test_provider_stats():
+    """Test les percentiles de latence, le taux d'erreur et le coût"""
+    stats = ProviderStats(window=10)
+    assert stats.percentile(0.5) is None
+    
+    for i in range(1, 21):
+        stats.record(i % 4 != 0, latency=float(i), cost=0.01)
+    # Seuls les 10 derniers appels comptent
+    assert stats.percentile(0.5) == 16.0
+    assert stats.percentile(0.95) == 20.0
+    assert stats.error_rate == pytest.approx(0.3)
+    assert stats.errors == 5
+    assert stats.cost == pytest.approx(0.15)
+    
+@pytest.mark.asyncio
+async def test_stream_falls_back():
+    """Test la bascule d'un flux vide vers le fournisseur suivant"""
+    router = _router(openai=FakeProvider("openai", failing=True), anthropic=FakeProvider("anthropic"))
+    chunks = [chunk async for chunk in router.stream_response("bonjour")]
+    assert "".join(chunks) == "anthropic : bonjour"
+    
+def test_factory_creates_routed_model():
+    """Test la création d'un modèle routé par la factory"""
+    with patch('src.config.settings.AI_ROUTING_POLICY', 'cheapest'):
+        model = AIModelFactory.create_model("routed", {
+            "providers": ["openai", "ollama"],
+            "ollama": {"model_name": "mistral"}
+        })
+    assert isinstance(model, RoutedModel)
+    assert isinstance(model.providers["openai"], OpenAIModel)
+    assert isinstance(model.providers["ollama"], OllamaModel)
+    assert model.providers["ollama"].model_name == "mistral"
+    assert model.policy == "cheapest"
+    
+class SlowProvider(FakeProvider):
+    """Fournisseur de test dont chaque appel dure le délai suivant de delays (0 ensuite)"""
+    
+    def __init__(self, name: str, delays=()):
+        self.delays = list(delays)
+        self.cancelled = 0
+        super().__init__(name)
+        
+    async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
+        delay = self.delays.pop(0) if self.delays else 0
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return await super().generate_response(prompt, context)
+        
+def _hedged_router(budget: float = 1.0, **providers) -> RoutedModel:
+    """Routeur couvrant les appels plus lents que leur p95 habituel (10 ms)"""
+    router = RoutedModel({"providers": providers, "hedge_percentile": 0.95, "hedge_budget": budget})
+    for stats in router.stats.values():
+        # Assez de mesures pour que quelques appels lents ne déplacent pas le p95
+        for _ in range(40):
+            stats.record(True, 0.01)
+    return router
+    
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged():
+    """Test la couverture d'un appel lent : la réponse la plus rapide gagne, l'autre est annulée"""
+    openai, anthropic = SlowProvider("openai", [5]), SlowProvider("anthropic")
+    router = _hedged_router(openai=openai, anthropic=anthropic)
+    hedged, wins = metrics.hedged_calls, metrics.hedge_wins
+    
+    assert await asyncio.wait_for(router.generate_response("bonjour"), 1) == "anthropic : bonjour"
+    await asyncio.sleep(0)
+    assert openai.cancelled == 1
+    assert (metrics.hedged_calls, metrics.hedge_wins) == (hedged + 1, wins + 1)
+    
+    # Un appel rapide n'est pas couvert
+    assert await router.generate_response("rapide") == "openai : rapide"
+    assert anthropic.calls == ["bonjour"]
+    
+@pytest.mark.asyncio
+async def test_hedging_budget():
+    """Test que le budget limite la part des appels couverts"""
+    openai, anthropic = SlowProvider("openai", [0.2] * 4), SlowProvider("anthropic")
+    router = _hedged_router(budget=0.5, openai=openai, anthropic=anthropic)
+    
+    results = [await router.generate_response(f"p{i}") for i in range(4)]
+    assert results == ["openai : p0", "anthropic : p1", "openai : p2", "anthropic : p3"]
+    
+@pytest.mark.asyncio
+async def test_hedge_to_replica(isolated_cache):
+    """Test la couverture vers une réplique du même modèle, malgré le regroupement des appels"""
+    ollama = SlowProvider("ollama", [5])
+    router = _hedged_router(ollama=ollama)
+    
+    assert await asyncio.wait_for(router.generate_response("bonjour"), 1) == "ollama : bonjour"
+    assert ollama.calls == ["bonjour"]
+    await asyncio.sleep(0)
+    assert ollama.cancelled == 1
+    
+@pytest.mark.asyncio
+async def test_cancelled_loser_keeps_shared_call(isolated_cache):
+    """Test que l'annulation du perdant ne fait pas échouer un appel identique concurrent"""
+    openai, anthropic = SlowProvider("openai", [0.3]), SlowProvider("anthropic")
+    router = _hedged_router(openai=openai, anthropic=anthropic)
+    
+    hedged = asyncio.create_task(router.generate_response("same"))
+    await asyncio.sleep(0)
+    direct = asyncio.create_task(openai.generate_response("same"))
+    
+    assert await asyncio.wait_for(hedged, 1) == "anthropic : same"
+    assert await asyncio.wait_for(direct, 1) == "openai : same"
+    assert openai.cancelled == 0
+    
+@pytest.mark.asyncio
+async def test_cancelled_loser_latency_is_recorded():
+    """Test que la durée du perdant entre dans la fenêtre de latence, comme minorant"""
+    openai, anthropic = SlowProvider("openai", [5]), SlowProvider("anthropic")
+    router = _hedged_router(openai=openai, anthropic=anthropic)
+    samples = len(router.stats["openai"].latencies)
+    
+    await asyncio.wait_for(router.generate_response("bonjour"), 1)
+    
+    stats = router.stats["openai"]
+    assert len(stats.latencies) == samples + 1
+    assert stats.latencies[-1] >= 0.01
+    assert stats.calls == samples
+    
+class BrokenStreamProvider(FakeProvider):
+    """Fournisseur de test dont le flux échoue après avoir produit before_error fragments"""
+    
+    def __init__(self, name: str, before_error: int = 0):
+        self.before_error = before_error
+        super().__init__(name)
+        
+    async def stream_response(self, prompt: str, context: Optional[Dict] = None):
+        for i in range(self.before_error):
+            yield f"fragment {i} "
+        raise IncompleteStreamError("flux interrompu")
+        
+@pytest.mark.asyncio
+async def test_stream_error_falls_back_before_first_chunk():
+    """Test la bascule d'un flux en erreur tant qu'aucun fragment n'a été transmis"""
+    router = _router(openai=BrokenStreamProvider("openai"), anthropic=FakeProvider("anthropic"))
+    chunks = [chunk async for chunk in router.stream_response("bonjour")]
+    assert "".join(chunks) == "anthropic : bonjour"
+    assert router.get_stats()["openai"]["errors"] == 1
+    
+@pytest.mark.asyncio
+async def test_stream_error_after_first_chunk_is_raised():
+    """Test qu'une erreur après un fragment transmis est propagée"""
+    router = _router(openai=BrokenStreamProvider("openai", 1), anthropic=FakeProvider("anthropic"))
+    chunks = []
+    with pytest.raises(IncompleteStreamError):
+        async for chunk in router.stream_response("bonjour"):
+            chunks.append(chunk)
+    assert chunks == ["fragment 0 "]
@@ -26,6 +26,9 @@ class PerformanceMetrics:
         self.min_response_time = float('inf')
         self.last_error = None
         self.last_error_time = None
+        self.hedge_eligible_calls = 0
+        self.hedged_calls = 0
+        self.hedge_wins = 0
         self.start_time = datetime.utcnow()
     
     def record_api_call(self, response_time: float, success: bool = True) -> None:
@@ -43,6 +46,19 @@ class PerformanceMetrics:
         self.max_response_time = max(self.max_response_time, response_time)
         self.min_response_time = min(self.min_response_time, response_time)
     
+    def record_hedge(self, hedged: bool, won: bool = False) -> None:
+        """Enregistre un appel de modèle éligible à une requête de couverture (hedging).
+        
+        Args:
+            hedged: Si une requête de couverture a été envoyée
+            won: Si la requête de couverture a répondu la première
+        """
+        self.hedge_eligible_calls += 1
+        if hedged:
+            self.hedged_calls += 1
+        if won:
+            self.hedge_wins += 1
+    
     def record_error(self, error: str) -> None:
         """Enregistre une erreur.
         
@@ -74,7 +90,14 @@ class PerformanceMetrics:
             "max_response_time": self.max_response_time,
             "min_response_time": self.min_response_time if self.min_response_time != float('inf') else 0,
             "last_error": self.last_error,
-            "last_error_time": self.last_error_time
+            "last_error_time": self.last_error_time,
+            "hedged_calls": self.hedged_calls,
+            "hedge_rate": (
+                self.hedged_calls / self.hedge_eligible_calls
+                if self.hedge_eligible_calls > 0 else 0
+            ),
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": self.hedge_wins / self.hedged_calls if self.hedged_calls > 0 else 0
         }
     
     def get_system_metrics(self) -> Dict: